@@ -1,25 +1,70 @@
 import logging
 import os
+from threading import Thread
+
+# First, so the startup timer includes the imports below
+from app.startup import STARTUP_MODES
+from app.startup import startup
 
 from dotenv import load_dotenv
 
 from flask import Flask, got_request_exception
 from flask_cors import CORS
-from flask_pymysql import MySQL
+from pymysql.constants import CLIENT
+
+from app.pool import ConnectionPool
 
-db = MySQL()
+db = ConnectionPool()
 
 def get_config():
     app_env = os.environ.get("APP_ENV", 'DEVELOPMENT').lower().title()
     return f'config.{app_env}Config'
 
 
-def create_app(test_config=False):
-    from app.controllers import init_app
+def warm_up(app):
+    """
+    Opens MYSQL_POOL_MIN_SIZE connections, loads the signing key, the
+    engagement index, the feed ranking and the counters, and starts their
+    refresh threads and the write-behind flusher, which otherwise happens on
+    first use. `create_app` calls
+    it as STARTUP_WARM_UP says; with "lazy", a server can call it itself
+    after forking.
+    """
+    from app import signing
+    from app.aggregates import counters
+    from app.engagement import engagement
+    from app.ranking import ranking
+    from app.writebehind import write_behind
+
+    with startup.phase("warm up: pool"):
+        db.prewarm()
+    with startup.phase("warm up: signing key"):
+        signing.warm_up()
+    with startup.phase("warm up: engagement index"):
+        engagement.start()
+    with startup.phase("warm up: feed ranking"):
+        ranking.ensure_loaded()
+    with startup.phase("warm up: counters"):
+        counters.start()
+    if write_behind.enabled:
+        write_behind.start()
+
+
+def create_app(test_config=False, cli=False):
+    """
+    With `cli`, only the configuration, the connection pool, metrics and the
+    query profiler are set up, for scripts like migrate.py that serve no
+    requests: no signing, caches, feed indexes or routes, nor their imports.
+    """
+    with startup.phase("import"):
+        from app.metrics import metrics
+        from app.profiler import profiler
     load_dotenv()
 
     app = Flask(__name__)
     app.config.from_object(get_config())
+    if app.config["STARTUP_WARM_UP"] not in STARTUP_MODES:
+        raise ValueError(f"STARTUP_WARM_UP must be one of {list(STARTUP_MODES)}, got {app.config['STARTUP_WARM_UP']}")
 
     CORS(app)
 
@@ -28,13 +73,49 @@ def create_app(test_config=False):
         'password': app.config['MYSQL_PASSWORD'],
         'host': app.config['MYSQL_HOST'],
         'port': int(app.config['MYSQL_PORT']),
-        'database': app.config['MYSQL_DATABASE']
+        'database': app.config['MYSQL_DATABASE'],
+        'connect_timeout': app.config['MYSQL_CONNECT_TIMEOUT'],
     }
+    if app.config['MYSQL_MULTI_STATEMENTS']:
+        pymysql_connect_kwargs['client_flag'] = CLIENT.MULTI_STATEMENTS
     app.config['pymysql_kwargs'] = pymysql_connect_kwargs
+    metrics.init_app(app)
     db.init_app(app)
+    profiler.init_app(app)
+    if cli:
+        startup.app_created()
+        return app
 
+    with startup.phase("import services"):
+        from app.controllers import init_app
+        from app import signing
+        from app.writebehind import write_behind
+        from app.groupcommit import group_commit
+        from app.engagement import engagement
+        from app.cache import get_backend
+        from app.models.entity_cache import entity_cache
+        from app.feed import feed_cache
+        from app.ranking import ranking
+        from app.aggregates import counters
 
-    init_app(app)
+    entity_cache.init_app(app, backend=get_backend(app.config.get("ENTITY_CACHE_BACKEND"), app))
+    signing.init_app(app)
+    write_behind.init_app(app)
+    group_commit.init_app(app)
+    engagement.init_app(app)
+    ranking.init_app(app)
+    counters.init_app(app)
+    feed_cache.init_app(app, backend=get_backend(app.config.get("FEED_CACHE_BACKEND"), app))
 
+    with startup.phase("routes"):
+        init_app(app)
 
+    if app.config["STARTUP_WARM_UP"] == "eager":
+        warm_up(app)
+    elif app.config["STARTUP_WARM_UP"] == "background":
+        Thread(target=warm_up, args=(app,), name="warm-up", daemon=True).start()
+    else:
+        # A lazy app may be forked, e.g. by gunicorn --preload
+        db.close_idle()
+    startup.app_created()
     return app
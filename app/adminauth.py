@@ -0,0 +1,33 @@
+"""
+Access to the operational endpoints, /metrics and /admin/*.
+
+They expose SQL fingerprints, query plans and the internals of the caches,
+and DELETE /admin/queries resets the profiler, so they only answer requests
+with the header `Authorization: Bearer <ADMIN_TOKEN>`. Without an ADMIN_TOKEN
+they answer 404 to every request. Both entry points check `status` before
+routing.
+"""
+import hmac
+
+
+def is_admin_path(path):
+    return path == "/metrics" or path == "/admin" or path.startswith(("/metrics/", "/admin/"))
+
+
+def authorized(token, authorization):
+    """Whether the Authorization header value `authorization` carries `token`."""
+    scheme, _, credentials = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer":
+        return False
+    return hmac.compare_digest(credentials.strip().encode(), token.encode())
+
+
+def status(token, path, authorization):
+    """The error status of a request to `path`, or None if it may go on."""
+    if not is_admin_path(path):
+        return None
+    if not token:
+        return 404
+    if not authorized(token, authorization):
+        return 401
+    return None
@@ -0,0 +1,230 @@
+"""
+Per-video engagement counters.
+
+Counts live in one NumPy array per counter, indexed by a per-process video
+ordinal. They are loaded in bulk with one GROUP BY per event table by
+`start`, which `warm_up` calls, or else the first lookup in the background,
+updated by the save listeners of the event models and reconciled against the
+database every `reconcile_interval` seconds, which also picks up the events
+saved by other workers. Events recorded while a load runs are replayed on
+the loaded counts; one committed just before the load's scan but recorded
+after it started counts twice until the next reconcile. Until they are
+loaded, lookups count the events of their videos in the database.
+"""
+import logging
+import time
+from threading import Event
+from threading import Lock
+from threading import Thread
+
+import numpy as np
+
+from app.models import VersionedModel
+from app.models import query as queries
+from app.models.video import Bookmark
+from app.models.video import Clap
+from app.models.video import View
+
+COUNTERS = {
+    "views": View,
+    "claps": Clap,
+    "bookmarks": Bookmark,
+}
+
+
+class EngagementCounters:
+    def __init__(self, capacity=1024, reconcile_interval=600):
+        self.capacity = capacity
+        self.reconcile_interval = reconcile_interval
+        self.enabled = True
+        self.loaded = False
+        self.app = None
+        self._started = False
+        self._ordinals = {}
+        self._counts = {name: np.zeros(capacity, dtype=np.int64) for name in COUNTERS}
+        self._lock = Lock()
+        # (name, entities) recorded while a load runs, None otherwise
+        self._pending = None
+        self._stop = Event()
+        self._thread = None
+        self.load_seconds = 0.0
+        self.reconciled = 0
+        for name, model in COUNTERS.items():
+            model.on_save(lambda entities, name=name: self.record(name, entities))
+
+    def init_app(self, app):
+        self.app = app
+        self.reconcile_interval = app.config.get("COUNTERS_RECONCILE_INTERVAL", self.reconcile_interval)
+        self.enabled = app.config.get("COUNTERS_ENABLED", True)
+
+    def start(self, background=False):
+        """Loads the counters and starts their reconcile thread, once."""
+        with self._lock:
+            if self._started or not self.enabled or self.app is None:
+                return
+            self._started = True
+        if background:
+            Thread(target=self._start, name="engagement-counters-load", daemon=True).start()
+        else:
+            self._start()
+
+    def _start(self):
+        with self.app.app_context():
+            self.load()
+        if self.reconcile_interval:
+            self._thread = Thread(target=self._reconcile, name="engagement-counters", daemon=True)
+            self._thread.start()
+
+    def load(self):
+        started = time.perf_counter()
+        ordinals = {}
+        loaded = {}
+        with self._lock:
+            self._pending = []
+        try:
+            for name, model in COUNTERS.items():
+                query = queries.select(model.__tablename__, "video_id, COUNT(*)", group_by="video_id")
+                _, rows = VersionedModel.fetchall_rows(query)
+                loaded[name] = rows
+                for video_id, _ in rows:
+                    ordinals.setdefault(video_id, len(ordinals))
+        except Exception as e:
+            with self._lock:
+                self._pending = None
+            logging.error(f"Could not load engagement counters: {e}")
+            return False
+
+        capacity = max(self.capacity, 2 * len(ordinals))
+        counts = {}
+        for name, rows in loaded.items():
+            column = np.zeros(capacity, dtype=np.int64)
+            if rows:
+                positions = np.fromiter((ordinals[video_id] for video_id, _ in rows), dtype=np.int64, count=len(rows))
+                column[positions] = np.fromiter((count for _, count in rows), dtype=np.int64, count=len(rows))
+            counts[name] = column
+
+        with self._lock:
+            self._ordinals = ordinals
+            self._counts = counts
+            pending, self._pending = self._pending, None
+            for name, entities in pending:
+                self._apply(name, entities)
+            self.loaded = True
+        self.load_seconds = time.perf_counter() - started
+        logging.info(f"Loaded engagement counters of {len(ordinals)} videos in {self.load_seconds:.2f}s")
+        return True
+
+    def _reconcile(self):
+        while not self._stop.wait(self.reconcile_interval):
+            with self.app.app_context():
+                if self.load():
+                    self.reconciled += 1
+
+    def _ordinal(self, video_id):
+        ordinal = self._ordinals.get(video_id)
+        if ordinal is None:
+            ordinal = self._ordinals[video_id] = len(self._ordinals)
+            capacity = len(next(iter(self._counts.values())))
+            if ordinal >= capacity:
+                for name, column in self._counts.items():
+                    self._counts[name] = np.concatenate([column, np.zeros(capacity, dtype=np.int64)])
+        return ordinal
+
+    def record(self, name, entities):
+        """
+        Save listener: new events count up, deleted ones count down, new
+        versions of an existing event leave the count unchanged.
+        """
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((name, entities))
+            self._apply(name, entities)
+
+    def _apply(self, name, entities):
+        for entity in entities:
+            if not entity.active:
+                delta = -1
+            elif entity.previous_version == entity.__empty_version__:
+                delta = 1
+            else:
+                continue
+            ordinal = self._ordinal(entity.video_id)
+            self._counts[name][ordinal] += delta
+
+    def lookup(self, video_ids):
+        """
+        Returns {counter: int64 array} with the counts of `video_ids`, in order.
+        Unknown videos count zero.
+        """
+        if not self.loaded:
+            self.start(background=True)
+            return self._query(video_ids)
+        with self._lock:
+            positions = np.fromiter(
+                (self._ordinals.get(x, -1) for x in video_ids), dtype=np.int64, count=len(video_ids)
+            )
+            known = positions >= 0
+            return {name: np.where(known, column[positions], 0) for name, column in self._counts.items()}
+
+    async def alookup(self, video_ids):
+        """`lookup` for the async entry point."""
+        if self.loaded:
+            return self.lookup(video_ids)
+        self.start(background=True)
+        return await self._aquery(video_ids)
+
+    @staticmethod
+    def _count_query(model):
+        return queries.select(model.__tablename__, "video_id, COUNT(*)", where=(("video_id", "IN"),), group_by="video_id")
+
+    @staticmethod
+    def _column(video_ids, rows):
+        counts = dict(rows)
+        return np.fromiter((counts.get(x, 0) for x in video_ids), dtype=np.int64, count=len(video_ids))
+
+    @classmethod
+    def _query(cls, video_ids):
+        counts = {}
+        for name, model in COUNTERS.items():
+            rows = ()
+            if video_ids:
+                _, rows = VersionedModel.fetchall_rows(cls._count_query(model), (tuple(video_ids),))
+            counts[name] = cls._column(video_ids, rows)
+        return counts
+
+    @classmethod
+    async def _aquery(cls, video_ids):
+        counts = {}
+        for name, model in COUNTERS.items():
+            rows = ()
+            if video_ids:
+                _, rows = await VersionedModel.afetchall_rows(cls._count_query(model), (tuple(video_ids),))
+            counts[name] = cls._column(video_ids, rows)
+        return counts
+
+    @staticmethod
+    def _overlay(items, counts):
+        for name, column in counts.items():
+            for item, count in zip(items, column.tolist()):
+                item[name] = count
+        return items
+
+    def overlay(self, items, video_ids):
+        """Adds the counts of `video_ids` to the dicts `items`, in place."""
+        return self._overlay(items, self.lookup(video_ids))
+
+    async def aoverlay(self, items, video_ids):
+        """`overlay` for the async entry point."""
+        return self._overlay(items, await self.alookup(video_ids))
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "videos": len(self._ordinals),
+            "load_seconds": self.load_seconds,
+            "reconciled": self.reconciled,
+            "totals": {name: int(column.sum()) for name, column in self._counts.items()},
+        }
+
+
+counters = EngagementCounters()
@@ -0,0 +1,35 @@
+"""
+The async entry point: the routes of the video API served by Quart, with
+model reads and writes on aiomysql and URL signing awaited on the signer
+pool, so a request waiting on MySQL or on signing holds no worker.
+
+    hypercorn asgi:app
+
+Quart and aiomysql are only imported here, the synchronous app does not
+need them.
+"""
+
+
+def create_async_app():
+    """
+    The process-wide state (configuration, signing, the caches, the feed
+    ranking, the engagement index and counters, write-behind) is set up by
+    `create_app` as usual and shared with the async app. Their background
+    threads keep using that app and its synchronous pool.
+    """
+    from quart import Quart
+    from quart_cors import cors
+
+    from app import create_app
+    from app.aio import controllers
+    from app.aio.pool import aio_db
+
+    sync_app = create_app()
+
+    app = Quart(__name__)
+    app.config.update(sync_app.config)
+    app = cors(app, allow_origin="*")
+
+    aio_db.init_app(app)
+    controllers.init_app(app)
+    return app
@@ -0,0 +1,295 @@
+"""
+Async handlers for the routes of app.controllers, with the same paths,
+arguments and responses. The ranking, the caches and the overlays are
+shared with the synchronous handlers; only the calls that wait on MySQL or
+on the signer are awaited here.
+"""
+import asyncio
+import time
+
+from quart import Blueprint
+from quart import Response
+from quart import current_app
+from quart import g
+from quart import request
+from werkzeug.exceptions import HTTPException
+from werkzeug.exceptions import abort
+
+from app import adminauth
+from app import db
+from app import signing
+from app.aggregates import counters
+from app.aio.pool import aio_db
+from app.controllers import encoding
+from app.controllers.video import DEFAULT_PAGE_SIZE
+from app.controllers.video import MAX_PAGE_SIZE
+from app.controllers.video import decode_feed_cursor
+from app.controllers.video import feed_key
+from app.controllers.video import feed_page
+from app.controllers.video import page_signing_requests
+from app.controllers.video import page_urls
+from app.controllers.video import queue_full_message
+from app.controllers.video import ranked_ids
+from app.engagement import engagement
+from app.feed import feed_cache
+from app.groupcommit import group_commit
+from app.metrics import metrics
+from app.models.entity_cache import entity_cache
+from app.models.video import Bookmark
+from app.models.video import Clap
+from app.models.video import User
+from app.models.video import Video
+from app.models.video import View
+from app.profiler import profiler
+from app.ranking import afetch_videos
+from app.ranking import boosts_for
+from app.ranking import ranking
+from app.signing import asign_urls
+from app.startup import startup
+from app.writebehind import QueueFull
+from app.writebehind import write_behind
+
+videos = Blueprint("videos", __name__)
+admin = Blueprint("admin", __name__)
+
+
+def init_app(app):
+    encoding.init_app(app)
+    app.register_blueprint(videos, url_prefix="/videos")
+    app.register_blueprint(admin, url_prefix="/admin")
+    app.register_error_handler(HTTPException, http_error)
+    app.before_request(admin_guard)
+    if metrics.enabled:
+        app.before_request(request_started)
+        app.after_request(request_finished)
+        app.add_url_rule("/metrics", "metrics", metrics_view)
+
+
+async def admin_guard():
+    status = adminauth.status(
+        current_app.config.get("ADMIN_TOKEN"), request.path, request.headers.get("Authorization")
+    )
+    if status:
+        abort(status)
+
+
+async def request_started():
+    g.request_started = time.perf_counter()
+
+
+async def request_finished(response):
+    # Spans are not summed per request here, they have no Flask g to go to
+    started = g.get("request_started")
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+    metrics.request_seconds.observe(elapsed, route, request.method, response.status_code)
+    if metrics.server_timing:
+        response.headers["Server-Timing"] = f"total;dur={elapsed * 1000:.2f}"
+    return response
+
+
+async def metrics_view():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+def http_error(e):
+    return respond({"message": e.description}, e.code)
+
+
+def respond(data, code=200, headers=None):
+    return Response(encoding.dumps(data) + b"\n", code, headers, mimetype="application/json")
+
+
+def page_args(default=DEFAULT_PAGE_SIZE):
+    if "cursor" not in request.args and "page_size" not in request.args:
+        return None
+    try:
+        page_size = int(request.args.get("page_size", default))
+    except ValueError:
+        abort(400, "page_size must be an integer")
+    return request.args.get("cursor"), max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def page_response(items, next_cursor):
+    return respond(items, 200, {"X-Next-Cursor": next_cursor} if next_cursor else {})
+
+
+async def model_page(model, cursor, page_size, overlay=None):
+    try:
+        models, next_cursor = await model.aget_page("*", cursor=cursor, page_size=page_size, records=True)
+    except ValueError as e:
+        abort(400, str(e))
+    if overlay:
+        models = await overlay(models)
+    return page_response(models, next_cursor)
+
+
+async def with_counts(videos):
+    return await counters.aoverlay([x.get_for_api() for x in videos], [x.id for x in videos])
+
+
+async def model_create(model):
+    body = await request.get_json()
+    if isinstance(body, list):
+        saved = await model.asave_many([model(**item) for item in body])
+        return respond([x.get_for_api() for x in saved])
+    return respond((await model(**body).asave()).get_for_api())
+
+
+def _queue_events(model, items, queued):
+    # The "sync" policy saves on the sync pool, which needs a Flask app context
+    with write_behind.app.app_context():
+        for item in items:
+            queued.append(write_behind.put(model(**item)).get_for_api())
+
+
+async def model_event(model):
+    if not write_behind.enabled:
+        return await model_create(model)
+
+    body = await request.get_json()
+    items = body if isinstance(body, list) else [body]
+    queued = []
+    try:
+        if write_behind.policy in ("drop_newest", "drop_oldest"):
+            _queue_events(model, items, queued)
+        else:
+            # "block" waits for room and "sync" writes, both off the event loop
+            await asyncio.to_thread(_queue_events, model, items, queued)
+    except QueueFull as e:
+        abort(503, queue_full_message(e, queued, items))
+    return respond(queued if isinstance(body, list) else queued[0], 202)
+
+
+async def _json_array(items):
+    yield b"["
+    first = True
+    async for item in items:
+        if not first:
+            yield b","
+        first = False
+        yield encoding.dumps(item)
+    yield b"]\n"
+
+
+async def _ndjson(items):
+    async for item in items:
+        yield encoding.dumps(item) + b"\n"
+
+
+async def model_list(model):
+    paging = page_args()
+    if paging:
+        return await model_page(model, *paging)
+    items = model.aget_all("*", stream=True, records=True)
+    if request.args.get("format") == "ndjson" or request.accept_mimetypes.best == "application/x-ndjson":
+        return Response(_ndjson(items), mimetype="application/x-ndjson")
+    return Response(_json_array(items), mimetype="application/json")
+
+
+async def videos_urls(videos):
+    requests = page_signing_requests(videos)
+    return page_urls(videos, requests, await asign_urls(requests))
+
+
+async def feed_boosts(user_id):
+    if request.args.get("ranking") == "interests":
+        user = await User.aget(user_id, key="id")
+        interests = getattr(user, "interest", None) or ""
+        return boosts_for(interests.split(","))
+    return boosts_for(current_app.config.get("FEED_BOOSTED_TAGS", "").split(","))
+
+
+async def ranked_feed_page(boosts, cursor, page_size):
+    # A first load scans the video table, off the event loop
+    await asyncio.to_thread(ranking.ensure_loaded)
+    video_ids, next_cursor = ranked_ids(boosts, cursor, page_size)
+    data = await afetch_videos(ranking.table, video_ids)
+    return feed_page(data, await videos_urls(data), next_cursor)
+
+
+@videos.route("/real")
+async def real():
+    cursor, page_size = page_args(default=10) or (None, 10)
+    if cursor:
+        try:
+            decode_feed_cursor(cursor)
+        except ValueError as e:
+            abort(400, str(e))
+
+    user_id = request.args.get("user_id", "19973")
+    boosts = await feed_boosts(user_id)
+    page = await feed_cache.aget_or_build(
+        feed_key(boosts, cursor, page_size),
+        lambda: ranked_feed_page(boosts, cursor, page_size),
+    )
+
+    video_ids = [x["id"] for x in page["items"]]
+    flags = await engagement.aflags(user_id, video_ids)
+    data = [dict(x, **flag) for x, flag in zip(page["items"], flags)]
+    await counters.aoverlay(data, video_ids)
+
+    return page_response(data, page["next_cursor"])
+
+
+@videos.route("", methods=["GET", "POST"])
+async def video():
+    if request.method == "POST":
+        return respond((await Video(**await request.get_json()).asave()).get_for_api())
+    paging = page_args()
+    if paging:
+        return await model_page(Video, *paging, overlay=with_counts)
+    return respond(await with_counts([x async for x in Video.aget_all("*", limit=5, records=True)]))
+
+
+@videos.route("/view", methods=["GET", "POST"])
+async def view():
+    if request.method == "POST":
+        return await model_event(View)
+    return await model_list(View)
+
+
+@videos.route("/clap", methods=["GET", "POST"])
+async def clap():
+    if request.method == "POST":
+        return await model_event(Clap)
+    return await model_list(Clap)
+
+
+@videos.route("/bookmark", methods=["GET", "POST"])
+async def bookmark():
+    if request.method == "POST":
+        return await model_create(Bookmark)
+    return await model_list(Bookmark)
+
+
+@videos.route("/user", methods=["GET", "POST"])
+async def user():
+    if request.method == "POST":
+        return respond((await User(**await request.get_json()).asave()).get_for_api())
+    return await model_list(User)
+
+
+STATS = {
+    "signing": signing.stats,
+    "pool": db.stats,
+    "aio_pool": aio_db.stats,
+    "write_behind": write_behind.stats,
+    "engagement": engagement.stats,
+    "entity_cache": entity_cache.stats,
+    "feed_cache": feed_cache.stats,
+    "ranking": ranking.stats,
+    "counters": counters.stats,
+    "group_commit": group_commit.stats,
+    "queries": profiler.report,
+    "startup": startup.report,
+}
+
+
+@admin.route("/<name>")
+async def stats(name):
+    if name not in STATS:
+        abort(404)
+    return respond(STATS[name]())
@@ -0,0 +1,93 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class AsyncConnectionPool:
+    """
+    A bounded pool of aiomysql connections for the async entry point.
+
+    Every `cursor()` checks a connection out for the duration of the block
+    only, so a request waiting on anything else holds no connection. The
+    pool is opened when the app starts serving and closed when it stops.
+    """
+
+    def __init__(self, size=20, min_size=2, timeout=5, max_lifetime=3600):
+        self.size = size
+        self.min_size = min_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.multi_statements = False
+        self.chunk_size = 500
+        self.bulk_batch_size = 500
+        self.connect_kwargs = {}
+        self.pool = None
+        self.checkouts = 0
+        self.timeouts = 0
+
+    def init_app(self, app):
+        kwargs = dict(app.config["pymysql_kwargs"])
+        kwargs["db"] = kwargs.pop("database")
+        self.connect_kwargs = kwargs
+        self.multi_statements = app.config.get("MYSQL_MULTI_STATEMENTS", False)
+        self.chunk_size = app.config.get("MYSQL_STREAM_CHUNK_SIZE", self.chunk_size)
+        self.bulk_batch_size = app.config.get("MYSQL_BULK_BATCH_SIZE", self.bulk_batch_size)
+        self.size = app.config.get("MYSQL_AIO_POOL_SIZE", self.size)
+        self.min_size = min(self.size, app.config.get("MYSQL_POOL_MIN_SIZE", self.min_size))
+        self.timeout = app.config.get("MYSQL_POOL_TIMEOUT", self.timeout)
+        self.max_lifetime = app.config.get("MYSQL_POOL_MAX_LIFETIME", self.max_lifetime)
+        app.before_serving(self.start)
+        app.after_serving(self.close)
+
+    async def start(self):
+        import aiomysql
+
+        self.pool = await aiomysql.create_pool(
+            minsize=self.min_size,
+            maxsize=self.size,
+            pool_recycle=self.max_lifetime,
+            **self.connect_kwargs,
+        )
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    @asynccontextmanager
+    async def cursor(self, commit=True, cursor_class=None):
+        """
+        Yields a cursor on a pooled connection and commits once the block
+        succeeds. Waits up to `timeout` seconds for a free connection.
+        """
+        self.checkouts += 1
+        try:
+            connection = await asyncio.wait_for(self.pool.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        try:
+            cursor = await connection.cursor(cursor_class) if cursor_class else await connection.cursor()
+            try:
+                yield cursor
+            except Exception:
+                await connection.rollback()
+                raise
+            finally:
+                await cursor.close()
+            if commit:
+                await connection.commit()
+        finally:
+            self.pool.release(connection)
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "open": self.pool.size if self.pool is not None else 0,
+            "idle": self.pool.freesize if self.pool is not None else 0,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+        }
+
+
+aio_db = AsyncConnectionPool()
@@ -0,0 +1,100 @@
+"""
+Shared cache backends.
+
+Both backends store JSON-serializable values with a time to live. RedisBackend
+lets every worker process share entries, MemoryBackend is an in-process
+stand-in with the same interface for development and tests.
+"""
+import json
+import logging
+import time
+from threading import Lock
+
+
+class MemoryBackend:
+    # Entries are only seen by this process
+    shared = False
+
+    def __init__(self):
+        self._data = {}
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._data[key]
+                return None
+            return json.loads(value)
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, json.dumps(value))
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class RedisBackend:
+    """
+    While Redis is unreachable or fails, every get is a miss and every set
+    or delete is skipped, so requests go on without the cache. The errors
+    are logged at most once per `log_interval` seconds.
+    """
+
+    shared = True
+
+    def __init__(self, url, password=None, prefix="claps:", log_interval=60):
+        import redis
+
+        self._redis = redis.Redis.from_url(url, password=password)
+        self._error = redis.RedisError
+        self.prefix = prefix
+        self.log_interval = log_interval
+        self.errors = 0
+        self._logged_errors = 0
+        self._logged_at = None
+
+    def _failed(self, operation, key, e):
+        self.errors += 1
+        now = time.monotonic()
+        if self._logged_at is None or now - self._logged_at >= self.log_interval:
+            suppressed = self.errors - self._logged_errors - 1
+            more = f" ({suppressed} more since the last report)" if suppressed else ""
+            logging.error(f"Redis {operation} of {self.prefix + key} failed, skipping the cache: {e}{more}")
+            self._logged_at, self._logged_errors = now, self.errors
+
+    def get(self, key):
+        try:
+            value = self._redis.get(self.prefix + key)
+        except self._error as e:
+            self._failed("get", key, e)
+            return None
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        try:
+            self._redis.set(self.prefix + key, json.dumps(value), ex=max(int(ttl), 1))
+        except self._error as e:
+            self._failed("set", key, e)
+
+    def delete(self, key):
+        try:
+            self._redis.delete(self.prefix + key)
+        except self._error as e:
+            self._failed("delete", key, e)
+
+
+def get_backend(name, app):
+    """Builds the backend named by a *_BACKEND config value, or None."""
+    if not name:
+        return None
+    if name == "memory":
+        return MemoryBackend()
+    if name == "redis":
+        return RedisBackend(app.config["REDIS_URI"], app.config.get("REDIS_PASSWORD"))
+    raise ValueError(f"Unknown cache backend {name}")
@@ -1,7 +1,25 @@
 import flask_restx
+from flask import abort
+from flask import current_app
+from flask import request
+from app import adminauth
+from app.controllers import encoding
 from app.controllers.video import api as video_api
+from app.controllers.admin import api as admin_api
 
 
 def init_app(app):
+    encoding.init_app(app)
+    app.before_request(admin_guard)
     api = flask_restx.Api(app)
+    api.representation("application/json")(encoding.output_json)
     api.add_namespace(video_api, path='/videos')
+    api.add_namespace(admin_api, path='/admin')
+
+
+def admin_guard():
+    status = adminauth.status(
+        current_app.config.get("ADMIN_TOKEN"), request.path, request.headers.get("Authorization")
+    )
+    if status:
+        abort(status)
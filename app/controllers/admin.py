@@ -0,0 +1,94 @@
+from flask_restx import Namespace
+from flask import request
+from flask_restx import Resource
+from app import db
+from app import signing
+from app.aggregates import counters
+from app.engagement import engagement
+from app.feed import feed_cache
+from app.groupcommit import group_commit
+from app.ranking import ranking
+from app.models.entity_cache import entity_cache
+from app.profiler import REPORT_ORDERS
+from app.profiler import profiler
+from app.startup import startup
+from app.writebehind import write_behind
+
+api = Namespace("admin")
+
+
+@api.route("/signing")
+class SigningStatsController(Resource):
+    def get(self):
+        return signing.stats()
+
+
+@api.route("/pool")
+class PoolStatsController(Resource):
+    def get(self):
+        return db.stats()
+
+
+@api.route("/write_behind")
+class WriteBehindStatsController(Resource):
+    def get(self):
+        return write_behind.stats()
+
+
+@api.route("/engagement")
+class EngagementStatsController(Resource):
+    def get(self):
+        return engagement.stats()
+
+
+@api.route("/entity_cache")
+class EntityCacheStatsController(Resource):
+    def get(self):
+        return entity_cache.stats()
+
+
+@api.route("/feed_cache")
+class FeedCacheStatsController(Resource):
+    def get(self):
+        return feed_cache.stats()
+
+
+@api.route("/ranking")
+class RankingStatsController(Resource):
+    def get(self):
+        return ranking.stats()
+
+
+@api.route("/counters")
+class CountersStatsController(Resource):
+    def get(self):
+        return counters.stats()
+
+
+@api.route("/group_commit")
+class GroupCommitStatsController(Resource):
+    def get(self):
+        return group_commit.stats()
+
+
+@api.route("/startup")
+class StartupStatsController(Resource):
+    def get(self):
+        return startup.report()
+
+
+@api.route("/queries")
+class QueryProfilerController(Resource):
+    def get(self):
+        order_by = request.args.get("order_by", "total_seconds")
+        if order_by not in REPORT_ORDERS:
+            api.abort(400, f"order_by must be one of {list(REPORT_ORDERS)}")
+        try:
+            top_n = int(request.args.get("top", profiler.top_n))
+        except ValueError:
+            api.abort(400, "top must be an integer")
+        return profiler.report(top_n, order_by)
+
+    def delete(self):
+        profiler.clear()
+        return "", 204
@@ -0,0 +1,54 @@
+"""
+JSON encoders for API responses.
+
+"orjson" serializes dataclasses (the slotted model records), datetimes and
+UUIDs natively and writes records straight to bytes without an intermediate
+dict. "json" is the stdlib fallback and goes through `default_for_dumps`.
+The encoder is picked by API_JSON_ENCODER, and falls back to "json" when
+orjson is not installed.
+"""
+import json
+
+from flask import make_response
+
+from app.metrics import metrics
+from app.models import default_for_dumps
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _orjson_dumps(data):
+    return orjson.dumps(data, default=default_for_dumps)
+
+
+def _json_dumps(data):
+    return json.dumps(data, default=default_for_dumps).encode()
+
+
+ENCODERS = {
+    "orjson": _orjson_dumps if orjson is not None else None,
+    "json": _json_dumps,
+}
+
+dumps = ENCODERS["orjson"] or _json_dumps
+
+
+def init_app(app):
+    global dumps
+    name = app.config.get("API_JSON_ENCODER", "orjson")
+    if name not in ENCODERS:
+        raise ValueError(f"API_JSON_ENCODER must be one of {list(ENCODERS)}, got {name}")
+    dumps = ENCODERS[name] or _json_dumps
+
+
+def output_json(data, code, headers=None):
+    """flask-restx representation for application/json."""
+    with metrics.span("encode"):
+        body = dumps(data) + b"\n"
+    response = make_response(body, code)
+    response.mimetype = "application/json"
+    response.headers.extend(headers or {})
+    return response
@@ -0,0 +1,31 @@
+from flask import Response
+from flask import request
+from flask import stream_with_context
+
+from app.controllers import encoding
+
+
+def _json_array(items):
+    yield b"["
+    first = True
+    for item in items:
+        if not first:
+            yield b","
+        first = False
+        yield encoding.dumps(item)
+    yield b"]\n"
+
+
+def _ndjson(items):
+    for item in items:
+        yield encoding.dumps(item) + b"\n"
+
+
+def stream_response(items):
+    """
+    Streams `items` as a JSON array, or as newline delimited JSON when the
+    client asks for it with `?format=ndjson` or `Accept: application/x-ndjson`.
+    """
+    if request.args.get("format") == "ndjson" or request.accept_mimetypes.best == "application/x-ndjson":
+        return Response(stream_with_context(_ndjson(items)), mimetype="application/x-ndjson")
+    return Response(stream_with_context(_json_array(items)), mimetype="application/json")
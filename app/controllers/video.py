@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from flask_restx import Namespace
 from flask_restx import Resource
+from flask import current_app
 from flask import request
 from app.models.video import Video
 from app.models.video import View
@@ -8,29 +9,102 @@ from app.models.video import Clap
 from app.models.video import Bookmark
 from app.models.video import User
 from app.models.video import VersionedModel
+from app.models import decode_cursor
+from app.models import encode_cursor
+from app.controllers.streaming import stream_response
+from app.aggregates import counters
+from app.engagement import engagement
+from app.feed import feed_cache
+from app.ranking import boosts_for
+from app.ranking import fetch_videos
+from app.ranking import ranking
+from app.signing import get_url
+from app.signing import sign_urls
+from app.writebehind import QueueFull
+from app.writebehind import write_behind
 import datetime
-import cachetools.func
-from google.cloud import storage
 from uuid import uuid4
 import os
 
 api = Namespace("api")
 
-@cachetools.func.ttl_cache(maxsize=128, ttl=29 * 60)
-def get_url(bucket_name, blob_name, cache, version, expiration=30, method=None, response_type=None, content_type=None, bucket_bound_hostname=None):
-    storage_client = storage.Client.from_service_account_json(
-        "auth.json"
-    ) 
-    bucket = storage_client.bucket(bucket_name)
-    blob = bucket.blob(blob_name)
-    return blob.generate_signed_url(
-        version=version,
-        expiration=expiration,
-        method=method,
-        response_type=response_type,
-        content_type=content_type,
-        bucket_bound_hostname=bucket_bound_hostname,
-    ), blob.public_url
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def page_args(default=DEFAULT_PAGE_SIZE):
+    """
+    Returns (cursor, page_size) from the query string, or None when the client
+    asked for neither.
+    """
+    if "cursor" not in request.args and "page_size" not in request.args:
+        return None
+    try:
+        page_size = int(request.args.get("page_size", default))
+    except ValueError:
+        api.abort(400, "page_size must be an integer")
+    return request.args.get("cursor"), max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def page_response(items, next_cursor):
+    """A page of items, with the cursor of the next page in X-Next-Cursor."""
+    return items, 200, {"X-Next-Cursor": next_cursor} if next_cursor else {}
+
+
+def model_page(model, cursor, page_size, overlay=None):
+    try:
+        models, next_cursor = model.get_page("*", cursor=cursor, page_size=page_size, records=True)
+    except ValueError as e:
+        api.abort(400, str(e))
+    if overlay:
+        models = overlay(models)
+    return page_response(models, next_cursor)
+
+
+def with_counts(videos):
+    """Video records as dicts with their view, clap and bookmark counts."""
+    return counters.overlay([x.get_for_api() for x in videos], [x.id for x in videos])
+
+
+def model_create(model):
+    """Saves the posted object, or every object of a posted array in bulk."""
+    body = request.get_json()
+    if isinstance(body, list):
+        return [x.get_for_api() for x in model.save_many([model(**item) for item in body])]
+    return model(**body).save().get_for_api()
+
+
+def queue_full_message(error, queued, items):
+    if len(items) == 1:
+        return str(error)
+    return f"{error}, the first {len(queued)} of {len(items)} events were queued"
+
+
+def model_event(model):
+    """
+    Like `model_create`, but with write-behind enabled the events are queued
+    and acknowledged with 202 before they reach the database. An event the
+    queue has no room for, or drops, is a 503.
+    """
+    if not write_behind.enabled:
+        return model_create(model)
+
+    body = request.get_json()
+    items = body if isinstance(body, list) else [body]
+    queued = []
+    try:
+        for item in items:
+            queued.append(write_behind.put(model(**item)).get_for_api())
+    except QueueFull as e:
+        api.abort(503, queue_full_message(e, queued, items))
+    return (queued if isinstance(body, list) else queued[0]), 202
+
+
+def model_list(model):
+    paging = page_args()
+    if paging:
+        return model_page(model, *paging)
+    return stream_response(model.get_all("*", stream=True, records=True))
 
 @dataclass
 class BucketObject:
@@ -38,7 +112,7 @@ class BucketObject:
     public_url: str
     id: str
 
-def generate_download_signed_url_v4(
+def download_signing_request(
         bucket_name: str,
         blob_name: str = None,
         timeout: int = 30,
@@ -48,14 +122,10 @@ def generate_download_signed_url_v4(
         is_uploading_video: bool = False,
         is_downloading_video: bool = False,
         content_type: str = "video/mp4",
-        method: str = "PUT") -> BucketObject:
-    """Generates a v4 signed URL for downloading a blob.
-
-    Note that this method requires a service account key file. You can not use
-    this if you are using Application Default Credentials from Google Compute
-    Engine or from the Google Cloud SDK.
-
-    Timeout is in minutes.
+        method: str = "PUT"):
+    """Builds the (bucket_name, blob_name, config) tuple that `get_url` and
+    `sign_urls` sign. Takes the same arguments as
+    `generate_download_signed_url_v4`.
     """
     if not blob_name:
         blob_name = access_code_generator()
@@ -82,7 +152,20 @@ def generate_download_signed_url_v4(
     if cdn_url:
         config["bucket_bound_hostname"] = cdn_url
 
-    url, public_url = get_url(bucket_name, blob_name, "True", **config)
+    return bucket_name, blob_name, config
+
+
+def generate_download_signed_url_v4(bucket_name: str, *args, **kwargs) -> BucketObject:
+    """Generates a v4 signed URL for downloading a blob.
+
+    Note that this method requires a service account key file. You can not use
+    this if you are using Application Default Credentials from Google Compute
+    Engine or from the Google Cloud SDK.
+
+    Timeout is in minutes.
+    """
+    bucket_name, blob_name, config = download_signing_request(bucket_name, *args, **kwargs)
+    url, public_url = get_url(bucket_name, blob_name, **config)
 
     return BucketObject(
         id=blob_name,
@@ -91,17 +174,16 @@ def generate_download_signed_url_v4(
     )
 
 
-def video_urls(video):
+def video_signing_requests(video):
+    """Returns the signing requests for a video's stream and captions.
+    Captions are None when the video has not been processed yet."""
     video_id = video.get("video_path")
-    signed_video = None
     signed_captions = None
-    signed_gif = None
-    signed_thumbnail = None
 
     # If the video was processed, return the processed stream, otherwise return the original str
     if video.get("update_complete"):
 
-        signed_video = generate_download_signed_url_v4(
+        signed_video = download_signing_request(
             bucket_name="development.videos.static.processed.claps.ai",
             blob_name=f"{video_id}/video.mp4",
             method="GET",
@@ -110,8 +192,18 @@ def video_urls(video):
             cdn_url=None
         )
 
+        signed_captions = download_signing_request(
+            bucket_name="development.videos.static.processed.claps.ai",
+            blob_name=f"{video_id}/subs.vtt",
+            method="GET",
+            is_downloading_video=True,
+            content_type="text/vtt",
+            timeout=120,  # 120 minutes,
+            cdn_url=None
+        )
+
     else:
-        signed_video = generate_download_signed_url_v4(
+        signed_video = download_signing_request(
             bucket_name="development.videos.static.claps.ai",
             blob_name=video_id,
             method="GET",
@@ -120,60 +212,153 @@ def video_urls(video):
             cdn_url=None#bucket_to_cdn("development.videos.static.claps.ai")
         )
 
-    if video.get("update_complete"):
-        signed_gif = ""#f"https://storage.googleapis.com/{current_app.config.get('GOOGLE_PUBLIC_BUCKET')}/{video_id}/preview.gif"
+    return signed_video, signed_captions
 
-        signed_thumbnail = ""#f"https://storage.googleapis.com/{current_app.config.get('GOOGLE_PUBLIC_BUCKET')}/{video_id}/thumb.png"
 
-        signed_captions = generate_download_signed_url_v4(
-            bucket_name="development.videos.static.processed.claps.ai",
-            blob_name=f"{video_id}/subs.vtt",
-            method="GET",
-            is_downloading_video=True,
-            content_type="text/vtt",
-            timeout=120,  # 120 minutes,
-            cdn_url=None
-        )
+def _bucket_object(signing_request, signed):
+    url, public_url = signed
+    return BucketObject(id=signing_request[1], signed_url=url, public_url=public_url)
+
+
+def page_signing_requests(videos):
+    """The signing requests of a whole page of videos, in order."""
+    requests = []
+    for video in videos:
+        signed_video, signed_captions = video_signing_requests(video)
+        requests.append(signed_video)
+        if signed_captions:
+            requests.append(signed_captions)
+    return requests
+
+
+def videos_urls(videos):
+    """Batched `video_urls`: signs the urls of a whole page of videos at once."""
+    requests = page_signing_requests(videos)
+    return page_urls(videos, requests, sign_urls(requests))
+
+
+def page_urls(videos, requests, urls):
+    """Pairs the signed `urls` of `page_signing_requests(videos)` back up with
+    their videos, as `video_urls` tuples."""
+    signed = iter(zip(requests, urls))
+
+    results = []
+    for video in videos:
+        signed_video = _bucket_object(*next(signed))
+        signed_gif = None
+        signed_thumbnail = None
+        signed_captions = None
+
+        if video.get("update_complete"):
+            signed_gif = ""#f"https://storage.googleapis.com/{current_app.config.get('GOOGLE_PUBLIC_BUCKET')}/{video_id}/preview.gif"
+
+            signed_thumbnail = ""#f"https://storage.googleapis.com/{current_app.config.get('GOOGLE_PUBLIC_BUCKET')}/{video_id}/thumb.png"
+
+            signed_captions = _bucket_object(*next(signed))
+
+        results.append((signed_video, signed_gif, signed_thumbnail, signed_captions))
+
+    return results
+
+
+def video_urls(video):
+    return videos_urls([video])[0]
+
+def feed_boosts(user_id):
+    """
+    Tag boosts of the feed: the configured FEED_BOOSTED_TAGS, or with
+    ?ranking=interests the interests of the user.
+    """
+    if request.args.get("ranking") == "interests":
+        user = User.get(user_id, key="id")
+        interests = getattr(user, "interest", None) or ""
+        return boosts_for(interests.split(","))
+    return boosts_for(current_app.config.get("FEED_BOOSTED_TAGS", "").split(","))
+
+
+def ranked_feed_page(boosts, cursor, page_size):
+    """
+    The part of the feed that is the same for every user with the same
+    boosts: a page of videos with their signed urls, and the cursor of the
+    next page.
+    """
+    video_ids, next_cursor = ranked_ids(boosts, cursor, page_size)
+    data = fetch_videos(ranking.table, video_ids)
+    return feed_page(data, videos_urls(data), next_cursor)
+
+
+def decode_feed_cursor(cursor):
+    """The (score, video_id) pair a feed cursor holds, or ValueError."""
+    after = decode_cursor(cursor)
+    if (
+        len(after) != 2
+        or isinstance(after[0], bool)
+        or not isinstance(after[0], (int, float))
+        or not isinstance(after[1], str)
+    ):
+        raise ValueError(f"Invalid cursor {cursor}")
+    return after
+
+
+def ranked_ids(boosts, cursor, page_size):
+    """The ids of a page of the ranking, and the cursor of the next page."""
+    after = decode_feed_cursor(cursor) if cursor else None
+    ranked = ranking.top(boosts, page_size + 1, after)
+    next_cursor = None
+    if len(ranked) > page_size:
+        ranked = ranked[:page_size]
+        next_cursor = encode_cursor(list(ranked[-1]))
+    return [video_id for _, video_id in ranked], next_cursor
+
+
+def feed_page(data, videos_urls, next_cursor):
+    for x, urls in zip(data, videos_urls):
+        x.update({
+            "url": urls[0].signed_url,
+            "gif": urls[1],
+            "thumbnail": urls[2],
+            # "captions": urls[3].signed_url
+        })
+
+    return {"items": data, "next_cursor": next_cursor}
+
+
+def feed_key(boosts, cursor, page_size):
+    return f"feed:{ranking.scoring}:{sorted(boosts.items())}:{page_size}:{cursor or ''}"
 
-    return (signed_video, signed_gif, signed_thumbnail, signed_captions)
 
 @api.route("/real")
 class RealController(Resource):
     def get(self):
-        query = """
-            select 
-                v.id,
-                v.video_path,
-                v.user_tag,
-                v.title, 
-                if(v2.id, true, false) as seen,
-                if(c.id, true, false) as clapped,
-                if(b.id, true, false) as bookmarked
-            from videos v 
-            left join views v2 on v2.video_id = v.id and (v2.user_id = '19973')
-            left join claps c on c.video_id = v.id and (c.user_id = '19973')
-            left join bookmarks b on b.video_id = v.id and (b.user_id = '19973')
-            order by field(v.user_tag, "data science") desc
-            limit 10 offset 0;            
-        """
-
-        data = VersionedModel.fetchall_dict(query)
-        for x in data:
-            urls = video_urls(x)
-            x.update({
-                "url": urls[0].signed_url,
-                "gif": urls[1],
-                "thumbnail": urls[2],
-                # "captions": urls[3].signed_url
-            })
-
-        return data
+        cursor, page_size = page_args(default=10) or (None, 10)
+        if cursor:
+            try:
+                decode_feed_cursor(cursor)
+            except ValueError as e:
+                api.abort(400, str(e))
+
+        user_id = request.args.get("user_id", "19973")
+        boosts = feed_boosts(user_id)
+        page = feed_cache.get_or_build(
+            feed_key(boosts, cursor, page_size),
+            lambda: ranked_feed_page(boosts, cursor, page_size),
+        )
+
+        video_ids = [x["id"] for x in page["items"]]
+        flags = engagement.flags(user_id, video_ids)
+        data = [dict(x, **flag) for x, flag in zip(page["items"], flags)]
+        counters.overlay(data, video_ids)
+
+        return page_response(data, page["next_cursor"])
 
 
 @api.route("")
 class VideoController(Resource):
     def get(self):
-        return [x.get_for_api() for x in Video.get_all("*", limit=5)]
+        paging = page_args()
+        if paging:
+            return model_page(Video, *paging, overlay=with_counts)
+        return with_counts(list(Video.get_all("*", limit=5, records=True)))
 
     def post(self):
         return Video(**request.get_json()).save().get_for_api()
@@ -182,36 +367,36 @@ class VideoController(Resource):
 @api.route("/view")
 class ViewController(Resource):
     def get(self):
-        return [x.get_for_api() for x in View.get_all("*")]
+        return model_list(View)
 
     def post(self):
-        return View(**request.get_json()).save().get_for_api()
+        return model_event(View)
 
 
 @api.route("/clap")
 class ClapController(Resource):
     def get(self):
-        return [x.get_for_api() for x in Clap.get_all("*")]
+        return model_list(Clap)
 
     def post(self):
-        return Clap(**request.get_json()).save().get_for_api()
+        return model_event(Clap)
 
 
 
 @api.route("/bookmark")
 class BookmarkController(Resource):
     def get(self):
-        return [x.get_for_api() for x in Bookmark.get_all("*")]
+        return model_list(Bookmark)
 
     def post(self):
-        return Bookmark(**request.get_json()).save().get_for_api()
+        return model_create(Bookmark)
 
 
 
 @api.route("/user")
 class UserController(Resource):
     def get(self):
-        return [x.get_for_api() for x in User.get_all("*")]
+        return model_list(User)
 
     def post(self):
         return User(**request.get_json()).save().get_for_api()
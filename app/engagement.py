@@ -0,0 +1,177 @@
+import logging
+import time
+from collections import defaultdict
+from threading import Event
+from threading import Lock
+from threading import Thread
+
+from app.models import query as queries
+from app.models.video import Bookmark
+from app.models.video import Clap
+from app.models.video import View
+
+FLAGS = {
+    "seen": View,
+    "clapped": Clap,
+    "bookmarked": Bookmark,
+}
+
+
+class EngagementIndex:
+    """
+    In-memory sets of the videos every user has seen, clapped and bookmarked.
+
+    The index is built from the current rows of the View, Clap and Bookmark
+    tables, the ones the event endpoints write, by `start`, which `warm_up`
+    calls, or else the first lookup in the background, and kept current by
+    the save listeners of those models, so the feed can fill in its flags for
+    a page of videos without joining the event tables. Saves recorded while a
+    build runs are replayed on the new index. Until it is built, lookups
+    query the event tables. Writes made by other workers show up after the
+    next rebuild, every `refresh_interval` seconds.
+    """
+
+    def __init__(self, refresh_interval=300):
+        self.refresh_interval = refresh_interval
+        self.enabled = True
+        self.loaded = False
+        self.app = None
+        self._started = False
+        self._index = {flag: defaultdict(set) for flag in FLAGS}
+        self._lock = Lock()
+        # (flag, entities) recorded while a build runs, None otherwise
+        self._pending = None
+        self._stop = Event()
+        self._thread = None
+        self.load_seconds = 0.0
+        for flag, model in FLAGS.items():
+            model.on_save(lambda entities, flag=flag: self.record(flag, entities))
+
+    def init_app(self, app):
+        self.app = app
+        self.refresh_interval = app.config.get("ENGAGEMENT_INDEX_REFRESH_INTERVAL", self.refresh_interval)
+        self.enabled = app.config.get("ENGAGEMENT_INDEX_ENABLED", True)
+
+    def start(self, background=False):
+        """Builds the index and starts its refresh thread, once."""
+        with self._lock:
+            if self._started or not self.enabled or self.app is None:
+                return
+            self._started = True
+        if background:
+            Thread(target=self._start, name="engagement-index-load", daemon=True).start()
+        else:
+            self._start()
+
+    def _start(self):
+        with self.app.app_context():
+            self.load()
+        if self.refresh_interval:
+            self._thread = Thread(target=self._refresh, name="engagement-index", daemon=True)
+            self._thread.start()
+
+    def load(self):
+        started = time.perf_counter()
+        index = {flag: defaultdict(set) for flag in FLAGS}
+        with self._lock:
+            self._pending = []
+        try:
+            for flag, model in FLAGS.items():
+                query = queries.select(model.__tablename__, "user_id, video_id")
+                rows = model.iter_rows(query)
+                next(rows)
+                for user_id, video_id in rows:
+                    index[flag][user_id].add(video_id)
+        except Exception as e:
+            with self._lock:
+                self._pending = None
+            logging.error(f"Could not build the engagement index: {e}")
+            return False
+        with self._lock:
+            self._index = index
+            pending, self._pending = self._pending, None
+            for flag, entities in pending:
+                self._apply(flag, entities)
+            self.loaded = True
+        self.load_seconds = time.perf_counter() - started
+        logging.info(f"Built the engagement index in {self.load_seconds:.2f}s")
+        return True
+
+    def _refresh(self):
+        while not self._stop.wait(self.refresh_interval):
+            with self.app.app_context():
+                self.load()
+
+    def record(self, flag, entities):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((flag, entities))
+            self._apply(flag, entities)
+
+    def _apply(self, flag, entities):
+        users = self._index[flag]
+        for entity in entities:
+            user_id = getattr(entity, "user_id", None)
+            video_id = getattr(entity, "video_id", None)
+            if entity.active:
+                users[user_id].add(video_id)
+            else:
+                users[user_id].discard(video_id)
+
+    def flags(self, user_id, video_ids):
+        """Returns {flag: bool} for each of `video_ids`, in order."""
+        if self.loaded:
+            sets = {flag: users.get(user_id, ()) for flag, users in self._index.items()}
+        else:
+            self.start(background=True)
+            sets = self._query(user_id, video_ids)
+        return [
+            {flag: video_id in videos for flag, videos in sets.items()}
+            for video_id in video_ids
+        ]
+
+    async def aflags(self, user_id, video_ids):
+        """`flags` for the async entry point."""
+        if self.loaded:
+            return self.flags(user_id, video_ids)
+        self.start(background=True)
+        sets = await self._aquery(user_id, video_ids)
+        return [
+            {flag: video_id in videos for flag, videos in sets.items()}
+            for video_id in video_ids
+        ]
+
+    @staticmethod
+    def _flag_query(model):
+        return queries.select(model.__tablename__, "video_id", where=(("user_id", "="), ("video_id", "IN")))
+
+    @classmethod
+    def _query(cls, user_id, video_ids):
+        if not video_ids:
+            return {flag: set() for flag in FLAGS}
+        sets = {}
+        for flag, model in FLAGS.items():
+            rows = model.fetchall_dict(cls._flag_query(model), (user_id, tuple(video_ids)))
+            sets[flag] = {row["video_id"] for row in rows}
+        return sets
+
+    @classmethod
+    async def _aquery(cls, user_id, video_ids):
+        if not video_ids:
+            return {flag: set() for flag in FLAGS}
+        sets = {}
+        for flag, model in FLAGS.items():
+            rows = await model.afetchall_dict(cls._flag_query(model), (user_id, tuple(video_ids)))
+            sets[flag] = {row["video_id"] for row in rows}
+        return sets
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "load_seconds": self.load_seconds,
+            "users": {flag: len(users) for flag, users in self._index.items()},
+            "entries": {flag: sum(len(x) for x in users.values()) for flag, users in self._index.items()},
+        }
+
+
+engagement = EngagementIndex()
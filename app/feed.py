@@ -0,0 +1,127 @@
+import asyncio
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+class FeedCache:
+    """
+    Caches ranked feed pages, which are the same for every user, for `ttl`
+    seconds. Per-user data is overlaid on the cached page by the caller on
+    every request. Only one request per page rebuilds an expired entry, the
+    others wait for it instead of hitting the database and the signer too.
+    """
+
+    def __init__(self, ttl=30, maxsize=1024, backend=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.backend = backend
+        self._pages = OrderedDict()
+        self._lock = Lock()
+        self._build_locks = {}
+        self._async_builds = {}
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def init_app(self, app, backend=None):
+        self.ttl = app.config.get("FEED_CACHE_TTL", self.ttl)
+        self.maxsize = app.config.get("FEED_CACHE_SIZE", self.maxsize)
+        self.backend = backend
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is not None:
+                expires_at, page = entry
+                if expires_at > time.monotonic():
+                    self._pages.move_to_end(key)
+                    self.hits += 1
+                    return page
+                del self._pages[key]
+        if self.backend is not None:
+            page = self.backend.get(key)
+            if page is not None:
+                self.shared_hits += 1
+                self._set_local(key, page)
+                return page
+        return None
+
+    def _set_local(self, key, page):
+        with self._lock:
+            self._pages[key] = (time.monotonic() + self.ttl, page)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.maxsize:
+                self._pages.popitem(last=False)
+
+    def get_or_build(self, key, build):
+        """Returns the cached page for `key`, or caches and returns build()."""
+        if not self.ttl:
+            return build()
+        page = self._get(key)
+        if page is not None:
+            return page
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, Lock())
+        with build_lock:
+            page = self._get(key)
+            if page is None:
+                self.misses += 1
+                page = build()
+                self._set_local(key, page)
+                if self.backend is not None:
+                    self.backend.set(key, page, self.ttl)
+        with self._lock:
+            self._build_locks.pop(key, None)
+        return page
+
+    async def aget_or_build(self, key, build):
+        """
+        `get_or_build` for the async entry point, where `build` is a coroutine
+        function. Requests for a page that is being built await the same
+        build instead of blocking the event loop on a lock.
+        """
+        if not self.ttl:
+            return await build()
+        page = self._get(key)
+        if page is not None:
+            return page
+
+        task = self._async_builds.get(key)
+        if task is None:
+            task = self._async_builds[key] = asyncio.ensure_future(self._abuild(key, build))
+        return await asyncio.shield(task)
+
+    async def _abuild(self, key, build):
+        try:
+            page = self._get(key)
+            if page is None:
+                self.misses += 1
+                page = await build()
+                self._set_local(key, page)
+                if self.backend is not None:
+                    self.backend.set(key, page, self.ttl)
+            return page
+        finally:
+            self._async_builds.pop(key, None)
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "ttl": self.ttl,
+            "size": len(self._pages),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+        }
+
+
+feed_cache = FeedCache()
@@ -0,0 +1,118 @@
+import logging
+import time
+from threading import Event
+from threading import Lock
+
+from app import db
+
+
+class _Group:
+    def __init__(self):
+        self.items = []
+        self.full = Event()
+        self.done = Event()
+        self.error = None
+
+
+class GroupCommit:
+    """
+    Commits the saves of concurrent requests together.
+
+    The first `save` to arrive leads a group: it waits up to `window` seconds
+    for other saves to join, or until `max_batch` have, then writes the whole
+    group with `save_prepared` in one transaction and wakes the others. Every
+    save in a group shares its outcome, so when the write fails, all of them
+    raise. Saves of one entity in a group are chained in the order they
+    joined, see `VersionedModel.chain_versions`, so only the last one is
+    latest.
+    """
+
+    def __init__(self, window=0.002, max_batch=100):
+        self.window = window
+        self.max_batch = max_batch
+        self.enabled = False
+        self._lock = Lock()
+        self._pending = None
+        self.saves = 0
+        self.groups = 0
+        self.failed = 0
+        self.group_size_max = 0
+        self.write_seconds = 0.0
+
+    def init_app(self, app):
+        self.enabled = app.config.get("GROUP_COMMIT_ENABLED", False)
+        self.window = app.config.get("GROUP_COMMIT_WINDOW", self.window)
+        self.max_batch = app.config.get("GROUP_COMMIT_MAX_BATCH", self.max_batch)
+
+    def save(self, new_entity, updated):
+        """Writes a (new_entity, updated) pair from `prepare_save` with the
+        next group and returns `new_entity` once the group committed."""
+        with self._lock:
+            group = self._pending
+            leader = group is None
+            if leader:
+                group = self._pending = _Group()
+            group.items.append((new_entity, updated))
+            if len(group.items) >= self.max_batch:
+                self._pending = None
+                group.full.set()
+
+        if leader:
+            group.full.wait(self.window)
+            with self._lock:
+                if self._pending is group:
+                    self._pending = None
+            self._write(group)
+        else:
+            group.done.wait()
+
+        if group.error is not None:
+            raise group.error
+        return new_entity
+
+    def _write(self, group):
+        started = time.perf_counter()
+        by_model = {}
+        for prepared in group.items:
+            by_model.setdefault(prepared[0].__class__, []).append(prepared)
+
+        try:
+            with db.connection() as connection:
+                try:
+                    for model, prepared in by_model.items():
+                        model.save_prepared(prepared, connection=connection, commit=False)
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+        except Exception as e:
+            logging.error(f"Group commit of {len(group.items)} saves failed: {e}")
+            group.error = e
+        else:
+            for model, prepared in by_model.items():
+                model.after_save([x for x, _ in prepared])
+        finally:
+            group.done.set()
+
+        with self._lock:
+            self.saves += len(group.items)
+            self.groups += 1
+            self.failed += len(group.items) if group.error is not None else 0
+            self.group_size_max = max(self.group_size_max, len(group.items))
+            self.write_seconds += time.perf_counter() - started
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "window": self.window,
+            "max_batch": self.max_batch,
+            "saves": self.saves,
+            "groups": self.groups,
+            "failed": self.failed,
+            "group_size_avg": self.saves / self.groups if self.groups else 0.0,
+            "group_size_max": self.group_size_max,
+            "write_seconds_avg": self.write_seconds / self.groups if self.groups else 0.0,
+        }
+
+
+group_commit = GroupCommit()
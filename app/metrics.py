@@ -0,0 +1,138 @@
+"""
+Request instrumentation.
+
+`metrics.span(name)` times a block of the hot path: SQL (with the statement
+as its shape), row materialization, URL signing and response encoding. Every
+span is observed in a latency histogram, and inside a request also summed
+per name in `flask.g`, which becomes the Server-Timing header of the
+response. Requests are observed per route. `/metrics` exposes the
+histograms in the Prometheus text format, to requests with the admin token,
+see app.adminauth.
+"""
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+from flask import Response
+from flask import g
+from flask import has_request_context
+from flask import request
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames, buckets=BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in series:
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels))
+            prefix = label_text + "," if label_text else ""
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.server_timing = True
+        self.request_seconds = Histogram(
+            "http_request_duration_seconds", "Request latency per route.", ("route", "method", "status")
+        )
+        self.span_seconds = Histogram("span_duration_seconds", "Hot path latency per span.", ("span",))
+        self.sql_seconds = Histogram("sql_duration_seconds", "SQL latency per statement shape.", ("statement",))
+
+    def init_app(self, app):
+        self.enabled = app.config.get("METRICS_ENABLED", False)
+        self.server_timing = app.config.get("METRICS_SERVER_TIMING", self.server_timing)
+        if not self.enabled:
+            return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule("/metrics", "metrics", self.metrics_view)
+
+    @contextmanager
+    def span(self, name, statement=None):
+        """
+        Times the block as span `name`. SQL spans pass their statement, whose
+        text is parameterized and so is the shape of the query.
+        """
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.span_seconds.observe(elapsed, name)
+            if statement is not None:
+                self.sql_seconds.observe(elapsed, statement)
+            if has_request_context():
+                spans = g.get("_spans")
+                if spans is not None:
+                    entry = spans.setdefault(name, [0, 0.0])
+                    entry[0] += 1
+                    entry[1] += elapsed
+
+    def _before_request(self):
+        g._request_started = time.perf_counter()
+        g._spans = {}
+
+    def _after_request(self, response):
+        started = g.get("_request_started")
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        self.request_seconds.observe(elapsed, route, request.method, response.status_code)
+
+        if self.server_timing:
+            timings = [
+                f'{name};dur={seconds * 1000:.2f};desc="{count}x"'
+                for name, (count, seconds) in g.get("_spans", {}).items()
+            ]
+            timings.append(f"total;dur={elapsed * 1000:.2f}")
+            response.headers["Server-Timing"] = ", ".join(timings)
+        return response
+
+    def render(self):
+        lines = []
+        for histogram in (self.request_seconds, self.span_seconds, self.sql_seconds):
+            lines += histogram.render()
+        return "\n".join(lines) + "\n"
+
+    def metrics_view(self):
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+
+metrics = Metrics()
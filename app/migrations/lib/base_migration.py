@@ -1,12 +1,18 @@
+import re
+
 from app import db, create_app
+from app.migrations.lib.schema import existing_indexes
+from app.migrations.lib.schema import index_columns
+
+VARCHAR_LENGTH = re.compile(r"varchar\((\d+)\)", re.IGNORECASE)
 
 
 class BaseMigration:
     def __init__(self):
         self.connection = None
-        self.app = create_app()
-        with self.app.app_context():
-            self.connection = db.connect
+        self.app = create_app(cli=True)
+        # Held for the whole migration, never returned to the pool.
+        self.connection = db.acquire().connection
 
     def _does_column_exist(self, table_name, column_name):
         schema_name = self.app.config.get('MYSQL_DATABASE')
@@ -35,12 +41,111 @@ class BaseMigration:
         query = f"""ALTER TABLE {table_name} DROP {column_name};"""
         self.execute(query)
 
-    def alter_index(self, table_name, new_index_name, new_indexed_column, old_index_name):
-        query = f"""ALTER TABLE {table_name} ADD INDEX {new_index_name} ({new_indexed_column}), DROP INDEX {old_index_name};"""
+    def alter_index(self, table_name, new_index_name, new_indexed_column, old_index_name=None, online=True):
+        """Adds an index, dropping `old_index_name` in the same statement. Runs
+        as an online DDL, so the table stays readable and writable while the
+        index builds; MySQL refuses rather than locks when it can't."""
+        changes = []
+        if old_index_name:
+            changes.append(f"DROP INDEX {old_index_name}")
+        changes.append(f"ADD INDEX {new_index_name} ({new_indexed_column})")
+        if online:
+            changes.append("ALGORITHM=INPLACE, LOCK=NONE")
+        query = f"""ALTER TABLE {table_name} {', '.join(changes)};"""
+        self.execute(query)
+
+    def drop_index(self, table_name, index_name):
+        query = f"""ALTER TABLE {table_name} DROP INDEX {index_name}, ALGORITHM=INPLACE, LOCK=NONE;"""
         self.execute(query)
 
-    def alter_column(self, table_name, column_name, datatype):
-        query = f"""ALTER TABLE {table_name} MODIFY COLUMN {column_name} {datatype};"""
+    def split_history(self, table_name):
+        """
+        Moves a versioned table to split history storage: the table, with
+        every version, becomes `<table_name>_history`, and a new `table_name`
+        keyed by entity_id holds the latest version of every entity.
+
+        The backfill runs while the table takes writes, and the versions it
+        copied are set aside. Then, with writes to the table locked out, the
+        latest rows it does not have yet are copied over and the tables are
+        swapped with one RENAME, so no write is lost; writes only wait for
+        that last copy. Renaming locked tables needs MySQL 8.0.13 or later.
+        The history table ends up as migrate.py creates it for a new model:
+        no secondary indexes, and no row latest.
+        """
+        current = f"{table_name}_current"
+        backfilled = f"{table_name}_backfilled"
+        history = f"{table_name}_history"
+        self.execute(f"""DROP TABLE IF EXISTS {current}, {backfilled};""")
+        self.execute(f"""CREATE TABLE {current} LIKE {table_name};""")
+        self.execute(f"""ALTER TABLE {current} DROP PRIMARY KEY, ADD PRIMARY KEY (entity_id);""")
+        self.execute(f"""INSERT IGNORE INTO {current} SELECT * FROM {table_name} WHERE latest = true;""")
+        self.execute(f"""
+            CREATE TABLE {backfilled} (PRIMARY KEY (entity_id, version))
+            SELECT entity_id, version FROM {current};
+        """)
+
+        self.execute(f"""LOCK TABLES {table_name} WRITE, {current} WRITE, {backfilled} READ;""")
+        try:
+            self.execute(f"""
+                REPLACE INTO {current}
+                SELECT {table_name}.* FROM {table_name}
+                LEFT JOIN {backfilled}
+                    ON {backfilled}.entity_id = {table_name}.entity_id
+                    AND {backfilled}.version = {table_name}.version
+                WHERE {table_name}.latest = true AND {backfilled}.entity_id IS NULL;
+            """)
+            self.execute(f"""RENAME TABLE {table_name} TO {history}, {current} TO {table_name};""")
+        finally:
+            self.execute("""UNLOCK TABLES;""")
+        self.execute(f"""DROP TABLE {backfilled};""")
+
+        indexes = self._indexes(history)
+        if indexes:
+            drops = ", ".join(f"DROP INDEX {name}" for name in indexes)
+            self.execute(f"""ALTER TABLE {history} {drops}, ALGORITHM=INPLACE, LOCK=NONE;""")
+        self.execute(f"""UPDATE {history} SET latest = false WHERE latest = true;""")
+
+    def merge_history(self, table_name):
+        """Reverts `split_history`: the history table, with the indexes of
+        the current table and its latest flags recomputed from it, becomes
+        `table_name` again."""
+        history = f"{table_name}_history"
+        for name, columns in self._indexes(table_name).items():
+            self.alter_index(history, name, index_columns(columns))
+        self.execute(f"""
+            UPDATE {history} h JOIN {table_name} c ON h.entity_id = c.entity_id
+            SET h.latest = (h.version = c.version);
+        """)
+        self.execute(f"""RENAME TABLE {table_name} TO {table_name}_current, {history} TO {table_name};""")
+        self.execute(f"""DROP TABLE {table_name}_current;""")
+
+    def _indexes(self, table_name):
+        with self.connection.cursor() as cursor:
+            return existing_indexes(cursor, table_name)
+
+    def alter_column(self, table_name, column_name, datatype, online=True):
+        """
+        Changes the type of a column. With `online` it runs as an online DDL,
+        and MySQL refuses rather than locks when the change needs a table
+        copy. A change of data type, like TEXT to VARCHAR, always does: pass
+        `online=False` to copy the table with reads allowed and writes
+        blocked until it is done. On a table too big to stop writing to, run
+        the same change through an online schema change tool instead, such as
+        gh-ost or pt-online-schema-change, and only the version update here.
+
+        Narrowing to a VARCHAR aborts before the ALTER when a value is longer
+        than it keeps, rather than leaving MySQL to refuse or truncate it.
+        """
+        length = VARCHAR_LENGTH.fullmatch(datatype.strip())
+        if length:
+            longest = self.execute(f"""SELECT MAX(CHAR_LENGTH({column_name})) FROM {table_name};""")[0][0]
+            if longest is not None and longest > int(length.group(1)):
+                raise ValueError(
+                    f"{table_name}.{column_name} holds values of {longest} characters, "
+                    f"more than {datatype} keeps; shorten them before this migration"
+                )
+        algorithm = "ALGORITHM=INPLACE, LOCK=NONE" if online else "ALGORITHM=COPY, LOCK=SHARED"
+        query = f"""ALTER TABLE {table_name} MODIFY COLUMN {column_name} {datatype}, {algorithm};"""
         self.execute(query)
 
     def change_column_name(self, table_name, old_column_name, new_column_name):
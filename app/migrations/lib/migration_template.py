@@ -1,4 +1,4 @@
-def get_template(new_version, current_db_version):
+def get_template(new_version, current_db_version, upgrade="", downgrade=""):
     return f"""
 from lib.base_migration import BaseMigration
 
@@ -10,11 +10,11 @@ migration = BaseMigration()
 
 def upgrade():
     # write migration here
-    migration.update_version_table(version=revision)
+{upgrade}    migration.update_version_table(version=revision)
 
 
 def downgrade():
     # write migration here
-    migration.update_version_table(version=down_revision)
+{downgrade}    migration.update_version_table(version=down_revision)
 
 """
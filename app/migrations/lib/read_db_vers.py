@@ -2,7 +2,7 @@ from app import db, create_app
 
 
 def get_version(commit=True):
-    app = create_app()
+    app = create_app(cli=True)
     with app.app_context():
         connection = db.connect
         query = f"""SELECT version from db_version;"""
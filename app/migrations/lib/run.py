@@ -36,7 +36,7 @@ def get_db_version():
     return f'{int(db_version):010d}'
 
 
-def create_migration_file():
+def create_migration_file(upgrade="", downgrade=""):
     try:
         current_db_version = int(get_version())
     except:
@@ -46,9 +46,10 @@ def create_migration_file():
     current_db_version = f'{current_db_version:010d}'
     new_version = f'{new_version:010d}'
     file_name = f"{new_version}_{current_db_version}_migration.py"
-    template = get_template(new_version, current_db_version)
+    template = get_template(new_version, current_db_version, upgrade, downgrade)
     with open(os.path.join(MIGRATION_DIR, file_name), 'w') as fp:
         fp.write(template)
+    return file_name
 
 
 def run_forward_migration_script(old_db_version):
@@ -0,0 +1,168 @@
+"""
+Table and index definitions derived from the model classes.
+
+Every model declares its indexes in `__indexes__` (name -> columns) and may
+override column types in `__column_types__`. `create_table_sql` turns that
+into a CREATE TABLE statement, and `schema_changes` diffs it against an
+existing table so `migrate.py` can write the ALTERs as a migration.
+"""
+
+BASE_COLUMNS = """
+    `entity_id` varchar(32) NOT NULL,
+    `version` varchar(32) NOT NULL,
+    `previous_version` varchar(32) DEFAULT '00000000000000000000000000000000',
+    `active` tinyint(1) DEFAULT '1',
+    `latest` tinyint(1) DEFAULT '1',
+    `changed_by_id` varchar(32) DEFAULT NULL,
+    `changed_on` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+"""
+
+ID_TYPE = "VARCHAR(64)"
+STRING_TYPE = "VARCHAR(255)"
+
+
+def column_type(model, field, annotation):
+    """The SQL type of a model field: ids and short strings are VARCHARs so
+    they can be indexed, TEXT only where the model asks for it."""
+    if field in model.__column_types__:
+        return model.__column_types__[field]
+    if annotation is bool:
+        return "TINYINT"
+    if annotation is int:
+        return "INTEGER"
+    if field == "id" or field.endswith("_id"):
+        return ID_TYPE
+    return STRING_TYPE
+
+
+def model_columns(model):
+    """Field name -> SQL type of the fields the model declares itself."""
+    return {
+        field: column_type(model, field, annotation)
+        for field, annotation in model.__dict__.get("__annotations__", {}).items()
+    }
+
+
+def model_indexes(model):
+    """Index name -> columns, merged over the MRO so subclasses extend the
+    indexes of VersionedModel."""
+    indexes = {}
+    for klass in reversed(model.__mro__):
+        indexes.update(klass.__dict__.get("__indexes__", {}))
+    return {name: tuple(columns) for name, columns in indexes.items()}
+
+
+def index_columns(columns):
+    return ", ".join(f"`{x}`" for x in columns)
+
+
+def create_table_sql(model, history=False):
+    """
+    The CREATE TABLE of the model's table, or with `history` of its history
+    table. With __split_history__ the model's table holds one row per
+    entity_id; the history table is append-only and has no other indexes.
+    """
+    table, primary_key, indexes = model.__tablename__, "`entity_id`,`version`", model_indexes(model)
+    if history:
+        table, indexes = model.history_table(), {}
+    elif model.__split_history__:
+        primary_key = "`entity_id`"
+
+    create = BASE_COLUMNS
+    for field, sql_type in model_columns(model).items():
+        create += f"    `{field}` {sql_type},\n"
+
+    create += f"    PRIMARY KEY ({primary_key})"
+    for name, columns in indexes.items():
+        create += f",\n    INDEX {name} ({index_columns(columns)})"
+
+    return f"create table {table} (\n{create}\n)"
+
+
+def existing_columns(cursor, table):
+    """Column name -> type of an existing table, as DESCRIBE reports it."""
+    cursor.execute(f"DESCRIBE {table}")
+    return {x[0]: x[1] for x in cursor.fetchall()}
+
+
+def existing_indexes(cursor, table):
+    """Index name -> columns of an existing table, without the primary key."""
+    cursor.execute(f"SHOW INDEX FROM {table}")
+    indexes = {}
+    for row in sorted(cursor.fetchall(), key=lambda x: (x[2], x[3])):
+        key_name, column_name = row[2], row[4]
+        if key_name != "PRIMARY":
+            indexes.setdefault(key_name, []).append(column_name)
+    return {name: tuple(columns) for name, columns in indexes.items()}
+
+
+def schema_changes(model, columns, indexes, has_history=False):
+    """
+    The changes that bring an existing table up to the model, as two lists of
+    (method, kwargs) calls on BaseMigration: upgrade and downgrade.
+
+    TEXT columns that should be VARCHARs are converted first, because the
+    indexes on them cannot be built before. The conversion copies the table
+    and blocks its writes meanwhile, and aborts if a value is too long for
+    the VARCHAR, see BaseMigration.alter_column. Indexes the table lacks, or
+    has with other columns, are (re)built with `alter_index`, which runs online.
+    Indexes the model no longer declares are left alone. A model that opted
+    into __split_history__ without a history table yet is split first, see
+    BaseMigration.split_history.
+    """
+    table = model.__tablename__
+    upgrade, downgrade = [], []
+
+    split = model.__split_history__ and not has_history
+    if split:
+        upgrade.append(("split_history", dict(table_name=table)))
+
+    # Column changes apply to the history table too, it takes the same inserts
+    tables = (table, model.history_table()) if model.__split_history__ else (table,)
+    for field, sql_type in model_columns(model).items():
+        current = columns.get(field)
+        for name in tables:
+            if current is None:
+                upgrade.append(("add_column", dict(table_name=name, column_name=field, datatype=sql_type)))
+                downgrade.insert(0, ("drop_column", dict(table_name=name, column_name=field)))
+            elif current.lower() == "text" and sql_type != "TEXT":
+                upgrade.append(("alter_column", dict(table_name=name, column_name=field, datatype=sql_type, online=False)))
+                downgrade.insert(0, ("alter_column", dict(table_name=name, column_name=field, datatype="TEXT", online=False)))
+
+    for name, wanted in model_indexes(model).items():
+        current = indexes.get(name)
+        if current == wanted:
+            continue
+        upgrade.append((
+            "alter_index",
+            dict(
+                table_name=table,
+                new_index_name=name,
+                new_indexed_column=index_columns(wanted),
+                old_index_name=name if current else None,
+            ),
+        ))
+        if current:
+            undo = dict(
+                table_name=table,
+                new_index_name=name,
+                new_indexed_column=index_columns(current),
+                old_index_name=name,
+            )
+            downgrade.insert(0, ("alter_index", undo))
+        else:
+            downgrade.insert(0, ("drop_index", dict(table_name=table, index_name=name)))
+
+    # Indexes go before the columns they cover are reverted to TEXT.
+    downgrade.sort(key=lambda x: x[0] not in ("alter_index", "drop_index"))
+    if split:
+        downgrade.append(("merge_history", dict(table_name=table)))
+    return upgrade, downgrade
+
+
+def render_calls(calls):
+    """The body of an upgrade/downgrade function making the `calls`."""
+    return "".join(
+        f"    migration.{method}({', '.join(f'{k}={v!r}' for k, v in kwargs.items())})\n"
+        for method, kwargs in calls
+    )
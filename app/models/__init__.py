@@ -1,20 +1,77 @@
 from __future__ import annotations
 
+import base64
 import copy
 import inspect
 import json
+import logging
+import time
+import traceback
+from contextlib import contextmanager
 from datetime import datetime, date
+from decimal import Decimal
 from typing import List, Dict
 from uuid import uuid4, UUID
 from json import dumps
 
+from pymysql.cursors import SSCursor
+
 from app import db
+from app.aio.pool import aio_db
+from app.models import query as queries
+from app.models import records as model_records
+from app.models.entity_cache import entity_cache
+from app.groupcommit import group_commit
+from app.metrics import metrics
+from app.profiler import profiler
 from flask import current_app, g
 
 
 def default_for_dumps(o):
     if isinstance(o, (date, datetime)):
         return o.isoformat()
+    if isinstance(o, UUID):
+        return str(o)
+    if isinstance(o, Decimal):
+        return float(o)
+    if hasattr(o, "get_for_api"):
+        return o.get_for_api()
+    raise TypeError(f"Object of type {o.__class__.__name__} is not JSON serializable")
+
+
+@contextmanager
+def traced(cursor, sql, params=None, rows=True):
+    """
+    Times a statement run on `cursor` for the metrics and the query profiler.
+    Without `rows` (unbuffered cursors) no row count is recorded.
+    """
+    started = time.perf_counter()
+    with metrics.span("db", sql):
+        yield
+    profiler.record(sql, time.perf_counter() - started, cursor.rowcount if rows else None, cursor, params)
+
+
+def encode_cursor(values):
+    """Packs the sort key of the last row of a page into an opaque token."""
+    return base64.urlsafe_b64encode(dumps(values, default=default_for_dumps).encode()).decode()
+
+
+def decode_cursor(token):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except ValueError:
+        raise ValueError(f"Invalid cursor {token}")
+    if not isinstance(values, list):
+        raise ValueError(f"Invalid cursor {token}")
+    return values
+
+
+def decode_page_cursor(token):
+    """The entity_id a `get_page` cursor holds, or ValueError."""
+    after = decode_cursor(token)
+    if len(after) != 1 or not isinstance(after[0], str):
+        raise ValueError(f"Invalid cursor {token}")
+    return after[0]
 
 
 class VersionedModel:
@@ -26,6 +83,19 @@ class VersionedModel:
 
     __abstract__ = True
     __empty_version__ = "00000000000000000000000000000000"
+    # Index name -> indexed columns. migrate.py creates the indexes of every
+    # class in the MRO, so subclasses only declare their own.
+    __indexes__ = {
+        "latest_ind": ("entity_id", "latest", "active"),
+        "latest_active_ind": ("latest", "active", "entity_id"),
+    }
+    # Field name -> column type, for fields the default mapping gets wrong.
+    __column_types__ = {}
+    # With __split_history__, __tablename__ holds only the current version of
+    # every entity, keyed by entity_id, and every version is appended to
+    # history_table() with latest = false. Reads never see the history. Needs
+    # the migration that migrate.py writes for it.
+    __split_history__ = False
 
     entity_id: str
     version: str
@@ -55,7 +125,7 @@ class VersionedModel:
         self.changed_by_id = changed_by_id
         self.changed_on = changed_on
 
-        [setattr(self, k, v) for k, v in kwargs.items()]
+        self.__dict__.update(kwargs)
 
     @classmethod
     def annotations(cls):
@@ -67,29 +137,85 @@ class VersionedModel:
     def build_model(cls, model):
         o = cls()
         if model:
-            for k, v in model.items():
-                setattr(o, k, v)
+            o.__dict__.update(model)
             return o
 
+    @classmethod
+    def history_table(cls):
+        return f"{cls.__tablename__}_history"
+
+    @classmethod
+    def record_class(cls):
+        """The slotted record class `get_all(records=True)` yields."""
+        return model_records.record_class(cls)
+
     def create_in_database(self, cursor):
         try:
             # Create a new instance
-            fieldnames = [x for x in self.annotations() if hasattr(self, x)]
-            sql = "INSERT INTO {} ({}) VALUES ({})".format(
-                self.__tablename__,
-                ",".join(fieldnames),
-                ",".join(["%s"] * len(fieldnames)),
-            )
-
-            cursor.execute(sql, tuple(getattr(self, x) for x in fieldnames))
+            fieldnames = tuple(x for x in self.annotations() if hasattr(self, x))
+            values = tuple(getattr(self, x) for x in fieldnames)
+            for sql, params in self.insert_statements(fieldnames, values):
+                with traced(cursor, sql, params):
+                    cursor.execute(sql, params)
 
         except Exception as e:
             traceback.print_exc()
             logging.error(cursor._last_executed)
             logging.error(f"Error in SQL:\n {e}")
+            raise
+
+    @classmethod
+    def insert_groups(cls, data):
+        """(fieldnames, rows of values) of `data`, a list of models of this
+        class, grouped by the fields they populate."""
+        groups = {}
+        for model in data:
+            fieldnames = tuple(x for x in cls.annotations() if hasattr(model, x))
+            groups.setdefault(fieldnames, []).append(model)
+        return [
+            (fieldnames, [tuple(getattr(model, x) for x in fieldnames) for model in models])
+            for fieldnames, models in groups.items()
+        ]
 
     def create_multiple_in_database(self, cursor, data):
-        raise NotImplementedError
+        """
+        Inserts `data`, a list of models of this class, with one multi-row
+        INSERT per distinct set of populated fields.
+        """
+        for fieldnames, values in self.insert_groups(data):
+            try:
+                # PyMySQL rewrites INSERT ... VALUES into a single multi-row statement
+                for sql, rows in self.insert_statements(fieldnames, values, many=True):
+                    with traced(cursor, sql):
+                        cursor.executemany(sql, rows)
+            except Exception as e:
+                traceback.print_exc()
+                logging.error(cursor._last_executed)
+                logging.error(f"Error in SQL:\n {e}")
+                raise
+
+    @classmethod
+    def insert_statements(cls, fieldnames, values, many=False):
+        """
+        The (sql, values) statements that write a new version with
+        `fieldnames`, or with `many` the (sql, rows) of new versions. Rows of
+        the history table are written with latest = false: only the current
+        table says which version is the latest.
+        """
+        if cls.__split_history__:
+            history = values
+            if "latest" in fieldnames:
+                i = fieldnames.index("latest")
+
+                def not_latest(row):
+                    return row[:i] + (False,) + row[i + 1:]
+
+                history = [not_latest(x) for x in values] if many else not_latest(values)
+            return (
+                (queries.insert(cls.history_table(), fieldnames), history),
+                (queries.upsert(cls.__tablename__, fieldnames), values),
+            )
+        return ((queries.insert(cls.__tablename__, fieldnames), values),)
 
     def update_from(self, other):
         if isinstance(other, self.__class__):
@@ -110,73 +236,240 @@ class VersionedModel:
         return self
 
     def get_new_from_existing(self):
-        properties = self.get_as_dict()
-        new_entity = self.__class__(**properties)
+        """
+        The version that supersedes this one: a copy of its fields under a new
+        version. Copies __dict__ directly rather than going through
+        get_as_dict and __init__, and keeps dates as dates.
+        """
+        new_entity = self.__class__.__new__(self.__class__)
+        new_entity.__dict__.update(
+            (k, v) for k, v in self.__dict__.items() if not k.startswith("_")
+        )
         new_entity.version = uuid4().hex
         new_entity.previous_version = self.version
         return new_entity
 
     def update_previous_records(self, cursor):
-        sql = f"""UPDATE {self.__tablename__} SET latest = false WHERE entity_id = '{self.entity_id}';"""
-        cursor.execute(sql)
+        self.update_multiple_previous_records(cursor, [self.entity_id])
+
+    @classmethod
+    def update_multiple_previous_records(cls, cursor, entity_ids):
+        # The upsert of the new version replaces the current one
+        if not entity_ids or cls.__split_history__:
+            return
+        sql = queries.update_latest(cls.__tablename__)
+        with traced(cursor, sql, (tuple(entity_ids),)):
+            cursor.execute(sql, (tuple(entity_ids),))
+
+    @staticmethod
+    @contextmanager
+    def cursor(connection=None, commit=True):
+        """
+        Yields a cursor on `connection`, or on the pooled connection of the
+        current request, and commits once the block succeeds.
+        """
+        if not connection:
+            connection = db.connect
+        with connection.cursor() as cursor:
+            try:
+                yield cursor
+            except Exception:
+                connection.rollback()
+                raise
+        if commit:
+            with metrics.span("db", "COMMIT"):
+                connection.commit()
 
     def save(self, connection=None, commit=True):
-        new_entity = self.get_new_from_scratch()
-        with current_app.app_context():
-            if not connection:
-                connection = db.connect
-
-            with connection.cursor() as cursor:
-                updated = False
-                if self.entity_id and self.version:
-                    updated = True
-                    new_entity = self.get_new_from_existing()
+        new_entity, updated = self.prepare_save()
+        if commit and connection is None and group_commit.enabled:
+            return group_commit.save(new_entity, updated)
+
+        if current_app.config.get("MYSQL_MULTI_STATEMENTS"):
+            # The COMMIT travels with the writes, the cursor must not add its own
+            with self.cursor(connection, commit=False) as cursor:
+                new_entity.write_version(cursor, updated, commit)
+        else:
+            with self.cursor(connection, commit) as cursor:
+                if updated:
                     self.update_previous_records(cursor)
-                if not self.entity_id or not self.version:
-                    new_entity = self.get_new_from_scratch()
-
                 new_entity.create_in_database(cursor)
+        if commit:
+            self.after_save([new_entity])
+        return new_entity
 
-            if commit:
-                connection.commit()
-                operation = "update" if updated else "create"
-                if cursor:
-                    cursor.close()
-            return new_entity
+    def version_statements(self, updated):
+        """
+        The (sql, params) statements that write this new version: the one
+        retiring the previous version when `updated`, then the inserts.
+        """
+        fieldnames = tuple(x for x in self.annotations() if hasattr(self, x))
+        values = tuple(getattr(self, x) for x in fieldnames)
+        statements = list(self.insert_statements(fieldnames, values))
+        if updated and not self.__split_history__:
+            statements.insert(0, (queries.update_latest(self.__tablename__), ((self.entity_id,),)))
+        return statements
+
+    def write_version(self, cursor, updated, commit=False):
+        """
+        Writes this new version in a single round trip: retiring the previous
+        version, inserting this one and, with `commit`, the COMMIT go to the
+        server as one multi-statement batch. Needs a connection opened with
+        CLIENT.MULTI_STATEMENTS, see MYSQL_MULTI_STATEMENTS.
+        """
+        sql, params = queries.batch(self.version_statements(updated), commit)
+        try:
+            with traced(cursor, sql, params):
+                cursor.execute(sql, params)
+                # A failing statement only raises once its result is reached
+                while cursor.nextset():
+                    pass
+        except Exception as e:
+            logging.error(cursor._last_executed)
+            logging.error(f"Error in SQL:\n {e}")
+            raise
+
+    @classmethod
+    def on_save(cls, listener):
+        """
+        Registers `listener(entities)`, called with the new versions of this
+        class once `save`, `save_many`/`save_prepared` or `delete` committed
+        them.
+        """
+        if "_save_listeners" not in cls.__dict__:
+            cls._save_listeners = []
+        cls._save_listeners.append(listener)
+
+    @classmethod
+    def after_save(cls, entities):
+        entity_cache.invalidate(entities)
+        for listener in cls.__dict__.get("_save_listeners", ()):
+            try:
+                listener(entities)
+            except Exception as e:
+                logging.error(f"Save listener {listener} of {cls.__tablename__} failed: {e}")
+
+    def prepare_save(self):
+        """
+        Returns the version `save` would write and whether it supersedes an
+        older version of the entity.
+        """
+        if self.entity_id and self.version:
+            return self.get_new_from_existing(), True
+        return self.get_new_from_scratch(), False
+
+    @classmethod
+    def save_many(cls, models, connection=None, commit=True, batch_size=None):
+        """
+        Saves many models of this class: every batch of `batch_size` models is
+        one UPDATE ... WHERE entity_id IN (...) for the updated ones, one
+        multi-row INSERT and one commit.
+        """
+        return cls.save_prepared(
+            [x.prepare_save() for x in models], connection, commit, batch_size
+        )
 
     @staticmethod
-    def fetchone_dict(query, commit=True):
-        with current_app.app_context():
-            connection = db.connect
-            with connection.cursor() as cursor:
-                cursor.execute(query)
-                desc = cursor.description
-                results = cursor.fetchone()
-                if results:
-                    results = dict(zip([col[0] for col in desc], results))
+    def chain_versions(prepared):
+        """
+        Links the new versions of one entity among the (new_entity, updated)
+        pairs `prepared`, so writing them together ends as saving them one
+        after the other: each names the one before it as previous_version,
+        and only the last one is latest.
+        """
+        last = {}
+        for new_entity, _ in prepared:
+            earlier = last.get(new_entity.entity_id)
+            if earlier is not None and earlier is not new_entity:
+                earlier.latest = False
+                new_entity.previous_version = earlier.version
+            last[new_entity.entity_id] = new_entity
+        return prepared
+
+    @classmethod
+    def save_prepared(cls, prepared, connection=None, commit=True, batch_size=None):
+        """Writes (new_entity, updated) pairs from `prepare_save` in batches,
+        see `chain_versions` for several versions of one entity."""
+        batch_size = batch_size or current_app.config.get("MYSQL_BULK_BATCH_SIZE", 500)
+        cls.chain_versions(prepared)
+        saved = []
+        for start in range(0, len(prepared), batch_size):
+            batch = prepared[start:start + batch_size]
+            new_entities = [x for x, _ in batch]
+            with cls.cursor(connection, commit) as cursor:
+                cls.update_multiple_previous_records(
+                    cursor, [x.entity_id for x, updated in batch if updated]
+                )
+                cls().create_multiple_in_database(cursor, new_entities)
             if commit:
-                connection.commit()
-                if cursor:
-                    cursor.close()
-            return results
+                cls.after_save(new_entities)
+            saved.extend(new_entities)
+        return saved
 
-    @staticmethod
-    def fetchall_dict(query, commit=True):
-        with current_app.app_context():
-            connection = db.connect
-            with connection.cursor() as cursor:
-                cursor.execute(query)
+    @classmethod
+    def fetchone_dict(cls, query, params=None, commit=True):
+        with cls.cursor(commit=commit) as cursor:
+            with traced(cursor, query, params):
+                cursor.execute(query, params or None)
                 desc = cursor.description
+                results = cursor.fetchone()
+            if results:
+                results = dict(zip([col[0] for col in desc], results))
+        return results
+
+    @classmethod
+    def fetchall_rows(cls, query, params=None, commit=True):
+        """Returns the column names and the plain row tuples of `query`."""
+        with cls.cursor(commit=commit) as cursor:
+            with traced(cursor, query, params):
+                cursor.execute(query, params or None)
+                columns = tuple(col[0] for col in cursor.description)
                 rows = cursor.fetchall()
-                results = []
-                if rows:
-                    for row in rows:
-                        results.append(dict(zip([col[0] for col in desc], row)))
-            if commit:
-                connection.commit()
-                if cursor:
-                    cursor.close()
-            return results
+        return columns, rows
+
+    @classmethod
+    def fetchall_dict(cls, query, params=None, commit=True):
+        columns, rows = cls.fetchall_rows(query, params, commit)
+        return [dict(zip(columns, row)) for row in rows]
+
+    @staticmethod
+    def iter_rows(query, params=None, chunk_size=None):
+        """
+        Streams the rows of `query` through an unbuffered server-side cursor,
+        `chunk_size` rows at a time, so memory stays flat however many rows
+        there are. Yields the tuple of column names first, then the rows. The
+        cursor runs on its own pooled connection because an unbuffered result
+        blocks its connection until it is fully read.
+        """
+        chunk_size = chunk_size or current_app.config.get("MYSQL_STREAM_CHUNK_SIZE", 500)
+        with db.connection() as connection:
+            with connection.cursor(SSCursor) as cursor:
+                # Only the query itself, the rows are read as they are consumed
+                with traced(cursor, query, params, rows=False):
+                    cursor.execute(query, params or None)
+                yield tuple(col[0] for col in cursor.description)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield from rows
+            connection.commit()
+
+    @classmethod
+    def iter_dict(cls, query, params=None, chunk_size=None):
+        """Streams the rows of `query` as dicts, see `iter_rows`."""
+        rows = cls.iter_rows(query, params, chunk_size)
+        columns = next(rows)
+        for row in rows:
+            yield dict(zip(columns, row))
+
+    @classmethod
+    def build_all(cls, columns, rows, records=False):
+        with metrics.span("materialize"):
+            if records:
+                build = model_records.row_builder(cls, columns)
+                return [build(row) for row in rows]
+            return [cls.build_model(dict(zip(columns, row))) for row in rows]
 
     def get_as_dict(self, nested=False):
         params = dict()
@@ -196,50 +489,262 @@ class VersionedModel:
 
     @classmethod
     def get(cls, value, key="entity_id"):
-        query = f"""SELECT * FROM {cls.__tablename__} WHERE {key} = '{str(value)}' AND latest = true AND active = true;"""
-        model = cls.fetchone_dict(query)
-        o = cls()
+        model = entity_cache.get(cls.__tablename__, key, value)
+        if model is None:
+            query = queries.select(cls.__tablename__, where=((key, "="),))
+            model = cls.fetchone_dict(query, (value,))
+            if model:
+                entity_cache.set(cls.__tablename__, key, value, model)
         if model:
-            for k, v in model.items():
-                setattr(o, k, v)
-            return o
+            return cls.build_model(model)
         return None
 
+    @classmethod
+    def all_query(cls, fields, condition="true", limit=None, offset=None, where=None, params=()):
+        """The (query, params) of `get_all`."""
+        where = where or {}
+        query = queries.select(
+            cls.__tablename__,
+            fields,
+            where=tuple((column, "=") for column in where),
+            condition=condition if condition != "true" else None,
+            limit=bool(limit),
+            offset=bool(offset),
+        )
+        params = tuple(where.values()) + tuple(params)
+        params += tuple(x for x in (limit, offset) if x)
+        return query, params
+
     @classmethod
     def get_all(
-        cls, fields: str, condition: str = "true", limit: int = None, offset: int = None
+        cls,
+        fields: str,
+        condition: str = "true",
+        limit: int = None,
+        offset: int = None,
+        stream: bool = False,
+        where: dict = None,
+        params: tuple = (),
+        records: bool = False,
     ):
-        default_condition = "latest = true AND active = true"
-        condition = (
-            condition + " AND " + default_condition if condition else default_condition
+        """
+        `where` maps columns to the values they must equal, `condition` is a
+        static SQL fragment whose placeholders take `params`. With `records`,
+        yields slotted records (see `record_class`) instead of models.
+        """
+        query, params = cls.all_query(fields, condition, limit, offset, where, params)
+        if not stream:
+            columns, rows = cls.fetchall_rows(query, params)
+            yield from cls.build_all(columns, rows, records)
+            return
+
+        rows = cls.iter_rows(query, params)
+        columns = next(rows)
+        if records:
+            build = model_records.row_builder(cls, columns)
+            for row in rows:
+                yield build(row)
+        else:
+            for row in rows:
+                yield cls.build_model(dict(zip(columns, row)))
+
+    @classmethod
+    def get_page(
+        cls,
+        fields: str = "*",
+        condition: str = None,
+        cursor: str = None,
+        page_size: int = 20,
+        params: tuple = (),
+        records: bool = False,
+    ):
+        """
+        Keyset pagination over the latest_ind index: returns a page of models
+        ordered by entity_id and the cursor of the next page, or None on the last
+        page. Every page costs the same, however deep it is.
+        """
+        columns, rows = cls.fetchall_rows(*cls.page_query(fields, condition, cursor, page_size, params))
+        return cls.build_page(columns, rows, page_size, records)
+
+    @classmethod
+    def page_query(cls, fields="*", condition=None, cursor=None, page_size=20, params=()):
+        """The (query, params) of `get_page`, which asks for one extra row to
+        know whether there is a next page."""
+        where = ()
+        params = tuple(params)
+        if cursor:
+            after = decode_page_cursor(cursor)
+            where = (("entity_id", ">"),)
+            params = (after,) + params
+        query = queries.select(
+            cls.__tablename__, fields, where=where, condition=condition, order_by="entity_id", limit=True
         )
-        limit_query = f"LIMIT {limit}" if limit else ""
-        offset_query = f"OFFSET {offset}" if offset else ""
-        query = f"""SELECT {fields} FROM {cls.__tablename__} WHERE {condition} {limit_query} {offset_query};"""
-        models = cls.fetchall_dict(query)
-        for model in models:
-            if model:
-                o = cls()
-                for k, v in model.items():
-                    setattr(o, k, v)
-                yield o
+        return query, params + (int(page_size) + 1,)
+
+    @classmethod
+    def build_page(cls, columns, rows, page_size, records=False):
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_cursor([rows[-1][columns.index("entity_id")]])
+        return cls.build_all(columns, rows, records), next_cursor
 
     def delete(self, connection=None, commit=True):
-        with current_app.app_context():
-            if not connection:
-                connection = db.connect
-            with connection.cursor() as cursor:
-                new_entity = self.get_new_from_existing()
-                self.update_previous_records(cursor)
-                new_entity.active = False
-                new_entity.create_in_database(cursor)
+        with self.cursor(connection, commit) as cursor:
+            new_entity = self.get_new_from_existing()
+            self.update_previous_records(cursor)
+            new_entity.active = False
+            new_entity.create_in_database(cursor)
+        if commit:
+            self.after_save([new_entity])
+        return new_entity
 
-            if commit:
-                connection.commit()
-                operation = "delete"
-                pusher_client.trigger(
-                    f"{self.__tablename__}", operation, new_entity.get_for_api()
-                )
-                if cursor:
-                    cursor.close()
-            return new_entity
+    # Async versions of the methods above, on the aiomysql pool of the async
+    # entry point (see app.aio). They take no connection: every call checks
+    # one out of `aio_db` for its own statements and commits them.
+
+    @classmethod
+    async def afetchall_rows(cls, query, params=None):
+        async with aio_db.cursor() as cursor:
+            with traced(cursor, query, params):
+                await cursor.execute(query, params or None)
+                columns = tuple(col[0] for col in cursor.description)
+                rows = await cursor.fetchall()
+        return columns, rows
+
+    @classmethod
+    async def afetchone_dict(cls, query, params=None):
+        columns, rows = await cls.afetchall_rows(query, params)
+        return dict(zip(columns, rows[0])) if rows else None
+
+    @classmethod
+    async def afetchall_dict(cls, query, params=None):
+        columns, rows = await cls.afetchall_rows(query, params)
+        return [dict(zip(columns, row)) for row in rows]
+
+    @staticmethod
+    async def aiter_rows(query, params=None):
+        """`iter_rows` on an unbuffered async cursor."""
+        from aiomysql import SSCursor as AsyncSSCursor
+
+        async with aio_db.cursor(cursor_class=AsyncSSCursor) as cursor:
+            await cursor.execute(query, params or None)
+            yield tuple(col[0] for col in cursor.description)
+            while True:
+                rows = await cursor.fetchmany(aio_db.chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+
+    @classmethod
+    async def aget(cls, value, key="entity_id"):
+        model = entity_cache.get(cls.__tablename__, key, value)
+        if model is None:
+            query = queries.select(cls.__tablename__, where=((key, "="),))
+            model = await cls.afetchone_dict(query, (value,))
+            if model:
+                entity_cache.set(cls.__tablename__, key, value, model)
+        if model:
+            return cls.build_model(model)
+        return None
+
+    @classmethod
+    async def aget_all(
+        cls,
+        fields: str,
+        condition: str = "true",
+        limit: int = None,
+        offset: int = None,
+        stream: bool = False,
+        where: dict = None,
+        params: tuple = (),
+        records: bool = False,
+    ):
+        """`get_all` as an async generator."""
+        query, params = cls.all_query(fields, condition, limit, offset, where, params)
+        if stream:
+            rows = cls.aiter_rows(query, params)
+            columns = await rows.__anext__()
+        else:
+            columns, rows = await cls.afetchall_rows(query, params)
+
+        build = (
+            model_records.row_builder(cls, columns)
+            if records
+            else lambda row: cls.build_model(dict(zip(columns, row)))
+        )
+        if stream:
+            async for row in rows:
+                yield build(row)
+        else:
+            for row in rows:
+                yield build(row)
+
+    @classmethod
+    async def aget_page(
+        cls,
+        fields: str = "*",
+        condition: str = None,
+        cursor: str = None,
+        page_size: int = 20,
+        params: tuple = (),
+        records: bool = False,
+    ):
+        columns, rows = await cls.afetchall_rows(*cls.page_query(fields, condition, cursor, page_size, params))
+        return cls.build_page(columns, rows, page_size, records)
+
+    async def awrite_version(self, updated):
+        """Writes and commits this new version, in one round trip when the
+        pool allows multi-statements, see `write_version`."""
+        statements = self.version_statements(updated)
+        if aio_db.multi_statements:
+            statements = [queries.batch(statements, commit=True)]
+        async with aio_db.cursor(commit=not aio_db.multi_statements) as cursor:
+            for sql, params in statements:
+                with traced(cursor, sql, params):
+                    await cursor.execute(sql, params)
+                    while await cursor.nextset():
+                        pass
+
+    @classmethod
+    async def asave_many(cls, models, batch_size=None):
+        """`save_many` on the async pool."""
+        return await cls.asave_prepared([x.prepare_save() for x in models], batch_size)
+
+    @classmethod
+    async def asave_prepared(cls, prepared, batch_size=None):
+        """`save_prepared` on the async pool: every batch is one UPDATE, one
+        multi-row INSERT per set of fields and one commit, on one connection."""
+        batch_size = batch_size or aio_db.bulk_batch_size
+        cls.chain_versions(prepared)
+        saved = []
+        for start in range(0, len(prepared), batch_size):
+            batch = prepared[start:start + batch_size]
+            new_entities = [x for x, _ in batch]
+            updated = tuple(x.entity_id for x, is_update in batch if is_update)
+            async with aio_db.cursor() as cursor:
+                if updated and not cls.__split_history__:
+                    sql = queries.update_latest(cls.__tablename__)
+                    with traced(cursor, sql, (updated,)):
+                        await cursor.execute(sql, (updated,))
+                for fieldnames, values in cls.insert_groups(new_entities):
+                    for sql, rows in cls.insert_statements(fieldnames, values, many=True):
+                        with traced(cursor, sql):
+                            await cursor.executemany(sql, rows)
+            cls.after_save(new_entities)
+            saved.extend(new_entities)
+        return saved
+
+    async def asave(self):
+        new_entity, updated = self.prepare_save()
+        await new_entity.awrite_version(updated)
+        self.after_save([new_entity])
+        return new_entity
+
+    async def adelete(self):
+        new_entity = self.get_new_from_existing()
+        new_entity.active = False
+        await new_entity.awrite_version(updated=True)
+        self.after_save([new_entity])
+        return new_entity
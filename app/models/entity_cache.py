@@ -0,0 +1,147 @@
+"""
+Read-through cache for VersionedModel.get.
+
+Rows are cached by (table, key, value) in a shared backend, and in front of
+it in a size-bounded local TTL cache. Every save writes a new `version`,
+which is recorded in the backend as the entity's version token; a cached row
+whose version no longer matches its entity's token is stale and is dropped on
+read. That also covers rows cached under other keys than entity_id, and rows
+another worker cached from a read that raced the save.
+
+The tokens live in the backend only, so a save in one worker is seen by the
+next read in every other, and they outlive every row cached before them: a
+row lives `ttl` in the backend and at most `ttl` more in a local cache it was
+copied to, so a token lives twice as long. Without a shared backend the
+cache cannot be enabled.
+"""
+from datetime import date, datetime
+from threading import Lock
+
+from cachetools import TTLCache
+
+
+def _encode(row):
+    encoded = {}
+    for k, v in row.items():
+        if isinstance(v, datetime):
+            v = {"__datetime__": v.isoformat()}
+        elif isinstance(v, date):
+            v = {"__date__": v.isoformat()}
+        encoded[k] = v
+    return encoded
+
+
+def _decode(row):
+    decoded = {}
+    for k, v in row.items():
+        if isinstance(v, dict) and "__datetime__" in v:
+            v = datetime.fromisoformat(v["__datetime__"])
+        elif isinstance(v, dict) and "__date__" in v:
+            v = date.fromisoformat(v["__date__"])
+        decoded[k] = v
+    return decoded
+
+
+class EntityCache:
+    def __init__(self, maxsize=10000, ttl=300, backend=None):
+        self.enabled = False
+        self.ttl = ttl
+        self.backend = backend
+        self._rows = TTLCache(maxsize, ttl)
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.invalidations = 0
+
+    def init_app(self, app, backend=None):
+        self.enabled = app.config.get("ENTITY_CACHE_ENABLED", False)
+        self.ttl = app.config.get("ENTITY_CACHE_TTL", self.ttl)
+        maxsize = app.config.get("ENTITY_CACHE_SIZE", self._rows.maxsize)
+        self._rows = TTLCache(maxsize, self.ttl)
+        self.backend = backend
+        if self.enabled and not getattr(backend, "shared", False):
+            raise ValueError(
+                "ENTITY_CACHE_ENABLED needs a shared ENTITY_CACHE_BACKEND such as redis, "
+                "a per-process cache would miss the saves of other workers"
+            )
+
+    @property
+    def version_ttl(self):
+        return 2 * self.ttl
+
+    @staticmethod
+    def _key(table, key, value):
+        return f"entity:{table}:{key}:{value}"
+
+    @staticmethod
+    def _version_key(table, entity_id):
+        return f"entity_version:{table}:{entity_id}"
+
+    def _version(self, table, entity_id):
+        return self.backend.get(self._version_key(table, entity_id))
+
+    def get(self, table, key, value):
+        """Returns the cached row dict, or None on a miss."""
+        if not self.enabled:
+            return None
+        cache_key = self._key(table, key, value)
+        with self._lock:
+            row = self._rows.get(cache_key)
+        if row is None:
+            row = self.backend.get(cache_key)
+            if row is not None:
+                row = _decode(row)
+                with self._lock:
+                    self._rows[cache_key] = row
+        if row is None:
+            self.misses += 1
+            return None
+
+        version = self._version(table, row.get("entity_id"))
+        if version is not None and version != row.get("version"):
+            self.stale += 1
+            self.misses += 1
+            self._delete(cache_key)
+            return None
+        self.hits += 1
+        return row
+
+    def set(self, table, key, value, row):
+        if not self.enabled:
+            return
+        cache_key = self._key(table, key, value)
+        with self._lock:
+            self._rows[cache_key] = row
+        self.backend.set(cache_key, _encode(row), self.ttl)
+
+    def _delete(self, cache_key):
+        with self._lock:
+            self._rows.pop(cache_key, None)
+        self.backend.delete(cache_key)
+
+    def invalidate(self, entities):
+        """Records the new versions written by a save or delete."""
+        if not self.enabled:
+            return
+        for entity in entities:
+            table = entity.__tablename__
+            self.backend.set(self._version_key(table, entity.entity_id), entity.version, self.version_ttl)
+            self._delete(self._key(table, "entity_id", entity.entity_id))
+            self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._rows),
+            "maxsize": self._rows.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "invalidations": self.invalidations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+entity_cache = EntityCache()
@@ -0,0 +1,80 @@
+"""
+Parameterized SQL for VersionedModel.
+
+Every statement is built from its shape: the table, the selected fields,
+the columns compared and the static part of the condition. Values are left
+out as %s placeholders, so the built text is cached per shape and a
+repeated query skips building it. The driver still escapes the parameters
+into the text on the client, as PyMySQL does, so the server parses every
+statement with its values; there is no server-side statement reuse.
+"""
+from functools import lru_cache
+
+LATEST_CONDITION = "latest = true AND active = true"
+
+
+@lru_cache(maxsize=1024)
+def select(table, fields="*", where=(), condition=None, order_by=None, limit=False, offset=False, latest=True, group_by=None):
+    """
+    `where` is a tuple of (column, operator) pairs, each compared to one
+    parameter; the "IN" operator takes a tuple parameter. `condition` is a
+    static SQL fragment that may contain placeholders of its own, whose
+    parameters come right after the `where` ones.
+    """
+    conditions = [f"{column} {operator} %s" for column, operator in where]
+    if condition:
+        conditions.append(f"({condition})")
+    if latest:
+        conditions.append(LATEST_CONDITION)
+    sql = f"SELECT {fields} FROM {table}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if group_by:
+        sql += f" GROUP BY {group_by}"
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    if limit:
+        sql += " LIMIT %s"
+    if offset:
+        sql += " OFFSET %s"
+    return sql + ";"
+
+
+@lru_cache(maxsize=1024)
+def insert(table, fieldnames):
+    return "INSERT INTO {} ({}) VALUES ({})".format(
+        table,
+        ",".join(fieldnames),
+        ",".join(["%s"] * len(fieldnames)),
+    )
+
+
+@lru_cache(maxsize=1024)
+def upsert(table, fieldnames):
+    """An `insert` that overwrites the row with the same primary key."""
+    return insert(table, fieldnames) + " ON DUPLICATE KEY UPDATE {}".format(
+        ",".join(f"{x} = VALUES({x})" for x in fieldnames)
+    )
+
+
+@lru_cache(maxsize=256)
+def update_latest(table):
+    return f"UPDATE {table} SET latest = false WHERE entity_id IN %s;"
+
+
+def batch(statements, commit=False):
+    """Joins (sql, params) statements, and a COMMIT with `commit`, into one
+    multi-statement (sql, params)."""
+    if commit:
+        statements = statements + [("COMMIT", ())]
+    sql = ";".join(x.rstrip(";") for x, _ in statements)
+    return sql, tuple(value for _, params in statements for value in params)
+
+
+def stats():
+    return {
+        name: function.cache_info()._asdict()
+        for name, function in (
+            ("select", select), ("insert", insert), ("upsert", upsert), ("update_latest", update_latest)
+        )
+    }
@@ -0,0 +1,64 @@
+"""
+Compact read-only records for model listings.
+
+`record_class(Model)` generates a slotted dataclass with one field per entry
+of `Model.annotations()`. `row_builder(Model, columns)` compiles a function
+that turns a cursor row into such a record in one call, and the generated
+`get_as_dict`/`get_for_api` serialize it with one dict literal, without
+walking `__dict__` or type-checking every value.
+"""
+import dataclasses
+from datetime import date, datetime
+from functools import lru_cache
+
+DATE_TYPES = (date, datetime, "date", "datetime")
+
+
+def _annotation(model, name):
+    for klass in model.__mro__:
+        if name in klass.__dict__.get("__annotations__", {}):
+            return klass.__annotations__[name]
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+@lru_cache(maxsize=None)
+def record_class(model):
+    fields = model.annotations()
+    namespace = {"__tablename__": model.__tablename__}
+    record = dataclasses.make_dataclass(
+        f"{model.__name__}Record",
+        [(name, object, dataclasses.field(default=None)) for name in fields],
+        namespace=namespace,
+        slots=True,
+    )
+
+    items = []
+    for name in fields:
+        if _annotation(model, name) in DATE_TYPES:
+            items.append(f"{name!r}: _isoformat(self.{name})")
+        else:
+            items.append(f"{name!r}: self.{name}")
+    source = f"def get_as_dict(self, nested=False):\n    return {{{', '.join(items)}}}\n"
+    scope = {"_isoformat": _isoformat}
+    exec(source, scope)
+    record.get_as_dict = scope["get_as_dict"]
+    record.get_for_api = scope["get_as_dict"]
+    return record
+
+
+@lru_cache(maxsize=1024)
+def row_builder(model, columns):
+    """
+    Returns a function building a record of `model` from a row with the given
+    column names. Columns that are not model fields are ignored.
+    """
+    record = record_class(model)
+    fields = set(model.annotations())
+    arguments = [f"{name}=row[{i}]" for i, name in enumerate(columns) if name in fields]
+    source = f"def build(row):\n    return record({', '.join(arguments)})\n"
+    scope = {"record": record}
+    exec(source, scope)
+    return scope["build"]
@@ -2,8 +2,13 @@ from app.models import VersionedModel
 
 class Video(VersionedModel):
     __tablename__ = "video"
+    __indexes__ = {
+        "id_ind": ("id", "latest", "active"),
+        "user_ind": ("user_id", "latest", "active"),
+    }
 
     id: str
+    video_path: str
     title: str
     user_id: str
     user_tag: str
@@ -13,27 +18,45 @@ class Video(VersionedModel):
 
 class View(VersionedModel):
     __tablename__ = "view"
+    __indexes__ = {
+        "video_ind": ("video_id", "latest", "active"),
+        "user_video_ind": ("user_id", "video_id", "latest", "active"),
+    }
 
     video_id: str
     user_id: str
 
 class Clap(VersionedModel):
     __tablename__ = "clap"
+    __indexes__ = {
+        "video_ind": ("video_id", "latest", "active"),
+        "user_video_ind": ("user_id", "video_id", "latest", "active"),
+    }
 
     video_id: str
     user_id: str    
 
 class Bookmark(VersionedModel):
     __tablename__ = "bookmark"
+    __indexes__ = {
+        "video_ind": ("video_id", "latest", "active"),
+        "user_video_ind": ("user_id", "video_id", "latest", "active"),
+    }
 
     video_id: str
     user_id: str        
 
 class User(VersionedModel):
     __tablename__ = "user"
+    __indexes__ = {
+        "id_ind": ("id", "latest", "active"),
+    }
+    __column_types__ = {
+        "interest": "TEXT",
+    }
 
     id: str
     device_id:  str
     nick:  str
     name:  str
-    interest: str
\ No newline at end of file
+    interest: str
@@ -0,0 +1,218 @@
+import logging
+import queue
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+import pymysql
+from pymysql.constants import SERVER_STATUS
+from flask import g
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    __slots__ = ("connection", "created_at", "last_used")
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """
+    A bounded pool of PyMySQL connections.
+
+    `connect` hands out one connection per app context (so per request) and
+    returns it to the pool on teardown. Code running outside of a request uses
+    `with db.connection() as connection:` instead.
+    """
+
+    # Longest a waiting `acquire` sleeps before it looks for a free slot again
+    WAIT_SLICE = 0.05
+
+    def __init__(self, size=10, timeout=5, max_lifetime=3600, health_check_interval=30, min_size=2):
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.min_size = min_size
+        self.connect_kwargs = {}
+        # Called with connect_kwargs to open a connection
+        self.factory = pymysql.connect
+        self._idle = queue.LifoQueue()
+        self._lock = Lock()
+        self._open = 0
+        self._in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.created = 0
+        self.recycled = 0
+        self.wait_seconds = 0.0
+        self.wait_seconds_max = 0.0
+        self.checkout_seconds = 0.0
+        self.checkout_seconds_max = 0.0
+
+    def init_app(self, app):
+        self.connect_kwargs = app.config["pymysql_kwargs"]
+        self.size = app.config.get("MYSQL_POOL_SIZE", self.size)
+        self.timeout = app.config.get("MYSQL_POOL_TIMEOUT", self.timeout)
+        self.max_lifetime = app.config.get("MYSQL_POOL_MAX_LIFETIME", self.max_lifetime)
+        self.health_check_interval = app.config.get("MYSQL_POOL_HEALTH_CHECK_INTERVAL", self.health_check_interval)
+        self.min_size = app.config.get("MYSQL_POOL_MIN_SIZE", self.min_size)
+        app.teardown_appcontext(self.teardown)
+
+    def prewarm(self, count=None):
+        """Opens `count` (default MYSQL_POOL_MIN_SIZE) connections up front."""
+        count = min(self.size, self.min_size if count is None else count)
+        opened = []
+        try:
+            while self._open < count:
+                opened.append(self.acquire())
+        except Exception as e:
+            logging.error(f"Could not prewarm the connection pool: {e}")
+        for pooled in opened:
+            self.release(pooled)
+
+    def _create(self):
+        pooled = PooledConnection(self.factory(**self.connect_kwargs))
+        self.created += 1
+        return pooled
+
+    def _is_usable(self, pooled):
+        now = time.monotonic()
+        if now - pooled.created_at > self.max_lifetime:
+            return False
+        if now - pooled.last_used > self.health_check_interval:
+            try:
+                pooled.connection.ping(reconnect=False)
+            except Exception:
+                return False
+        return True
+
+    def _close(self, pooled):
+        self.recycled += 1
+        try:
+            pooled.connection.close()
+        except Exception:
+            pass
+
+    def acquire(self, timeout=None):
+        started = time.perf_counter()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = started + timeout
+        while True:
+            # An idle connection, else a free slot, and only then wait
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    reserved = self._open < self.size
+                    if reserved:
+                        self._open += 1
+                if reserved:
+                    pooled = None
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection available after {timeout}s ({self._in_use} of {self.size} in use)"
+                    )
+                # In slices, as a discarded connection frees a slot without waking anyone
+                try:
+                    pooled = self._idle.get(timeout=min(remaining, self.WAIT_SLICE))
+                except queue.Empty:
+                    continue
+            waited = time.perf_counter() - started
+            self.wait_seconds += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            if not self._is_usable(pooled):
+                # Its slot goes to the replacement
+                self._close(pooled)
+                pooled = None
+            break
+
+        if pooled is None:
+            try:
+                pooled = self._create()
+            except Exception:
+                with self._lock:
+                    self._open -= 1
+                raise
+
+        with self._lock:
+            self._in_use += 1
+            self.checkouts += 1
+        elapsed = time.perf_counter() - started
+        self.checkout_seconds += elapsed
+        self.checkout_seconds_max = max(self.checkout_seconds_max, elapsed)
+        return pooled
+
+    def release(self, pooled):
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if pooled.connection.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                pooled.connection.rollback()
+        except Exception:
+            self._discard(pooled)
+            return
+        pooled.last_used = time.monotonic()
+        self._idle.put(pooled)
+
+    def _discard(self, pooled):
+        self._close(pooled)
+        with self._lock:
+            self._open -= 1
+
+    def close_idle(self):
+        """Closes every idle connection, so a process that forks after this
+        shares no socket with its children."""
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(pooled)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        pooled = self.acquire(timeout)
+        try:
+            yield pooled.connection
+        finally:
+            self.release(pooled)
+
+    @property
+    def connect(self):
+        """The connection bound to the current app context."""
+        pooled = g.get("_pooled_connection")
+        if pooled is None:
+            pooled = g._pooled_connection = self.acquire()
+        return pooled.connection
+
+    def teardown(self, exception):
+        pooled = g.pop("_pooled_connection", None)
+        if pooled is not None:
+            self.release(pooled)
+
+    def stats(self):
+        checkouts = self.checkouts or 1
+        return {
+            "size": self.size,
+            "open": self._open,
+            "in_use": self._in_use,
+            "idle": self._idle.qsize(),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "created": self.created,
+            "recycled": self.recycled,
+            "wait_seconds_avg": self.wait_seconds / checkouts,
+            "wait_seconds_max": self.wait_seconds_max,
+            "checkout_seconds_avg": self.checkout_seconds / checkouts,
+            "checkout_seconds_max": self.checkout_seconds_max,
+        }
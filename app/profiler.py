@@ -0,0 +1,177 @@
+import logging
+import queue
+import re
+from threading import Lock
+from threading import Thread
+
+from app import db
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+EXPLAINABLE = ("SELECT", "UPDATE", "DELETE")
+REPORT_ORDERS = ("total_seconds", "max_seconds", "count", "rows_max")
+
+
+def fingerprint(sql):
+    """
+    The shape of a statement: literals and placeholders become ?, value lists
+    collapse to (?+) and whitespace to single spaces, so every execution of
+    the same query maps to the same fingerprint whatever its values.
+    """
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _LIST.sub("(?+)", sql)
+    return _SPACE.sub(" ", sql).strip().rstrip(";")
+
+
+class QueryProfiler:
+    """
+    Records the duration and row count of every model statement per
+    fingerprint, and keeps the `max_fingerprints` costliest ones.
+
+    The first time a fingerprint runs slower than `threshold` seconds, the
+    statement, with its values, is EXPLAINed on a background thread and the
+    plan kept with the fingerprint, flagged when it scans a whole table.
+    """
+
+    def __init__(self, threshold=0.1, top_n=20, max_fingerprints=1000):
+        self.threshold = threshold
+        self.top_n = top_n
+        self.max_fingerprints = max_fingerprints
+        self.enabled = False
+        self._lock = Lock()
+        self._fingerprints = {}
+        self._explain_queue = None
+        self._thread = None
+        self.statements = 0
+        self.explained = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get("QUERY_PROFILER_ENABLED", False)
+        self.threshold = app.config.get("QUERY_PROFILER_EXPLAIN_THRESHOLD", self.threshold)
+        self.top_n = app.config.get("QUERY_PROFILER_TOP_N", self.top_n)
+        self.max_fingerprints = app.config.get("QUERY_PROFILER_MAX_FINGERPRINTS", self.max_fingerprints)
+
+    def start(self):
+        """Starts the EXPLAIN thread, on the first slow statement."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._explain_queue = queue.Queue(maxsize=100)
+            self._thread = Thread(target=self._run, name="query-explain", daemon=True)
+            self._thread.start()
+
+    def record(self, sql, seconds, rows, cursor=None, params=None):
+        """Records one execution of `sql`. With `cursor` and `params`, a slow
+        execution can be EXPLAINed with the values it ran with."""
+        if not self.enabled:
+            return
+        key = fingerprint(sql)
+        explain = None
+        with self._lock:
+            self.statements += 1
+            entry = self._fingerprints.get(key)
+            if entry is None:
+                if len(self._fingerprints) >= self.max_fingerprints:
+                    cheapest = min(self._fingerprints, key=lambda x: self._fingerprints[x]["total_seconds"])
+                    del self._fingerprints[cheapest]
+                entry = self._fingerprints[key] = {
+                    "fingerprint": key,
+                    "count": 0,
+                    "total_seconds": 0.0,
+                    "max_seconds": 0.0,
+                    "rows_total": 0,
+                    "rows_max": 0,
+                    "plan": None,
+                    "full_scan": None,
+                    "explained": False,
+                }
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            if rows is not None and rows >= 0:
+                entry["rows_total"] += rows
+                entry["rows_max"] = max(entry["rows_max"], rows)
+            if seconds >= self.threshold and not entry["explained"] and cursor is not None:
+                entry["explained"] = True
+                explain = self._explainable(sql, cursor, params)
+
+        if explain is not None:
+            self.start()
+            try:
+                self._explain_queue.put_nowait((key, explain))
+            except queue.Full:
+                pass
+
+    @staticmethod
+    def _explainable(sql, cursor, params):
+        """The statement to EXPLAIN, with its values, or None. Multi-statement
+        batches and writes other than UPDATE and DELETE are not explained."""
+        statement = sql.strip()
+        if ";" in statement.rstrip(";") or not statement.upper().startswith(EXPLAINABLE):
+            return None
+        try:
+            return cursor.mogrify(statement, params)
+        except Exception:
+            return None
+
+    def _run(self):
+        while True:
+            key, statement = self._explain_queue.get()
+            try:
+                plan = self.explain(statement)
+            except Exception as e:
+                logging.error(f"EXPLAIN of {key} failed: {e}")
+                continue
+            with self._lock:
+                entry = self._fingerprints.get(key)
+                if entry is not None:
+                    entry["plan"] = plan
+                    entry["full_scan"] = any(row.get("type") == "ALL" for row in plan)
+                self.explained += 1
+
+    @staticmethod
+    def explain(statement, connection=None):
+        """Returns the EXPLAIN rows of `statement` as dicts."""
+        def run(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN {statement.rstrip(';')}")
+                columns = [col[0] for col in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            connection.commit()
+            return rows
+
+        if connection is not None:
+            return run(connection)
+        with db.connection() as connection:
+            return run(connection)
+
+    def report(self, top_n=None, order_by="total_seconds"):
+        """The `top_n` costliest fingerprints, by `order_by`."""
+        with self._lock:
+            entries = [dict(x) for x in self._fingerprints.values()]
+        entries.sort(key=lambda x: x[order_by], reverse=True)
+        for entry in entries:
+            entry["avg_seconds"] = entry["total_seconds"] / entry["count"]
+            entry["rows_avg"] = entry["rows_total"] / entry["count"]
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "statements": self.statements,
+            "fingerprints": len(self._fingerprints),
+            "explained": self.explained,
+            "slowest": entries[:top_n or self.top_n],
+        }
+
+    def clear(self):
+        with self._lock:
+            self._fingerprints.clear()
+            self.statements = 0
+
+
+profiler = QueryProfiler()
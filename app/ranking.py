@@ -0,0 +1,212 @@
+"""
+Feed ranking.
+
+Every video is a candidate in the list of its tag. Within a list, candidates
+are kept sorted by their base score from the configured scoring function,
+then by id. A ranking request gives each tag a boost; a video's feed score is
+its base score plus the boost of its tag, so the order within each list still
+holds and the global order is a lazy k-way merge of the lists. A page starts
+by bisecting every list at the cursor, so the database only has to look up
+the ids of the page.
+
+The candidates are the latest, active and not deleted rows of Video's own
+table, the table its save listener updates. Saves of other workers show up
+after the next reload, every `reload_interval` seconds.
+"""
+import heapq
+import logging
+import time
+from bisect import bisect_left
+from bisect import bisect_right
+from bisect import insort
+from itertools import islice
+from threading import Event
+from threading import Lock
+from threading import Thread
+
+from app.models import query as queries
+from app.models.video import Video
+from app.models.video import VersionedModel
+
+SCORERS = {}
+
+# Candidates are the videos that are neither inactive nor deleted
+CANDIDATE_CONDITION = "NOT COALESCE(deleted, false)"
+
+
+def scorer(name):
+    """Registers `function(video) -> float`, the base score of a video row."""
+    def register(function):
+        SCORERS[name] = function
+        return function
+    return register
+
+
+@scorer("none")
+def no_score(video):
+    return 0.0
+
+
+def _feed_keys(candidates, start, boost):
+    for i in range(start, len(candidates)):
+        base, video_id = candidates[i]
+        yield base - boost, video_id
+
+
+class RankingEngine:
+    def __init__(self, scoring="none", reload_interval=300):
+        self.table = Video.__tablename__
+        self.scoring = scoring
+        self.reload_interval = reload_interval
+        self.loaded = False
+        self.app = None
+        self._lists = {}
+        self._videos = {}
+        self._lock = Lock()
+        self._load_lock = Lock()
+        # Saves that land while a load runs, replayed on the loaded lists
+        self._pending = None
+        self._stop = Event()
+        self._thread = None
+        self.load_seconds = 0.0
+        Video.on_save(self.update)
+
+    def init_app(self, app):
+        self.app = app
+        self.scoring = app.config.get("FEED_SCORING", self.scoring)
+        self.reload_interval = app.config.get("FEED_RANKING_RELOAD_INTERVAL", self.reload_interval)
+        if self.scoring not in SCORERS:
+            raise ValueError(f"FEED_SCORING must be one of {list(SCORERS)}, got {self.scoring}")
+
+    def ensure_loaded(self):
+        """
+        Loads the candidates unless they are loaded and starts the reload
+        thread, once however many callers ask at the same time. `warm_up`
+        calls it, otherwise the first page does.
+        """
+        if self.loaded and (self._thread is not None or not self.reload_interval):
+            return
+        with self._load_lock:
+            if not self.loaded:
+                self.load()
+            if self.reload_interval and self._thread is None:
+                self._thread = Thread(target=self._reload, name="feed-ranking", daemon=True)
+                self._thread.start()
+
+    def _reload(self):
+        while not self._stop.wait(self.reload_interval):
+            with self._load_lock:
+                self.load()
+
+    def load(self):
+        started = time.perf_counter()
+        with self._lock:
+            self._pending = []
+        try:
+            with self.app.app_context():
+                columns, rows = VersionedModel.fetchall_rows(
+                    queries.select(self.table, "*", condition=CANDIDATE_CONDITION)
+                )
+        except Exception as e:
+            with self._lock:
+                self._pending = None
+            logging.error(f"Could not load feed candidates from {self.table}: {e}")
+            return
+        score = SCORERS[self.scoring]
+        lists = {}
+        videos = {}
+        for row in rows:
+            video = dict(zip(columns, row))
+            key = (-score(video), video["id"])
+            lists.setdefault(video["user_tag"], []).append(key)
+            videos[video["id"]] = (video["user_tag"], key)
+        for candidates in lists.values():
+            candidates.sort()
+        with self._lock:
+            self._lists = lists
+            self._videos = videos
+            pending, self._pending = self._pending, None
+            self._apply(pending)
+            self.loaded = True
+        self.load_seconds = time.perf_counter() - started
+        logging.info(f"Loaded {len(videos)} feed candidates in {self.load_seconds:.2f}s")
+
+    def _remove(self, video_id):
+        tag, key = self._videos.pop(video_id, (None, None))
+        if tag is not None:
+            candidates = self._lists[tag]
+            position = bisect_left(candidates, key)
+            if position < len(candidates) and candidates[position] == key:
+                del candidates[position]
+
+    def update(self, videos):
+        """Save listener of Video: moves saved videos to their current list."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(videos)
+            self._apply(videos)
+
+    def _apply(self, videos):
+        score = SCORERS[self.scoring]
+        for video in videos:
+            video_id = getattr(video, "id", None)
+            if video_id is None:
+                continue
+            self._remove(video_id)
+            if video.active and not getattr(video, "deleted", False):
+                key = (-score(video.__dict__), video_id)
+                tag = getattr(video, "user_tag", None)
+                insort(self._lists.setdefault(tag, []), key)
+                self._videos[video_id] = (tag, key)
+
+    def top(self, boosts, k, after=None):
+        """
+        Returns up to `k` (score, video_id) pairs in feed order, starting after
+        the (score, video_id) pair `after`.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            streams = []
+            for tag, candidates in self._lists.items():
+                boost = boosts.get(tag, 0)
+                start = 0
+                if after is not None:
+                    # first candidate whose feed key (base - boost, id) sorts after the cursor
+                    start = bisect_right(candidates, (boost - after[0], after[1]))
+                streams.append(_feed_keys(candidates, start, boost))
+            return [(-negative, video_id) for negative, video_id in islice(heapq.merge(*streams), k)]
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "scoring": self.scoring,
+            "candidates": len(self._videos),
+            "tags": len(self._lists),
+            "load_seconds": self.load_seconds,
+            "reload_interval": self.reload_interval,
+        }
+
+
+ranking = RankingEngine()
+
+
+def boosts_for(tags, boost=1):
+    return {tag.strip(): boost for tag in tags if tag and tag.strip()}
+
+
+def fetch_videos(table, video_ids, fields="id, video_path, user_tag, title"):
+    """Point lookups of a page of videos by id, returned in the order of `video_ids`."""
+    if not video_ids:
+        return []
+    query = queries.select(table, fields, where=(("id", "IN"),), condition=CANDIDATE_CONDITION)
+    rows = {row["id"]: row for row in VersionedModel.fetchall_dict(query, (tuple(video_ids),))}
+    return [rows[x] for x in video_ids if x in rows]
+
+
+async def afetch_videos(table, video_ids, fields="id, video_path, user_tag, title"):
+    """`fetch_videos` for the async entry point."""
+    if not video_ids:
+        return []
+    query = queries.select(table, fields, where=(("id", "IN"),), condition=CANDIDATE_CONDITION)
+    rows = {row["id"]: row for row in await VersionedModel.afetchall_dict(query, (tuple(video_ids),))}
+    return [rows[x] for x in video_ids if x in rows]
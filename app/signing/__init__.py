@@ -0,0 +1,22 @@
+from app.cache import get_backend
+from app.signing.batch import DEFAULT_WORKERS
+from app.signing.batch import asign_urls
+from app.signing.batch import init_executor
+from app.signing.batch import sign_urls
+from app.signing.cache import url_cache
+from app.signing.credentials import provider
+from app.signing.url import get_url
+
+
+def init_app(app):
+    provider.init_app(app)
+    url_cache.init_app(app, backend=get_backend(app.config.get("SIGNED_URL_CACHE_BACKEND"), app))
+    init_executor(app.config.get("SIGNING_WORKERS", DEFAULT_WORKERS))
+
+
+def warm_up():
+    provider.warm_up()
+
+
+def stats():
+    return dict(provider.stats(), cache=url_cache.stats())
@@ -0,0 +1,104 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+
+from app.metrics import metrics
+from app.signing.cache import url_cache
+from app.signing.url import get_url
+
+DEFAULT_WORKERS = 8
+
+_executor = None
+_executor_lock = Lock()
+_workers = DEFAULT_WORKERS
+
+
+def init_executor(workers=DEFAULT_WORKERS):
+    """Sets the size of the signer pool, which starts on its first use."""
+    global _executor, _workers
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+        _workers = workers
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_workers, thread_name_prefix="signer"
+                )
+    return _executor
+
+
+def signing_key(bucket_name, blob_name, config):
+    return bucket_name, blob_name, tuple(sorted(config.items()))
+
+
+def _lookup(requests):
+    """Returns the signing keys of `requests`, the cached (signed_url,
+    public_url) of the ones in the cache and the unique ones to sign."""
+    keys = [signing_key(*request) for request in requests]
+    unique = {}
+    for key, request in zip(keys, requests):
+        unique.setdefault(key, request)
+
+    signed = {}
+    misses = {}
+    for key, (bucket_name, blob_name, config) in unique.items():
+        cached = url_cache.lookup(bucket_name, blob_name, config)
+        if cached is not None:
+            signed[key] = cached
+        else:
+            misses[key] = (bucket_name, blob_name, config)
+    return keys, signed, misses
+
+
+def sign_urls(requests):
+    """
+    Signs a page of (bucket_name, blob_name, config) tuples at once.
+
+    Identical requests are signed only once, and the ones missing from the
+    signed url cache are signed concurrently on the shared signer pool. Returns a list of
+    (signed_url, public_url) tuples in the order of `requests`.
+    """
+    with metrics.span("sign"):
+        keys, signed, misses = _lookup(requests)
+
+        if len(misses) == 1:
+            (key, (bucket_name, blob_name, config)), = misses.items()
+            signed[key] = get_url(bucket_name, blob_name, **config)
+        elif misses:
+            executor = get_executor()
+            futures = {
+                key: executor.submit(get_url, bucket_name, blob_name, **config)
+                for key, (bucket_name, blob_name, config) in misses.items()
+            }
+            signed.update((key, future.result()) for key, future in futures.items())
+
+    return [signed[key] for key in keys]
+
+
+async def asign_urls(requests):
+    """
+    `sign_urls` for the async entry point: cache hits are answered on the
+    event loop, the misses are signed on the signer pool and awaited, so
+    signing never blocks the loop.
+    """
+    with metrics.span("sign"):
+        keys, signed, misses = _lookup(requests)
+
+    if misses:
+        loop = asyncio.get_running_loop()
+        executor = get_executor()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(executor, partial(get_url, bucket_name, blob_name, **config))
+            for bucket_name, blob_name, config in misses.values()
+        ))
+        signed.update(zip(misses, results))
+
+    return [signed[key] for key in keys]
@@ -0,0 +1,157 @@
+import datetime
+import heapq
+import time
+from threading import Lock
+
+from app.signing.local import expiration_seconds
+
+
+class SignedUrlCache:
+    """
+    Caches (signed_url, public_url) pairs by normalized signing parameters.
+
+    Signing times are floored to `bucket_seconds`, so every request for the
+    same object within one bucket gets the exact same URL, in this process and
+    in any other one sharing the backend. An entry is served only while at least
+    `min_validity` seconds of the URL's validity remain. When the cache is full,
+    the entries with the least validity left are evicted first.
+    """
+
+    def __init__(self, maxsize=10000, bucket_seconds=600, min_validity=900, backend=None):
+        self.maxsize = maxsize
+        self.bucket_seconds = bucket_seconds
+        self.min_validity = min_validity
+        self.backend = backend
+        self._entries = {}
+        self._heap = []
+        self._lock = Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def init_app(self, app, backend=None):
+        self.maxsize = app.config.get("SIGNED_URL_CACHE_SIZE", self.maxsize)
+        self.bucket_seconds = app.config.get("SIGNED_URL_CACHE_BUCKET_SECONDS", self.bucket_seconds)
+        self.min_validity = app.config.get("SIGNED_URL_MIN_VALIDITY", self.min_validity)
+        self.backend = backend
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._heap.clear()
+
+    def signing_time(self, expires_in, now=None):
+        """
+        Returns the start of the current time bucket, the signing time shared by
+        every request in it. Buckets shrink for short expirations so that a URL
+        always has at least `min_validity` seconds left, or as much as an
+        expiration shorter than that allows.
+        """
+        now = int(now if now is not None else time.time())
+        bucket = min(self.bucket_seconds, expires_in - self.min_validity)
+        if bucket <= 1:
+            return now
+        return now - now % bucket
+
+    @staticmethod
+    def normalize(bucket_name, blob_name, config, now):
+        config = {k: v for k, v in config.items() if v is not None}
+        config["method"] = (config.get("method") or "GET").upper()
+        config["version"] = config.get("version") or "v4"
+        config["expiration"] = expiration_seconds(config.get("expiration", 30), now)
+        return config, "|".join(
+            [bucket_name, blob_name] + [f"{k}={config[k]}" for k in sorted(config)]
+        )
+
+    def _prepare(self, bucket_name, blob_name, config, now):
+        config, params = self.normalize(
+            bucket_name, blob_name, config, datetime.datetime.utcfromtimestamp(now)
+        )
+        signed_at = self.signing_time(config["expiration"], now)
+        return config, f"{params}|{signed_at}", signed_at, signed_at + config["expiration"]
+
+    def lookup(self, bucket_name, blob_name, config):
+        """Returns the cached URL pair for the request without signing, or None."""
+        if isinstance(config.get("expiration"), datetime.datetime):
+            return None
+        now = time.time()
+        _, key, _, expires_at = self._prepare(bucket_name, blob_name, config, now)
+        return self.get(key, expires_at, now)
+
+    def get_or_sign(self, bucket_name, blob_name, config, sign):
+        """
+        Returns the cached URL pair for the request, or calls
+        sign(bucket_name, blob_name, now=signing_time, **config) and caches it.
+        """
+        now = time.time()
+        if isinstance(config.get("expiration"), datetime.datetime):
+            # Absolute expirations get shorter every second, never reuse them.
+            return sign(bucket_name, blob_name, **config)
+
+        config, key, signed_at, expires_at = self._prepare(bucket_name, blob_name, config, now)
+        value = self.get(key, expires_at, now)
+        if value is None:
+            self.misses += 1
+            value = sign(
+                bucket_name, blob_name, now=datetime.datetime.utcfromtimestamp(signed_at), **config
+            )
+            self.set(key, value, expires_at, now)
+        return value
+
+    def get(self, key, expires_at, now):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            value = entry[1]
+            if entry[0] - now >= self.min_validity:
+                self.hits += 1
+                return value
+
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                self.shared_hits += 1
+                value = tuple(value)
+                with self._lock:
+                    self._store(key, value, expires_at)
+                return value
+        return None
+
+    def set(self, key, value, expires_at, now):
+        usable_for = expires_at - self.min_validity - now
+        if usable_for <= 0:
+            return
+        with self._lock:
+            self._store(key, value, expires_at)
+        if self.backend is not None:
+            self.backend.set(key, value, usable_for)
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        heapq.heappush(self._heap, (expires_at, key))
+        while len(self._entries) > self.maxsize and self._heap:
+            expires_at, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == expires_at:
+                del self._entries[key]
+                self.evictions += 1
+        if len(self._heap) > 2 * self.maxsize:
+            self._heap = [(entry[0], key) for key, entry in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+        }
+
+
+url_cache = SignedUrlCache()
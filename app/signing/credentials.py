@@ -0,0 +1,117 @@
+import json
+import logging
+import os
+import time
+from threading import Lock
+
+from app.signing.local import LocalSigner
+
+
+class CredentialsProvider:
+    """
+    Holds the parsed service account key as a LocalSigner, created once per
+    process on first use (or by `warm_up`) and shared by every signing call.
+    The key file is re-read only when its modification time changes. A
+    storage client is only built if something asks for `client`.
+    """
+
+    def __init__(self, path="auth.json", check_interval=5):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = Lock()
+        self._stats_lock = Lock()
+        self._info = None
+        self._signer = None
+        self._client = None
+        self._mtime = None
+        self._checked_at = 0
+        self.key_loads = 0
+        self.key_load_seconds = 0.0
+        self.signatures = 0
+        self.sign_seconds = 0.0
+        self.sign_seconds_max = 0.0
+
+    def init_app(self, app):
+        self.path = app.config.get("GOOGLE_AUTH_FILE", self.path)
+        self.check_interval = app.config.get("GOOGLE_AUTH_CHECK_INTERVAL", self.check_interval)
+        self._signer = None
+
+    def warm_up(self):
+        """Loads the key now rather than on the first signature."""
+        try:
+            self.signer
+        except OSError as e:
+            logging.error(f"Could not load signing key {self.path}: {e}")
+
+    def load(self):
+        with self._lock:
+            self._load()
+
+    def _load(self):
+        started = time.perf_counter()
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path) as f:
+            info = json.load(f)
+        self._info = info
+        self._signer = LocalSigner(info)
+        self._client = None
+        self._mtime = mtime
+        self._checked_at = time.monotonic()
+        self.key_loads += 1
+        self.key_load_seconds = time.perf_counter() - started
+        logging.info(f"Loaded signing key {self.path} in {self.key_load_seconds:.4f}s")
+
+    def _is_stale(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        try:
+            return os.stat(self.path).st_mtime != self._mtime
+        except OSError:
+            logging.error(f"Signing key {self.path} is not readable, keeping the loaded key")
+            return False
+
+    @property
+    def signer(self):
+        if self._signer is None:
+            with self._lock:
+                # The first signatures of a page arrive together, load once
+                if self._signer is None:
+                    self._load()
+        elif self._is_stale():
+            self.load()
+        return self._signer
+
+    @property
+    def client(self):
+        self.signer  # reloads a changed key file
+        if self._client is None:
+            from google.cloud import storage
+            from google.oauth2 import service_account
+
+            credentials = service_account.Credentials.from_service_account_info(self._info)
+            self._client = storage.Client(
+                project=self._info.get("project_id"), credentials=credentials
+            )
+        return self._client
+
+    def record_signature(self, seconds):
+        with self._stats_lock:
+            self.signatures += 1
+            self.sign_seconds += seconds
+            self.sign_seconds_max = max(self.sign_seconds_max, seconds)
+
+    def stats(self):
+        return {
+            "key_file": self.path,
+            "key_loads": self.key_loads,
+            "key_load_seconds": self.key_load_seconds,
+            "signatures": self.signatures,
+            "sign_seconds_total": self.sign_seconds,
+            "sign_seconds_avg": self.sign_seconds / self.signatures if self.signatures else 0.0,
+            "sign_seconds_max": self.sign_seconds_max,
+        }
+
+
+provider = CredentialsProvider()
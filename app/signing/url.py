@@ -0,0 +1,37 @@
+import time
+
+from app.metrics import metrics
+from app.signing import local
+from app.signing.cache import url_cache
+from app.signing.credentials import provider
+
+
+def sign_url(bucket_name, blob_name, now=None, version="v4", expiration=30, method=None, response_type=None, content_type=None, bucket_bound_hostname=None):
+    signer = provider.signer
+    started = time.perf_counter()
+    with metrics.span("sign_url"):
+        url = local.generate_signed_url(
+            signer,
+            bucket_name,
+            blob_name,
+            version=version,
+            expiration=expiration,
+            method=method,
+            response_type=response_type,
+            content_type=content_type,
+            bucket_bound_hostname=bucket_bound_hostname,
+            now=now,
+        )
+    provider.record_signature(time.perf_counter() - started)
+    return url, local.public_url(bucket_name, blob_name)
+
+
+def get_url(bucket_name, blob_name, cache=True, version="v4", **config):
+    """
+    Returns (signed_url, public_url) for a blob. With `cache`, the pair comes
+    from the signed url cache whenever it has enough validity left.
+    """
+    config["version"] = version
+    if not cache:
+        return sign_url(bucket_name, blob_name, **config)
+    return url_cache.get_or_sign(bucket_name, blob_name, config, sign_url)
@@ -0,0 +1,60 @@
+"""
+Startup timing.
+
+`startup.phase(name)` times a step of `create_app` and counts the modules it
+imported. Once the app is created the phases are logged, and /admin/startup
+serves them with the warm-up phases that ran later. To profile a cold start,
+see app.startup_profile.
+"""
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+STARTUP_MODES = ("eager", "background", "lazy")
+
+
+class StartupTimer:
+    def __init__(self):
+        # app.startup is the first module app imports
+        self.started = time.perf_counter()
+        self.modules_at_start = len(sys.modules)
+        self.created_seconds = None
+        self._phases = []
+        self._lock = Lock()
+
+    @contextmanager
+    def phase(self, name):
+        modules = len(sys.modules)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._phases.append({
+                    "name": name,
+                    "seconds": time.perf_counter() - started,
+                    "modules_imported": len(sys.modules) - modules,
+                })
+
+    def app_created(self):
+        """Marks the end of `create_app` and logs the phases so far."""
+        self.created_seconds = time.perf_counter() - self.started
+        phases = ", ".join(f"{x['name']} {x['seconds']:.3f}s" for x in self.phases())
+        logging.info(f"App created in {self.created_seconds:.3f}s ({phases})")
+
+    def phases(self):
+        with self._lock:
+            return [dict(x) for x in self._phases]
+
+    def report(self):
+        return {
+            "created_seconds": self.created_seconds,
+            "modules": len(sys.modules),
+            "modules_imported": len(sys.modules) - self.modules_at_start,
+            "phases": self.phases(),
+        }
+
+
+startup = StartupTimer()
@@ -0,0 +1,75 @@
+"""
+Profiles a cold start of the app.
+
+    python -m app.startup_profile
+    python -m app.startup_profile --cli --top 30
+
+runs `create_app` in a fresh interpreter under `python -X importtime` and
+prints its phases, see app.startup, and the packages that took longest to
+import.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+def import_times(stderr):
+    """(self seconds, cumulative seconds, module) of every `-X importtime`
+    line in `stderr`."""
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        times.append((int(self_us) / 1e6, int(cumulative_us) / 1e6, module.strip()))
+    return times
+
+
+PROFILE_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+from app.startup import startup
+create_app(cli={cli})
+print(json.dumps(dict(startup.report(), wall_seconds=time.perf_counter() - started)))
+"""
+
+
+def profile(cli=False, top=20):
+    """Runs `create_app(cli=cli)` under -X importtime and prints where the
+    time went."""
+    # Nothing loaded on a background thread competes with the measurement
+    env = dict(os.environ, STARTUP_WARM_UP="lazy")
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROFILE_SCRIPT.format(cli=cli)],
+        capture_output=True, text=True, env=env,
+    )
+    if process.returncode != 0:
+        sys.exit(process.stderr)
+    report = json.loads(process.stdout.strip().splitlines()[-1])
+
+    print(f"create_app(cli={cli}) in {report['wall_seconds']:.3f}s, {report['modules_imported']} modules imported")
+    for phase in report["phases"]:
+        print(f"  {phase['name']:<30} {phase['seconds']:>8.3f}s {phase['modules_imported']:>6} modules")
+
+    packages = {}
+    for self_seconds, _, module in import_times(process.stderr):
+        package = module.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + self_seconds
+    print("\nslowest packages to import (self time)")
+    for package, seconds in sorted(packages.items(), key=lambda x: -x[1])[:top]:
+        print(f"  {package:<30} {seconds:>8.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.startup_profile")
+    parser.add_argument("--cli", action="store_true", help="profile create_app(cli=True), as migrate.py runs it")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+    profile(args.cli, args.top)
+
+
+if __name__ == "__main__":
+    main()
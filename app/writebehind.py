@@ -0,0 +1,225 @@
+import atexit
+import logging
+import os
+import queue
+import time
+from threading import Lock
+from threading import Thread
+
+POLICIES = ("block", "drop_newest", "drop_oldest", "sync")
+
+_STOP = object()
+
+
+class QueueFull(Exception):
+    pass
+
+
+class EventDropped(QueueFull):
+    """The queue was full and a drop policy turned the new event away."""
+
+
+class WriteBehindQueue:
+    """
+    Acknowledges model saves immediately and writes them in the background.
+
+    Saved models wait in a bounded in-process queue. A flusher thread writes
+    them with `save_prepared` once `batch_size` are waiting or
+    `flush_interval` seconds after the first one arrived. When the queue is
+    full, `policy` decides what happens to a new event:
+
+    - block: wait up to `block_timeout` seconds for room, then raise QueueFull
+    - drop_newest: drop the new event and raise EventDropped
+    - drop_oldest: drop the oldest queued event to make room, already
+      acknowledged and only counted in `dropped`
+    - sync: write the new event on the calling thread
+
+    The queue and its flusher start with `warm_up` or the first `put`, and
+    again in a process forked after they started, which inherits neither
+    the thread nor, usefully, the queued events: the parent writes those.
+    """
+
+    def __init__(self, maxsize=10000, batch_size=500, flush_interval=0.5, policy="block", block_timeout=1.0):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.enabled = False
+        self.app = None
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._start_lock = Lock()
+        self._stats_lock = Lock()
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.written_sync = 0
+        self.flushes = 0
+        self.flush_seconds = 0.0
+        self.flush_seconds_max = 0.0
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get("WRITE_BEHIND_ENABLED", False)
+        self.maxsize = app.config.get("WRITE_BEHIND_QUEUE_SIZE", self.maxsize)
+        self.batch_size = app.config.get("WRITE_BEHIND_BATCH_SIZE", self.batch_size)
+        self.flush_interval = app.config.get("WRITE_BEHIND_FLUSH_INTERVAL", self.flush_interval)
+        self.policy = app.config.get("WRITE_BEHIND_POLICY", self.policy)
+        self.block_timeout = app.config.get("WRITE_BEHIND_BLOCK_TIMEOUT", self.block_timeout)
+        if self.policy not in POLICIES:
+            raise ValueError(f"WRITE_BEHIND_POLICY must be one of {POLICIES}, got {self.policy}")
+
+    def start(self):
+        """Starts the queue and its flusher in this process, once."""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            first = self._pid is None
+            self._queue = queue.Queue(maxsize=self.maxsize)
+            self._thread = Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+        if first:
+            # Forked processes inherit the handler
+            atexit.register(self.stop)
+
+    def stop(self, timeout=30):
+        """Stops accepting events and writes everything still queued, waiting
+        at most `timeout` seconds."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self.enabled = False
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logging.error(f"Write-behind stopped with {self._queue.qsize()} events not written")
+        else:
+            self._thread.join(max(deadline - time.monotonic(), 0))
+        self._thread = None
+
+    def put(self, model):
+        """
+        Queues `model` for saving and returns the version that will be written,
+        with its entity_id and version already assigned. Raises QueueFull when
+        the queue has no room for it, EventDropped under a drop policy.
+        """
+        self.start()
+        prepared = model.prepare_save()
+        try:
+            self._queue.put_nowait(prepared)
+        except queue.Full:
+            if not self._handle_full(prepared):
+                return prepared[0]
+        with self._stats_lock:
+            self.enqueued += 1
+        return prepared[0]
+
+    def _handle_full(self, prepared):
+        """Applies the backpressure policy, returns True if `prepared` got queued."""
+        if self.policy == "block":
+            try:
+                self._queue.put(prepared, timeout=self.block_timeout)
+                return True
+            except queue.Full:
+                raise QueueFull(f"Write-behind queue is full ({self.maxsize} events)")
+        if self.policy == "drop_oldest":
+            try:
+                self._queue.get_nowait()
+                self._count("dropped")
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(prepared)
+                return True
+            except queue.Full:
+                self._count("dropped")
+                raise EventDropped(f"Write-behind queue is full ({self.maxsize} events), event dropped")
+        if self.policy == "sync":
+            new_entity, _ = prepared
+            new_entity.__class__.save_prepared([prepared])
+            self._count("written_sync")
+            return False
+        self._count("dropped")
+        raise EventDropped(f"Write-behind queue is full ({self.maxsize} events), event dropped")
+
+    def _count(self, name, value=1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if stopping:
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        batch.append(item)
+            if batch:
+                self.flush(batch)
+
+    def flush(self, batch):
+        started = time.perf_counter()
+        by_model = {}
+        for prepared in batch:
+            by_model.setdefault(prepared[0].__class__, []).append(prepared)
+
+        with self.app.app_context():
+            for model, prepared in by_model.items():
+                try:
+                    model.save_prepared(prepared)
+                    self._count("flushed", len(prepared))
+                except Exception as e:
+                    logging.error(f"Write-behind flush of {len(prepared)} {model.__tablename__} rows failed: {e}")
+                    self._count("failed", len(prepared))
+
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self.flushes += 1
+            self.flush_seconds += elapsed
+            self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "policy": self.policy,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "maxsize": self.maxsize,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "written_sync": self.written_sync,
+            "flushes": self.flushes,
+            "flush_seconds_avg": self.flush_seconds / self.flushes if self.flushes else 0.0,
+            "flush_seconds_max": self.flush_seconds_max,
+        }
+
+
+write_behind = WriteBehindQueue()
@@ -0,0 +1,6 @@
+from app.aio import create_async_app
+
+app = create_async_app()
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0')
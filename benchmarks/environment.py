@@ -0,0 +1,79 @@
+"""
+The database and signing key the benchmarks run against.
+
+Every benchmark takes the same database arguments: --host and friends for a
+MySQL or MariaDB server, otherwise the embedded stand-in in --standin, see
+benchmarks.standin. URLs are signed with a fake service account key made up
+locally on first use, so no Google credentials are needed; the signatures
+are valid RSA signatures, only not by a key Google knows.
+"""
+import json
+import os
+
+DEFAULT_STANDIN = "bench.sqlite3"
+FAKE_KEY = "bench-auth.json"
+
+
+def add_database_arguments(parser):
+    parser.add_argument("--host", help="MySQL host, the embedded stand-in without it")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="claps_bench")
+    parser.add_argument("--standin", default=DEFAULT_STANDIN, help="SQLite file of the stand-in")
+
+
+def fake_key(path=FAKE_KEY):
+    """Writes a service account key file with a fresh RSA key to `path`,
+    unless there is one, and returns `path`."""
+    if os.path.exists(path):
+        return path
+    import rsa
+
+    _, private_key = rsa.newkeys(2048)
+    info = {
+        "type": "service_account",
+        "project_id": "claps-bench",
+        "private_key_id": "bench",
+        "private_key": private_key.save_pkcs1().decode(),
+        "client_email": "bench@claps-bench.iam.gserviceaccount.com",
+        "client_id": "0",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }
+    with open(path, "w") as f:
+        json.dump(info, f)
+    return path
+
+
+def describe(args):
+    if args.host:
+        return f"mysql://{args.user}@{args.host}:{args.port}/{args.database}"
+    return f"standin:{args.standin}"
+
+
+def create_bench_app(args, **config):
+    """
+    `create_app` on the benchmark database and the fake key. `config` sets
+    further environment variables, read by config.py when create_app
+    imports it.
+    """
+    from app import create_app
+    from app import db
+
+    if args.host:
+        os.environ.update(
+            MYSQL_HOST=args.host,
+            MYSQL_PORT=str(args.port),
+            MYSQL_USER=args.user,
+            MYSQL_PASSWORD=args.password,
+            MYSQL_DATABASE=args.database,
+        )
+    else:
+        if not os.path.exists(args.standin):
+            raise SystemExit(f"{args.standin} does not exist, run python -m benchmarks.seed first")
+        from benchmarks import standin
+
+        db.factory = standin.connector(args.standin)
+    os.environ["GOOGLE_AUTH_FILE"] = fake_key()
+    os.environ.update({name: str(value) for name, value in config.items()})
+    return create_app()
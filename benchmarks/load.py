@@ -0,0 +1,239 @@
+"""
+HTTP load driver for the video API: a weighted mix of GET /videos,
+GET /videos/real and the POST endpoints, from --concurrency clients for
+--duration seconds, reporting the p50/p95/p99 latency and the throughput of
+every endpoint.
+
+    python -m benchmarks.seed --events 100000
+    python -m benchmarks.load --duration 30 --concurrency 16
+    python -m benchmarks.load --url http://127.0.0.1:5000 --mix real=6,view=3,clap=1
+
+Without --url the app is served in this process on the benchmark database,
+see benchmarks.environment, by the threaded development server. With --url
+the load goes to a running server, e.g. gunicorn or `hypercorn asgi:app`,
+and the database arguments only matter for the ids the clients pick. Every
+client keeps its connection alive and sends without Nagle's delay
+(TCP_NODELAY), as does the server in this process. Results are saved as
+JSON, see benchmarks.results.
+"""
+import argparse
+import http.client
+import json
+import random
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmarks import environment
+from benchmarks import results
+from benchmarks import seed
+
+DEFAULT_MIX = "real=5,videos=2,view=4,clap=2,bookmark=1,video_post=1"
+
+
+def real(rng, ids):
+    return "GET", f"/videos/real?user_id={rng.randrange(ids.users)}", None
+
+
+def videos(rng, ids):
+    return "GET", "/videos", None
+
+
+def videos_page(rng, ids):
+    return "GET", "/videos?page_size=20", None
+
+
+def event(path):
+    def request(rng, ids):
+        body = {"video_id": str(rng.randrange(ids.videos)), "user_id": str(rng.randrange(ids.users))}
+        return "POST", path, body
+    return request
+
+
+def video_post(rng, ids):
+    tag = rng.choice(seed.TAGS)
+    body = {
+        "id": f"load-{rng.getrandbits(64):x}",
+        "title": f"A video about {tag}",
+        "user_id": str(rng.randrange(ids.users)),
+        "user_tag": tag,
+        "deleted": False,
+        "original_content": True,
+        "update_complete": False,
+    }
+    return "POST", "/videos", body
+
+
+ENDPOINTS = {
+    "real": real,
+    "videos": videos,
+    "videos_page": videos_page,
+    "view": event("/videos/view"),
+    "clap": event("/videos/clap"),
+    "bookmark": event("/videos/bookmark"),
+    "video_post": video_post,
+}
+
+
+class Ids:
+    def __init__(self, events):
+        self.videos, self.users = seed.scale(events)
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"unknown endpoint {name}, one of {', '.join(ENDPOINTS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of sorted `ordered`."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+
+class Client(threading.Thread):
+    def __init__(self, url, weights, ids, seed, deadline, timeout):
+        super().__init__(daemon=True)
+        self.url = urlsplit(url)
+        self.names = list(weights)
+        self.weights = list(weights.values())
+        self.ids = ids
+        self.rng = random.Random(seed)
+        self.deadline = deadline
+        self.timeout = timeout
+        self.latencies = {name: [] for name in self.names}
+        self.errors = {name: 0 for name in self.names}
+        self._connection = None
+
+    def connection(self):
+        if self._connection is None:
+            connection = http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=self.timeout)
+            connection.connect()
+            # Small requests go out at once instead of waiting on the last ACK
+            connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._connection = connection
+        return self._connection
+
+    def request(self, method, path, body):
+        headers = {}
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        try:
+            connection = self.connection()
+            connection.request(method, self.url.path.rstrip("/") + path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            if self._connection is not None:
+                self._connection.close()
+            self._connection = None
+            return None
+
+    def run(self):
+        while time.monotonic() < self.deadline:
+            name = self.rng.choices(self.names, self.weights)[0]
+            started = time.perf_counter()
+            status = self.request(*ENDPOINTS[name](self.rng, self.ids))
+            elapsed = time.perf_counter() - started
+            if status is None or status >= 400:
+                self.errors[name] += 1
+            else:
+                self.latencies[name].append(elapsed)
+
+
+def summarize(name, latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    measured = {
+        "requests": len(ordered),
+        "errors": errors,
+        "rate": len(ordered) / elapsed,
+        "mean": sum(ordered) / len(ordered) if ordered else None,
+        "max": ordered[-1] if ordered else None,
+    }
+    for p in (50, 95, 99):
+        measured[f"p{p}"] = percentile(ordered, p)
+    ms = {k: f"{v * 1000:.1f}" if v is not None else "-" for k, v in measured.items() if k in ("p50", "p95", "p99")}
+    print(f"{name:<14} {measured['rate']:>9.1f} req/s  p50 {ms['p50']:>7} ms  p95 {ms['p95']:>7} ms  "
+          f"p99 {ms['p99']:>7} ms  {errors} errors")
+    return measured
+
+
+def drive(url, weights, ids, args):
+    deadline = time.monotonic() + args.warmup + args.duration
+    clients = [
+        Client(url, weights, ids, args.seed * 1000 + i, deadline, args.timeout) for i in range(args.concurrency)
+    ]
+    for client in clients:
+        client.start()
+    if args.warmup:
+        # Requests of the warm-up are measured, then dropped
+        time.sleep(args.warmup)
+        for client in clients:
+            for name in client.names:
+                client.latencies[name] = []
+                client.errors[name] = 0
+    started = time.monotonic()
+    for client in clients:
+        client.join()
+    elapsed = time.monotonic() - started
+
+    measured = {}
+    for name in weights:
+        latencies = [x for client in clients for x in client.latencies[name]]
+        errors = sum(client.errors[name] for client in clients)
+        measured[name] = summarize(name, latencies, errors, elapsed)
+    latencies = [x for client in clients for name in weights for x in client.latencies[name]]
+    errors = sum(sum(client.errors.values()) for client in clients)
+    measured["total"] = summarize("total", latencies, errors, elapsed)
+    return measured
+
+
+def serve(args):
+    """Serves the app on the benchmark database in a background thread and
+    returns its url."""
+    from werkzeug.serving import WSGIRequestHandler
+    from werkzeug.serving import make_server
+
+    class NoDelayRequestHandler(WSGIRequestHandler):
+        def setup(self):
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            super().setup()
+
+    app = environment.create_bench_app(args)
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=NoDelayRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load")
+    parser.add_argument("--url", help="server to load, served in this process without it")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"endpoint=weight,... of {', '.join(ENDPOINTS)}")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds before measuring")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--events", type=int, default=100000, help="--events the database was seeded with")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="default: results/load-<commit>.json")
+    environment.add_database_arguments(parser)
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    url = args.url or serve(args)
+    print(f"{args.concurrency} clients on {url} for {args.duration:.0f}s")
+    measured = drive(url, weights, Ids(args.events), args)
+    results.save("load", args, measured, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Microbenchmarks of the model layer and URL signing, on a seeded database.
+
+    python -m benchmarks.seed --events 100000
+    python -m benchmarks.models
+    python -m benchmarks.models --only save --only signing
+    python -m benchmarks.models --host 127.0.0.1 --user root --password blink182 --database claps_bench
+
+- get_all: every latest video, as models, as records and streamed
+- get_as_dict: of the videos get_all returned
+- save: new View events, and new versions of existing videos
+- video_urls: pages of feed videos, with a cold and a warm signed url cache
+- signing: one signature per blob, without the cache
+
+Signing uses the fake key of benchmarks.environment. Results are saved as
+JSON, see benchmarks.results. Saves write to the database, so seed it again
+before a run whose numbers you compare.
+"""
+import argparse
+import random
+import time
+
+from app.controllers.video import videos_urls
+from app.models.video import Video
+from app.models.video import View
+from app.ranking import fetch_videos
+from app.signing import url_cache
+from app.signing.url import sign_url
+from benchmarks import environment
+from benchmarks import results
+from benchmarks import seed
+
+BUCKET = "development.videos.static.processed.claps.ai"
+
+
+def measure(name, n, unit, run):
+    """Times `run()`, which handles `n` `unit`s, and prints the rate."""
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+    rate = n / elapsed if elapsed else 0.0
+    print(f"{name:<40} {rate:>12.0f} {unit}/s")
+    return name, {"n": n, "seconds": elapsed, "rate": rate, "unit": unit}
+
+
+def get_all_benchmarks(args):
+    count = len(list(Video.get_all("id", records=True)))
+    yield measure("get_all, models", count, "rows", lambda: list(Video.get_all("*")))
+    yield measure("get_all, records", count, "rows", lambda: list(Video.get_all("*", records=True)))
+    yield measure("get_all, streamed records", count, "rows", lambda: list(Video.get_all("*", stream=True, records=True)))
+
+
+def get_as_dict_benchmarks(args):
+    videos = list(Video.get_all("*"))
+
+    def run():
+        for video in videos:
+            video.get_as_dict()
+
+    yield measure("get_as_dict", len(videos), "models", run)
+
+
+def save_benchmarks(args):
+    rng = random.Random(args.seed)
+    _, users = seed.scale(args.events)
+    views = [View(video_id=str(rng.randrange(args.videos_in_db)), user_id=str(rng.randrange(users))) for _ in range(args.saves)]
+    videos = list(Video.get_all("*", limit=args.saves))
+
+    def save_views():
+        for view in views:
+            view.save()
+
+    def save_videos():
+        for video in videos:
+            video.title += "!"
+            video.save()
+
+    yield measure("save, new view", len(views), "saves", save_views)
+    yield measure("save, new version of a video", len(videos), "saves", save_videos)
+
+
+def video_urls_benchmarks(args):
+    ids = [str(i) for i in range(min(args.videos_in_db, args.page_size * args.pages))]
+    rows = fetch_videos(Video.__tablename__, ids, fields="id, video_path, user_tag, title, update_complete")
+    pages = [rows[i:i + args.page_size] for i in range(0, len(rows), args.page_size)]
+
+    def run():
+        for page in pages:
+            videos_urls([dict(x) for x in page])
+
+    url_cache.clear()
+    yield measure("video_urls, cold cache", len(rows), "videos", run)
+    yield measure("video_urls, warm cache", len(rows), "videos", run)
+
+
+def signing_benchmarks(args):
+    def run():
+        for i in range(args.signatures):
+            sign_url(BUCKET, f"{i}/video.mp4", expiration=7200, method="GET", response_type="video/mp4")
+
+    yield measure("signing", args.signatures, "signatures", run)
+
+
+BENCHMARKS = {
+    "get_all": get_all_benchmarks,
+    "get_as_dict": get_as_dict_benchmarks,
+    "save": save_benchmarks,
+    "video_urls": video_urls_benchmarks,
+    "signing": signing_benchmarks,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.models")
+    parser.add_argument("--only", action="append", choices=list(BENCHMARKS), help="default: all of them")
+    parser.add_argument("--events", type=int, default=100000, help="--events the database was seeded with")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--saves", type=int, default=1000)
+    parser.add_argument("--pages", type=int, default=100, help="feed pages for video_urls")
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--signatures", type=int, default=2000)
+    parser.add_argument("--output", help="default: results/models-<commit>.json")
+    environment.add_database_arguments(parser)
+    args = parser.parse_args()
+    args.videos_in_db, _ = seed.scale(args.events)
+
+    # The background loads and refreshes would compete with the benchmarks
+    app = environment.create_bench_app(
+        args,
+        STARTUP_WARM_UP="eager",
+        ENGAGEMENT_INDEX_REFRESH_INTERVAL=0,
+        FEED_RANKING_RELOAD_INTERVAL=0,
+        COUNTERS_RECONCILE_INTERVAL=0,
+        QUERY_PROFILER_ENABLED="false",
+    )
+    print(f"on {environment.describe(args)}")
+
+    measured = {}
+    for name in args.only or BENCHMARKS:
+        with app.app_context():
+            measured.update(BENCHMARKS[name](args))
+    results.save("models", args, measured, args.output)
+
+
+if __name__ == "__main__":
+    main()
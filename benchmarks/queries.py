@@ -0,0 +1,103 @@
+"""
+Measures the cost of building model queries, before and after the
+parameterized query builder.
+
+    python -m benchmarks.queries -n 200000
+    python -m benchmarks.queries --host 127.0.0.1 --user root --password blink182 --database claps_net
+
+Without --host only the client side is measured: the old f-string statement
+against a cached compiled statement plus driver-side parameter escaping. With
+--host, both statements are also run against the `video` table to compare
+queries per second end to end.
+"""
+import argparse
+import time
+from uuid import uuid4
+
+from pymysql.converters import escape_item
+from pymysql.converters import escape_string
+
+from app.models import query as queries
+
+
+def old_get(table, key, value):
+    return f"""SELECT * FROM {table} WHERE {key} = '{str(value)}' AND latest = true AND active = true;"""
+
+
+def old_get_all(table, fields, condition, limit, offset):
+    default_condition = "latest = true AND active = true"
+    condition = condition + " AND " + default_condition if condition else default_condition
+    limit_query = f"LIMIT {limit}" if limit else ""
+    offset_query = f"OFFSET {offset}" if offset else ""
+    return f"""SELECT {fields} FROM {table} WHERE {condition} {limit_query} {offset_query};"""
+
+
+def new_get(table, key, value):
+    sql = queries.select(table, where=((key, "="),))
+    return sql % tuple(escape_item(x, "utf8mb4") for x in (value,))
+
+
+def new_get_all(table, fields, condition, limit, offset):
+    sql = queries.select(table, fields, limit=True, offset=True)
+    return sql % tuple(escape_item(x, "utf8mb4") for x in (limit, offset))
+
+
+def rate(name, n, build):
+    values = [uuid4().hex for _ in range(min(n, 10000))]
+    started = time.perf_counter()
+    for i in range(n):
+        build(values[i % len(values)])
+    elapsed = time.perf_counter() - started
+    print(f"{name:<40} {n / elapsed:>12.0f} statements/s")
+
+
+def client_side(n):
+    rate("get, f-string", n, lambda v: old_get("video", "entity_id", escape_string(v)))
+    rate("get, compiled + parameters", n, lambda v: new_get("video", "entity_id", v))
+    rate("get_all, f-string", n, lambda v: old_get_all("video", "*", "true", 20, 40))
+    rate("get_all, compiled + parameters", n, lambda v: new_get_all("video", "*", "true", 20, 40))
+    print(queries.stats())
+
+
+def server_side(args):
+    import pymysql
+
+    connection = pymysql.connect(
+        host=args.host, port=args.port, user=args.user, password=args.password, database=args.database
+    )
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT entity_id FROM video LIMIT 1000")
+        ids = [row[0] for row in cursor.fetchall()] or [uuid4().hex]
+
+        def run(name, execute):
+            started = time.perf_counter()
+            for i in range(args.queries):
+                execute(ids[i % len(ids)])
+                cursor.fetchall()
+            elapsed = time.perf_counter() - started
+            print(f"{name:<40} {args.queries / elapsed:>12.0f} queries/s")
+
+        sql = queries.select("video", where=(("entity_id", "="),))
+        run("get against MySQL, f-string", lambda v: cursor.execute(old_get("video", "entity_id", v)))
+        run("get against MySQL, compiled", lambda v: cursor.execute(sql, (v,)))
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.queries")
+    parser.add_argument("-n", type=int, default=100000, help="statements to build")
+    parser.add_argument("--queries", type=int, default=5000, help="statements to run against MySQL")
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="claps_net")
+    args = parser.parse_args()
+
+    client_side(args.n)
+    if args.host:
+        server_side(args)
+
+
+if __name__ == "__main__":
+    main()
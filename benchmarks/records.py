@@ -0,0 +1,89 @@
+"""
+Compares materializing and serializing listing rows as models against the
+slotted records of app.models.records.
+
+    python -m benchmarks.records -n 100000
+
+Rows are generated in memory with the column layout of the `video` table, so
+no database is needed; a column the model gains gets a value by its type.
+"""
+import argparse
+import datetime
+import time
+import tracemalloc
+import typing
+from uuid import uuid4
+
+from app.models import records
+from app.models.video import Video
+
+
+NOW = datetime.datetime(2022, 11, 1, 12, 0)
+
+# The value of a column by its annotated type, unless VALUES names one
+DEFAULTS = {str: "", bool: 1, int: 0, datetime.datetime: NOW}
+
+VALUES = {
+    "previous_version": "0" * 32,
+    "changed_by_id": None,
+    "video_path": "a1b2c3/video.mp4",
+    "title": "A video about data science",
+    "user_id": "19973",
+    "user_tag": "data science",
+    "deleted": 0,
+}
+
+
+def generate_rows(n):
+    columns = tuple(Video.annotations())
+    types = typing.get_type_hints(Video)
+    values = {x: VALUES[x] if x in VALUES else DEFAULTS[types[x]] for x in columns}
+    rows = []
+    for i in range(n):
+        values.update(entity_id=uuid4().hex, version=uuid4().hex, id=str(i))
+        rows.append(tuple(values[column] for column in columns))
+    return columns, rows
+
+
+def model_path(columns, rows):
+    # the path get_all and get_for_api took before records
+    models = []
+    for row in rows:
+        model = dict(zip([col for col in columns], row))
+        o = Video()
+        for k, v in model.items():
+            setattr(o, k, v)
+        models.append(o)
+    return models, [x.get_for_api() for x in models]
+
+
+def record_path(columns, rows):
+    build = records.row_builder(Video, columns)
+    items = [build(row) for row in rows]
+    return items, [x.get_for_api() for x in items]
+
+
+def measure(name, path, columns, rows):
+    tracemalloc.start()
+    started = time.perf_counter()
+    items, serialized = path(columns, rows)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<10} {len(rows) / elapsed:>12.0f} rows/s {peak / len(rows):>10.0f} bytes/row peak")
+    return serialized
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.records")
+    parser.add_argument("-n", type=int, default=100000, help="rows to materialize")
+    args = parser.parse_args()
+
+    columns, rows = generate_rows(args.n)
+    expected = measure("models", model_path, columns, rows)
+    actual = measure("records", record_path, columns, rows)
+    assert expected == actual, "records serialize differently from models"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark results as JSON, to compare runs across commits.
+
+    python -m benchmarks.results results/models-a1b2c3d.json results/models-e4f5a6b.json
+
+Every result file records the commit it was measured on, whether the tree
+had uncommitted changes, the arguments of the run and, per benchmark, its
+measurements. Comparing two files prints the change of every measurement
+they share.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+RESULTS_DIR = "results"
+
+# Measurements where lower is better, all others are rates
+LOWER_IS_BETTER = ("p50", "p95", "p99", "max", "mean", "seconds", "errors")
+
+
+def _git(*args):
+    try:
+        return subprocess.run(
+            ("git",) + args, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_info():
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "finished_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+
+
+def default_path(benchmark):
+    commit = (_git("rev-parse", "--short", "HEAD") or "unknown")
+    return os.path.join(RESULTS_DIR, f"{benchmark}-{commit}.json")
+
+
+def save(benchmark, args, results, path=None):
+    """Writes `results` (name -> measurements) of `benchmark` run with `args`
+    to `path`, by default results/<benchmark>-<commit>.json."""
+    path = path or default_path(benchmark)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    document = dict(run_info(), benchmark=benchmark, args=vars(args), results=results)
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2, sort_keys=True, default=str)
+    print(f"saved {path}")
+    return path
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(old, new):
+    """Prints every numeric measurement of both runs and its change."""
+    print(f"{'':<50} {(old['commit'] or '?')[:10]:>12} {(new['commit'] or '?')[:10]:>12}")
+    for name, measurements in new["results"].items():
+        before = old["results"].get(name)
+        if before is None:
+            continue
+        for key, value in measurements.items():
+            if not isinstance(value, (int, float)) or not isinstance(before.get(key), (int, float)):
+                continue
+            change = ""
+            if before[key]:
+                ratio = value / before[key] - 1
+                better = (ratio < 0) if key in LOWER_IS_BETTER else (ratio > 0)
+                change = f"{ratio:+.1%}" + (" better" if better and ratio else " worse" if ratio else "")
+            print(f"{name + ' ' + key:<50} {before[key]:>12.4g} {value:>12.4g}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.results")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args()
+
+    old, new = load(args.old), load(args.new)
+    if old["benchmark"] != new["benchmark"]:
+        sys.exit(f"{args.old} is a {old['benchmark']} run, {args.new} a {new['benchmark']} run")
+    compare(old, new)
+
+
+if __name__ == "__main__":
+    main()
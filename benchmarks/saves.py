@@ -0,0 +1,118 @@
+"""
+Measures VersionedModel.save: building the next version, and saves per
+second against MySQL before and after the single round trip save and with
+group commit.
+
+    python -m benchmarks.saves -n 100000
+    python -m benchmarks.saves --host 127.0.0.1 --user root --password blink182 --database claps_bench
+
+Without --host only the construction of the next version is measured. With
+--host, videos are created and updated in the `video` table of --database,
+so point it at a scratch database:
+
+- three round trips: UPDATE, INSERT and COMMIT sent one by one, as before
+- one round trip: the same statements as one multi-statement batch
+- the same with --threads concurrent savers, without and with group commit
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+from app import create_app
+from app.groupcommit import group_commit
+from app.models.video import Video
+
+
+def make_video(i):
+    return Video(
+        id=str(i),
+        title="A video about data science",
+        user_id="19973",
+        user_tag="data science",
+        deleted=False,
+        original_content=True,
+        update_complete=True,
+    )
+
+
+def old_get_new_from_existing(model):
+    # get_new_from_existing before the direct __dict__ copy
+    properties = model.get_as_dict()
+    new_entity = model.__class__(**properties)
+    new_entity.version = uuid4().hex
+    new_entity.previous_version = model.version
+    return new_entity
+
+
+def construction(n):
+    video = make_video(0).get_new_from_scratch()
+    for name, build in (
+        ("next version, get_as_dict + __init__", lambda: old_get_new_from_existing(video)),
+        ("next version, __dict__ copy", video.get_new_from_existing),
+    ):
+        started = time.perf_counter()
+        for _ in range(n):
+            build()
+        elapsed = time.perf_counter() - started
+        print(f"{name:<45} {n / elapsed:>12.0f} versions/s")
+
+
+def saves(args):
+    os.environ.update(
+        MYSQL_HOST=args.host,
+        MYSQL_PORT=str(args.port),
+        MYSQL_USER=args.user,
+        MYSQL_PASSWORD=args.password,
+        MYSQL_DATABASE=args.database,
+        MYSQL_POOL_SIZE=str(args.threads + 2),
+        MYSQL_MULTI_STATEMENTS="true",
+    )
+    # config.py reads the environment when create_app imports it
+    app = create_app()
+
+    def save_and_update(i):
+        with app.app_context():
+            make_video(i).save().save()
+
+    def run(name, threads):
+        started = time.perf_counter()
+        if threads == 1:
+            for i in range(args.saves // 2):
+                save_and_update(i)
+        else:
+            with ThreadPoolExecutor(threads) as executor:
+                list(executor.map(save_and_update, range(args.saves // 2)))
+        elapsed = time.perf_counter() - started
+        print(f"{name:<45} {args.saves / elapsed:>12.0f} saves/s")
+
+    app.config["MYSQL_MULTI_STATEMENTS"] = False
+    run("three round trips", 1)
+    app.config["MYSQL_MULTI_STATEMENTS"] = True
+    run("one round trip", 1)
+    run(f"one round trip, {args.threads} threads", args.threads)
+    group_commit.enabled = True
+    run(f"group commit, {args.threads} threads", args.threads)
+    print(group_commit.stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.saves")
+    parser.add_argument("-n", type=int, default=100000, help="versions to build")
+    parser.add_argument("--saves", type=int, default=4000, help="saves to run against MySQL")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="claps_bench")
+    args = parser.parse_args()
+
+    construction(args.n)
+    if args.host:
+        saves(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Generates a reproducible data set for the benchmarks: users, videos and
+--events view, clap and bookmark events. The same --seed and --events always
+give the same rows.
+
+    python -m benchmarks.seed --events 1000000
+    python -m benchmarks.seed --events 1000000 --host 127.0.0.1 --user root --password blink182 --database claps_bench
+
+Without --host the rows go to the embedded stand-in (--standin, an SQLite
+file). With --host they go to MySQL or MariaDB, e.g. a scratch container:
+
+    docker run -d -p 3306:3306 -e MYSQL_ROOT_PASSWORD=blink182 -e MYSQL_DATABASE=claps_bench mariadb:10.6
+
+Existing tables are dropped first. Events pick their video with a Zipf-like
+popularity, so a few videos get most of the engagement, and about a fifth of
+the users and videos have a superseded version that reads must skip. A few
+videos are deleted, which the feed must skip.
+"""
+import argparse
+import datetime
+import itertools
+import random
+import time
+import uuid
+
+from app.migrations.lib import schema
+from app.models.video import Bookmark
+from app.models.video import Clap
+from app.models.video import User
+from app.models.video import Video
+from app.models.video import View
+from benchmarks import environment
+from benchmarks import standin
+
+TAGS = ["data science", "music", "sports", "cooking", "travel", "gaming", "science", "comedy", "news", "art"]
+
+# Share of the events per model
+EVENTS = ((View, 0.7), (Clap, 0.2), (Bookmark, 0.1))
+
+STARTED = datetime.datetime(2022, 11, 1, 12, 0)
+EMPTY_VERSION = Video.__empty_version__
+
+
+def scale(events, videos=None, users=None):
+    """The number of videos and users for `events` events."""
+    return videos or max(10, events // 100), users or max(10, events // 20)
+
+
+class Generator:
+    def __init__(self, seed=0, events=10000, videos=None, users=None):
+        self.rng = random.Random(seed)
+        self.events = events
+        self.videos, self.users = scale(events, videos, users)
+
+    def hex(self):
+        return uuid.UUID(int=self.rng.getrandbits(128)).hex
+
+    def changed_on(self):
+        return STARTED + datetime.timedelta(seconds=self.rng.randrange(90 * 24 * 3600))
+
+    def versions(self, fields):
+        """The rows of one entity: sometimes a superseded version, always the
+        latest one. `fields` are the model's own values, in column order."""
+        entity_id, version = self.hex(), self.hex()
+        previous = EMPTY_VERSION
+        if self.rng.random() < 0.2:
+            yield (entity_id, version, previous, True, False, None, self.changed_on()) + fields
+            previous, version = version, self.hex()
+        yield (entity_id, version, previous, True, True, None, self.changed_on()) + fields
+
+    def user_rows(self):
+        for i in range(self.users):
+            interest = ",".join(self.rng.sample(TAGS, self.rng.randint(1, 3)))
+            yield from self.versions((str(i), self.hex(), f"user{i}", f"User {i}", interest))
+
+    def video_rows(self):
+        for i in range(self.videos):
+            tag = self.rng.choice(TAGS)
+            fields = (
+                str(i),
+                self.hex(),
+                f"A video about {tag} #{i}",
+                str(self.rng.randrange(self.users)),
+                tag,
+                self.rng.random() < 0.02,
+                self.rng.random() < 0.5,
+                self.rng.random() < 0.9,
+            )
+            yield from self.versions(fields)
+
+    def event_rows(self, count):
+        cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(self.videos)))
+        order = list(range(self.videos))
+        self.rng.shuffle(order)
+        for _ in range(count):
+            video = self.rng.choices(order, cum_weights=cum_weights)[0]
+            fields = (str(video), str(self.rng.randrange(self.users)))
+            yield (self.hex(), self.hex(), EMPTY_VERSION, True, True, None, self.changed_on()) + fields
+
+    def tables(self):
+        """(table, columns, rows) of every table, rows generated lazily."""
+        yield User.__tablename__, tuple(User.annotations()), self.user_rows()
+        yield Video.__tablename__, tuple(Video.annotations()), self.video_rows()
+        for model, share in EVENTS:
+            yield model.__tablename__, tuple(model.annotations()), self.event_rows(int(self.events * share))
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def mysql_tables():
+    models = (User, Video, View, Clap, Bookmark)
+    statements = []
+    for model in models:
+        statements.append(f"DROP TABLE IF EXISTS `{model.__tablename__}`")
+        statements.append(schema.create_table_sql(model))
+        if model.__split_history__:
+            statements.append(f"DROP TABLE IF EXISTS `{model.history_table()}`")
+            statements.append(schema.create_table_sql(model, history=True))
+    return statements
+
+
+def standin_tables():
+    statements = []
+    for model in (User, Video, View, Clap, Bookmark):
+        statements.append(f"DROP TABLE IF EXISTS `{model.__tablename__}`")
+        if model.__split_history__:
+            statements.append(f"DROP TABLE IF EXISTS `{model.history_table()}`")
+        statements += standin.create_table_statements(model)
+    return statements
+
+
+def write(connection, create_statements, generator, batch_size=5000):
+    """Creates the tables and inserts the generated rows, `batch_size` rows
+    per INSERT. Returns table -> row count."""
+    counts = {}
+    with connection.cursor() as cursor:
+        for statement in create_statements:
+            cursor.execute(statement)
+    connection.commit()
+    for table, columns, rows in generator.tables():
+        sql = "INSERT INTO `{}` ({}) VALUES ({})".format(table, ",".join(columns), ",".join(["%s"] * len(columns)))
+        counts[table] = 0
+        for chunk in _chunks(rows, batch_size):
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, chunk)
+            connection.commit()
+            counts[table] += len(chunk)
+    return counts
+
+
+def seed(args):
+    """Seeds the database the benchmark `args` point at, see
+    environment.add_database_arguments."""
+    generator = Generator(args.seed, args.events, args.videos, args.users)
+    if args.host:
+        import pymysql
+
+        connection = pymysql.connect(
+            host=args.host, port=args.port, user=args.user, password=args.password, database=args.database
+        )
+        statements = mysql_tables()
+    else:
+        connection = standin.Connection(args.standin)
+        statements = standin_tables()
+    try:
+        return write(connection, statements, generator, args.batch_size)
+    finally:
+        connection.close()
+
+
+def add_arguments(parser):
+    parser.add_argument("--events", type=int, default=100000, help="view, clap and bookmark events")
+    parser.add_argument("--videos", type=int, help="default: events / 100")
+    parser.add_argument("--users", type=int, help="default: events / 20")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=5000)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.seed")
+    add_arguments(parser)
+    environment.add_database_arguments(parser)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = seed(args)
+    elapsed = time.perf_counter() - started
+    for table, count in counts.items():
+        print(f"{table:<20} {count:>12} rows")
+    print(f"seeded {sum(counts.values())} rows in {elapsed:.1f}s ({sum(counts.values()) / elapsed:.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
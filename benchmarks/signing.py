@@ -0,0 +1,116 @@
+"""
+Compares the local V4 signer with google-cloud-storage and measures signatures
+per second for both.
+
+    python -m benchmarks.signing --key auth.json -n 2000
+
+The comparison signs a matrix of blob names and signing options with both
+implementations at a fixed timestamp and exits non-zero if any URL differs.
+tests/test_signing.py runs the same matrix under pytest.
+"""
+import argparse
+import datetime
+import sys
+import time
+from unittest import mock
+
+from app.signing import local
+
+NOW = datetime.datetime(2022, 11, 1, 12, 30, 15)
+
+BLOB_NAMES = [
+    "plain.mp4",
+    "a1b2c3/video.mp4",
+    "a1b2c3/subs.vtt",
+    "with space/and+plus.mp4",
+    "unicodé/ø~tilde.mp4",
+    "query?and#hash&amp.mp4",
+]
+
+OPTIONS = [
+    dict(method="GET", expiration=datetime.timedelta(minutes=120), response_type="video/mp4"),
+    dict(method="GET", expiration=datetime.timedelta(minutes=120), response_type="text/vtt"),
+    dict(method="PUT", expiration=datetime.timedelta(minutes=30), content_type="video/mp4"),
+    dict(method="get", expiration=3600),
+    dict(method="RESUMABLE", expiration=60),
+    dict(method="GET", expiration=600, bucket_bound_hostname="cdn.claps.ai"),
+    dict(method="GET", expiration=600, bucket_bound_hostname="https://cdn.claps.ai"),
+]
+
+BUCKET = "development.videos.static.processed.claps.ai"
+
+
+def storage_client(key):
+    from google.cloud import storage
+
+    return storage.Client.from_service_account_json(key)
+
+
+def compare(key):
+    from google.cloud.storage import _signing
+
+    client = storage_client(key)
+    signer = local.LocalSigner.from_file(key)
+    mismatches = 0
+    with mock.patch.object(_signing, "NOW", lambda: NOW):
+        for blob_name in BLOB_NAMES:
+            blob = client.bucket(BUCKET).blob(blob_name)
+            for options in OPTIONS:
+                expected = blob.generate_signed_url(version="v4", **options)
+                actual = local.generate_signed_url(signer, BUCKET, blob_name, now=NOW, **options)
+                if expected != actual:
+                    mismatches += 1
+                    print(f"MISMATCH {blob_name} {options}\n  gcs:   {expected}\n  local: {actual}")
+            if blob.public_url != local.public_url(BUCKET, blob_name):
+                mismatches += 1
+                print(f"MISMATCH public url {blob_name}")
+    print(f"compared {len(BLOB_NAMES) * (len(OPTIONS) + 1)} urls, {mismatches} mismatches")
+    return mismatches == 0
+
+
+def rate(name, n, sign):
+    started = time.perf_counter()
+    for i in range(n):
+        sign(f"{i}/video.mp4")
+    elapsed = time.perf_counter() - started
+    print(f"{name:<32} {n / elapsed:>10.1f} signatures/s")
+    return n / elapsed
+
+
+def benchmark(key, n):
+    expiration = datetime.timedelta(minutes=120)
+
+    def per_call_client(blob_name):
+        blob = storage_client(key).bucket(BUCKET).blob(blob_name)
+        return blob.generate_signed_url(version="v4", expiration=expiration, method="GET")
+
+    client = storage_client(key)
+
+    def shared_client(blob_name):
+        blob = client.bucket(BUCKET).blob(blob_name)
+        return blob.generate_signed_url(version="v4", expiration=expiration, method="GET")
+
+    signer = local.LocalSigner.from_file(key)
+
+    def local_signer(blob_name):
+        return local.generate_signed_url(signer, BUCKET, blob_name, expiration, method="GET")
+
+    rate("gcs, client per call (baseline)", max(n // 10, 1), per_call_client)
+    rate("gcs, shared client", n, shared_client)
+    rate("local signer", n, local_signer)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.signing")
+    parser.add_argument("--key", default="auth.json", help="service account key file")
+    parser.add_argument("-n", type=int, default=1000, help="signatures per run")
+    parser.add_argument("--skip-compare", action="store_true")
+    args = parser.parse_args()
+
+    if not args.skip_compare and not compare(args.key):
+        sys.exit(1)
+    benchmark(args.key, args.n)
+
+
+if __name__ == "__main__":
+    main()
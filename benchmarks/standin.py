@@ -0,0 +1,237 @@
+"""
+An embedded stand-in for MySQL: PyMySQL-like connections over one SQLite
+file, so the model layer and the app can be benchmarked without a database
+server.
+
+    from app import db
+    from benchmarks import standin
+
+    db.factory = standin.connector("bench.sqlite3")
+
+It understands the statements the models send, not MySQL in general: %s
+placeholders with tuple parameters for IN, multi-statement batches and their
+COMMIT, ON DUPLICATE KEY UPDATE and EXPLAIN. Numbers measured on it compare
+commits with each other, not with MySQL.
+"""
+import datetime
+import re
+import sqlite3
+
+from pymysql.constants import SERVER_STATUS
+
+from app.migrations.lib import schema
+
+BASE_COLUMNS = (
+    ("entity_id", "VARCHAR(32) NOT NULL"),
+    ("version", "VARCHAR(32) NOT NULL"),
+    ("previous_version", "VARCHAR(32) DEFAULT '00000000000000000000000000000000'"),
+    ("active", "TINYINT DEFAULT 1"),
+    ("latest", "TINYINT DEFAULT 1"),
+    ("changed_by_id", "VARCHAR(32) DEFAULT NULL"),
+    ("changed_on", "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"),
+)
+
+_UPSERT = re.compile(r"ON DUPLICATE KEY UPDATE (.*)$", re.S)
+_VALUES = re.compile(r"VALUES\((\w+)\)")
+_PLAN_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+
+sqlite3.register_adapter(datetime.datetime, lambda x: x.isoformat(" "))
+sqlite3.register_adapter(datetime.date, lambda x: x.isoformat())
+sqlite3.register_converter("TIMESTAMP", lambda x: datetime.datetime.fromisoformat(x.decode()))
+
+
+def translate(sql, params=None):
+    """
+    The (sql, params) SQLite statements of one MySQL `sql`. Every statement
+    of a batch takes as many of `params` as it has placeholders, and a tuple
+    parameter becomes a parenthesized list, as PyMySQL renders it.
+    """
+    params = list(params or ())
+    statements = []
+    for statement in sql.split(";"):
+        statement = statement.strip()
+        if not statement:
+            continue
+        parts = statement.split("%s")
+        values, params = params[:len(parts) - 1], params[len(parts) - 1:]
+        text, flat = parts[0], []
+        for value, part in zip(values, parts[1:]):
+            if isinstance(value, (tuple, list)):
+                text += "(" + ",".join("?" * len(value)) + ")"
+                flat.extend(value)
+            else:
+                text += "?"
+                flat.append(value)
+            text += part
+        text = _UPSERT.sub(
+            lambda m: "ON CONFLICT(entity_id) DO UPDATE SET " + _VALUES.sub(r"excluded.\1", m.group(1)), text
+        )
+        statements.append((text, tuple(flat)))
+    return statements
+
+
+def create_table_statements(model):
+    """The SQLite CREATE TABLE and CREATE INDEX statements of `model`, and of
+    its history table with __split_history__. SQLite index names are global,
+    so they are prefixed with the table."""
+    tables = [(model.__tablename__, model.__split_history__, schema.model_indexes(model))]
+    if model.__split_history__:
+        tables.append((model.history_table(), False, {}))
+
+    statements = []
+    for table, current, indexes in tables:
+        columns = list(BASE_COLUMNS) + list(schema.model_columns(model).items())
+        primary_key = "entity_id" if current else "entity_id, version"
+        definition = ", ".join(f"{name} {sql_type}" for name, sql_type in columns)
+        statements.append(f"CREATE TABLE IF NOT EXISTS `{table}` ({definition}, PRIMARY KEY ({primary_key}))")
+        for name, index in indexes.items():
+            statements.append(
+                f"CREATE INDEX IF NOT EXISTS {table}_{name} ON `{table}` ({schema.index_columns(index)})"
+            )
+    return statements
+
+
+class Cursor:
+    def __init__(self, connection, unbuffered=False):
+        self.connection = connection
+        self.unbuffered = unbuffered
+        self.description = None
+        self.rowcount = -1
+        self._last_executed = None
+        self._cursor = None
+        self._rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def mogrify(self, query, args=None):
+        return ";".join(
+            re.sub(r"\?", lambda _, values=iter(params): repr(next(values)), sql)
+            for sql, params in translate(query, args)
+        )
+
+    def execute(self, query, args=None):
+        self._last_executed = query
+        self.description, self.rowcount, self._rows = None, 0, None
+        for sql, params in translate(query, args):
+            keyword = sql.split(None, 1)[0].upper()
+            if keyword == "COMMIT":
+                self.connection.commit()
+            elif keyword == "EXPLAIN":
+                self._explain(sql.split(None, 1)[1], params)
+            else:
+                self._run(sql, params)
+        return self.rowcount
+
+    def executemany(self, query, args):
+        args = list(args)
+        statements = translate(query, args[0]) if args else []
+        if len(statements) == 1 and not any(isinstance(x, (tuple, list)) for x in args[0]):
+            self._last_executed = query
+            cursor = self.connection._sqlite.executemany(statements[0][0], args)
+            self.description, self.rowcount, self._rows = None, cursor.rowcount, None
+            return self.rowcount
+        rowcount = 0
+        for params in args:
+            rowcount += self.execute(query, params)
+        self.rowcount = rowcount
+        return rowcount
+
+    def _run(self, sql, params):
+        cursor = self.connection._sqlite.execute(sql, params)
+        if cursor.description is None:
+            self.rowcount += cursor.rowcount
+            return
+        if self.description is not None:
+            return  # the first result set wins, as before nextset()
+        self.description = cursor.description
+        if self.unbuffered:
+            self._cursor = cursor
+        else:
+            self._rows = cursor.fetchall()
+            self.rowcount = len(self._rows)
+
+    def _explain(self, sql, params):
+        """EXPLAIN QUERY PLAN, in the columns of a MySQL EXPLAIN: a SCAN
+        without an index is type ALL, the full table scan."""
+        rows = []
+        for plan_id, _, _, detail in self.connection._sqlite.execute(f"EXPLAIN QUERY PLAN {sql}", params):
+            words = detail.split()
+            index = _PLAN_INDEX.search(detail)
+            if words[0] == "SCAN":
+                plan_type = "index" if index else "ALL"
+            else:
+                plan_type = "ref"
+            rows.append((plan_id, "SIMPLE", words[1] if len(words) > 1 else None, plan_type,
+                         index.group(1) if index else None, detail))
+        self.description = tuple((x, None, None, None, None, None, None)
+                                 for x in ("id", "select_type", "table", "type", "key", "Extra"))
+        self._rows = rows
+        self.rowcount = len(rows)
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def fetchmany(self, size=1):
+        if self._cursor is not None:
+            return self._cursor.fetchmany(size)
+        rows, self._rows = (self._rows or [])[:size], (self._rows or [])[size:]
+        return rows
+
+    def fetchall(self):
+        if self._cursor is not None:
+            return self._cursor.fetchall()
+        rows, self._rows = self._rows or [], []
+        return rows
+
+    def nextset(self):
+        return None
+
+    def close(self):
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
+
+
+class Connection:
+    """One SQLite connection with the PyMySQL methods the pool and the
+    models use."""
+
+    def __init__(self, path, timeout=30):
+        self._sqlite = sqlite3.connect(
+            path, timeout=timeout, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES
+        )
+        self._sqlite.execute("PRAGMA journal_mode=WAL")
+        self._sqlite.execute("PRAGMA synchronous=NORMAL")
+
+    def cursor(self, cursor_class=None):
+        # SSCursor and SSDictCursor are the unbuffered ones
+        return Cursor(self, unbuffered=cursor_class is not None and cursor_class.__name__.startswith("SS"))
+
+    @property
+    def server_status(self):
+        return SERVER_STATUS.SERVER_STATUS_IN_TRANS if self._sqlite.in_transaction else 0
+
+    def commit(self):
+        self._sqlite.commit()
+
+    def rollback(self):
+        self._sqlite.rollback()
+
+    def ping(self, reconnect=False):
+        self._sqlite.execute("SELECT 1")
+
+    def close(self):
+        self._sqlite.close()
+
+
+def connector(path):
+    """A `db.factory` opening stand-in connections to `path`; the PyMySQL
+    connect arguments are ignored."""
+    def connect(**kwargs):
+        return Connection(path)
+    return connect
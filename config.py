@@ -13,6 +13,99 @@ class Config(object):
     MYSQL_PASSWORD = os.environ.get("MYSQL_PASSWORD", 'blink182')
     MYSQL_PORT = os.environ.get("MYSQL_PORT", '3306')
     MYSQL_DATABASE = os.environ.get("MYSQL_DATABASE", 'claps_net')
+    MYSQL_CONNECT_TIMEOUT = int(os.environ.get("MYSQL_CONNECT_TIMEOUT", 10))
+    MYSQL_POOL_SIZE = int(os.environ.get("MYSQL_POOL_SIZE", 10))
+    MYSQL_POOL_MIN_SIZE = int(os.environ.get("MYSQL_POOL_MIN_SIZE", 2))
+    MYSQL_POOL_TIMEOUT = float(os.environ.get("MYSQL_POOL_TIMEOUT", 5))
+    MYSQL_POOL_MAX_LIFETIME = int(os.environ.get("MYSQL_POOL_MAX_LIFETIME", 3600))
+    MYSQL_BULK_BATCH_SIZE = int(os.environ.get("MYSQL_BULK_BATCH_SIZE", 500))
+    MYSQL_STREAM_CHUNK_SIZE = int(os.environ.get("MYSQL_STREAM_CHUNK_SIZE", 500))
+    MYSQL_POOL_HEALTH_CHECK_INTERVAL = int(os.environ.get("MYSQL_POOL_HEALTH_CHECK_INTERVAL", 30))
+    # Connections of the aiomysql pool of the async entry point, asgi.py
+    MYSQL_AIO_POOL_SIZE = int(os.environ.get("MYSQL_AIO_POOL_SIZE", 20))
+    # Lets save send its UPDATE, INSERT and COMMIT as one batch. Opt-in: the
+    # connection then also runs any stacked statements a query carries
+    MYSQL_MULTI_STATEMENTS = os.environ.get("MYSQL_MULTI_STATEMENTS", 'false').lower() == 'true'
+
+    # STARTUP CONFIGS, when the pool opens and the signing key, engagement
+    # index, feed ranking and counters load: "eager" in create_app,
+    # "background" on a thread once it returns, "lazy" on first use. Use
+    # "lazy" with servers that fork after loading the app.
+    STARTUP_WARM_UP = os.environ.get("STARTUP_WARM_UP", 'background')
+
+    # "orjson", or "json" for the stdlib encoder
+    API_JSON_ENCODER = os.environ.get("API_JSON_ENCODER", 'orjson')
+
+    # ENTITY CACHE CONFIGS, the read-through cache of VersionedModel.get.
+    # Enabling it needs the "redis" backend, which every worker invalidates
+    ENTITY_CACHE_ENABLED = os.environ.get("ENTITY_CACHE_ENABLED", 'false').lower() == 'true'
+    ENTITY_CACHE_SIZE = int(os.environ.get("ENTITY_CACHE_SIZE", 10000))
+    ENTITY_CACHE_TTL = int(os.environ.get("ENTITY_CACHE_TTL", 300))
+    ENTITY_CACHE_BACKEND = os.environ.get("ENTITY_CACHE_BACKEND")
+
+    # ADMIN CONFIGS, /metrics and /admin/* only answer requests with the
+    # header "Authorization: Bearer <ADMIN_TOKEN>", and 404 without a token
+    ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+    # METRICS CONFIGS, /metrics and the Server-Timing header
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", 'true').lower() == 'true'
+    METRICS_SERVER_TIMING = os.environ.get("METRICS_SERVER_TIMING", 'true').lower() == 'true'
+
+    # QUERY PROFILER CONFIGS, statements slower than the threshold get EXPLAINed
+    QUERY_PROFILER_ENABLED = os.environ.get("QUERY_PROFILER_ENABLED", 'true').lower() == 'true'
+    QUERY_PROFILER_EXPLAIN_THRESHOLD = float(os.environ.get("QUERY_PROFILER_EXPLAIN_THRESHOLD", 0.1))
+    QUERY_PROFILER_TOP_N = int(os.environ.get("QUERY_PROFILER_TOP_N", 20))
+    QUERY_PROFILER_MAX_FINGERPRINTS = int(os.environ.get("QUERY_PROFILER_MAX_FINGERPRINTS", 1000))
+
+    # URL SIGNING CONFIGS
+    GOOGLE_AUTH_FILE = os.environ.get("GOOGLE_AUTH_FILE", 'auth.json')
+    GOOGLE_AUTH_CHECK_INTERVAL = int(os.environ.get("GOOGLE_AUTH_CHECK_INTERVAL", 5))
+    SIGNING_WORKERS = int(os.environ.get("SIGNING_WORKERS", 8))
+    SIGNED_URL_CACHE_SIZE = int(os.environ.get("SIGNED_URL_CACHE_SIZE", 10000))
+    SIGNED_URL_CACHE_BUCKET_SECONDS = int(os.environ.get("SIGNED_URL_CACHE_BUCKET_SECONDS", 600))
+    SIGNED_URL_MIN_VALIDITY = int(os.environ.get("SIGNED_URL_MIN_VALIDITY", 900))
+    # "redis" shares signed urls between workers, "memory" is a local stand-in
+    SIGNED_URL_CACHE_BACKEND = os.environ.get("SIGNED_URL_CACHE_BACKEND")
+
+    # WRITE-BEHIND CONFIGS, for view and clap events
+    WRITE_BEHIND_ENABLED = os.environ.get("WRITE_BEHIND_ENABLED", 'false').lower() == 'true'
+    WRITE_BEHIND_QUEUE_SIZE = int(os.environ.get("WRITE_BEHIND_QUEUE_SIZE", 10000))
+    WRITE_BEHIND_BATCH_SIZE = int(os.environ.get("WRITE_BEHIND_BATCH_SIZE", 500))
+    WRITE_BEHIND_FLUSH_INTERVAL = float(os.environ.get("WRITE_BEHIND_FLUSH_INTERVAL", 0.5))
+    # block, drop_newest, drop_oldest or sync
+    WRITE_BEHIND_POLICY = os.environ.get("WRITE_BEHIND_POLICY", 'block')
+    WRITE_BEHIND_BLOCK_TIMEOUT = float(os.environ.get("WRITE_BEHIND_BLOCK_TIMEOUT", 1.0))
+
+    # GROUP COMMIT CONFIGS, saves of concurrent requests share one transaction
+    GROUP_COMMIT_ENABLED = os.environ.get("GROUP_COMMIT_ENABLED", 'false').lower() == 'true'
+    GROUP_COMMIT_WINDOW = float(os.environ.get("GROUP_COMMIT_WINDOW", 0.002))
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get("GROUP_COMMIT_MAX_BATCH", 100))
+
+    # ENGAGEMENT INDEX CONFIGS, the seen/clapped/bookmarked flags of the feed
+    ENGAGEMENT_INDEX_ENABLED = os.environ.get("ENGAGEMENT_INDEX_ENABLED", 'true').lower() == 'true'
+    ENGAGEMENT_INDEX_REFRESH_INTERVAL = int(os.environ.get("ENGAGEMENT_INDEX_REFRESH_INTERVAL", 300))
+
+    # ENGAGEMENT COUNTERS CONFIGS, per-video view/clap/bookmark counts
+    COUNTERS_ENABLED = os.environ.get("COUNTERS_ENABLED", 'true').lower() == 'true'
+    COUNTERS_RECONCILE_INTERVAL = int(os.environ.get("COUNTERS_RECONCILE_INTERVAL", 600))
+
+    # FEED RANKING CONFIGS, the candidates are reloaded every interval seconds
+    FEED_RANKING_RELOAD_INTERVAL = int(os.environ.get("FEED_RANKING_RELOAD_INTERVAL", 300))
+    # comma separated tags ranked first in the default feed
+    FEED_BOOSTED_TAGS = os.environ.get("FEED_BOOSTED_TAGS", 'data science')
+    # name of a scoring function registered with app.ranking.scorer
+    FEED_SCORING = os.environ.get("FEED_SCORING", 'none')
+
+    # FEED CACHE CONFIGS, ranked /videos/real pages shared by all users.
+    # Keep the ttl well under SIGNED_URL_MIN_VALIDITY, pages carry signed urls.
+    FEED_CACHE_TTL = int(os.environ.get("FEED_CACHE_TTL", 30))
+    FEED_CACHE_SIZE = int(os.environ.get("FEED_CACHE_SIZE", 1024))
+    # "redis" shares pages between workers, "memory" is a local stand-in
+    FEED_CACHE_BACKEND = os.environ.get("FEED_CACHE_BACKEND")
+
+    # REDIS CONFIGS
+    REDIS_URI = os.environ.get("REDIS_URI", 'redis://localhost:6379')
+    REDIS_PASSWORD = os.environ.get("REDIS_PASSWORD")
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -1,5 +1,8 @@
 from os import listdir
+from urllib.request import Request
+from urllib.request import urlopen
 import argparse
+import json
 import os
 import sys
 from importlib import import_module
@@ -11,6 +14,12 @@ from app.migrations.lib.run import get_db_version
 from app.migrations.lib.run import run_backward_migration_script
 from app.migrations.lib.run import run_forward_migration_script
 from app.migrations.lib.run import get_schema
+from app.migrations.lib import schema
+from app.models import query as queries
+from app.profiler import REPORT_ORDERS
+from app.profiler import fingerprint
+from app.profiler import profiler
+from dotenv import load_dotenv
 from pymysql.err import ProgrammingError
 
 ROOT_PATH = os.path.abspath(os.path.dirname(__file__))
@@ -58,79 +67,138 @@ def get_arg_parser():
     return parser
 
 
-def main():
-    models = [
+def load_models():
+    """The VersionedModel classes defined in the modules of app/models."""
+    modules = [
         x for x in listdir("app/models") if x.endswith(".py") and x != "__init__.py"
     ]
 
-    classes = {}
-    for model in models:
-        with open(f"app/models/{model}") as f:
-            lines = [
-                x.replace("class ", "").split("(")[0]
-                for x in f.readlines()
-                if x.startswith("class ")
-            ]
-
-            classes[model.replace(".py", "")] = lines
+    classes = []
+    for module in modules:
+        module = import_module(f"app.models.{module.replace('.py', '')}")
+        for value in vars(module).values():
+            if (
+                isinstance(value, type)
+                and issubclass(value, models.VersionedModel)
+                and value.__module__ == module.__name__
+            ):
+                classes.append(value)
+    return classes
 
-    models = []
-    for key, value in classes.items():
-        for model in value:
-            models.append(getattr(import_module(f"app.models.{key}"), model))
 
-    app = create_app()
+def model_query_shapes(model):
+    """
+    The statements the app runs against a model's table, with placeholder
+    values: lookups by entity_id and by every id column, the first page of
+    get_page, and for event tables the engagement and counter queries.
+    """
+    table = model.__tablename__
+    columns = schema.model_columns(model)
+    shapes = [
+        (queries.select(table, where=(("entity_id", "="),)), ("",)),
+        (queries.select(table, "*", order_by="entity_id", limit=True), (21,)),
+    ]
+    for column in columns:
+        if column == "id" or column.endswith("_id"):
+            shapes.append((queries.select(table, where=((column, "="),)), ("",)))
+    if "video_id" in columns and "user_id" in columns:
+        shapes.append((
+            queries.select(table, "video_id", where=(("user_id", "="), ("video_id", "IN"))),
+            ("", ("",)),
+        ))
+        shapes.append((queries.select(table, "video_id, COUNT(*)", group_by="video_id"), ()))
+    return shapes
+
+
+def print_plan(plan):
+    for row in plan:
+        print(f"{'':<10} {row.get('table')}: type={row.get('type')} key={row.get('key')} rows={row.get('rows')} {row.get('Extra') or ''}")
+
+
+def print_report(report):
+    for entry in report["slowest"]:
+        scan = {True: "FULL SCAN", False: "indexed", None: "-"}[entry["full_scan"]]
+        print(
+            f"{scan:<10} {entry['count']:>8} x {entry['avg_seconds'] * 1000:>9.2f} ms"
+            f" (max {entry['max_seconds'] * 1000:.2f} ms, {entry['rows_avg']:.0f} rows)  {entry['fingerprint']}"
+        )
+        print_plan(entry["plan"] or ())
+
+
+def profile(argv):
+    parser = argparse.ArgumentParser(
+        prog="python migrate.py profile",
+        description="""Report the costliest query fingerprints. With --url, the live
+        report of a running server (/admin/queries); without, EXPLAIN every query
+        shape of the models against the database.""",
+    )
+    parser.add_argument("--url", help="base url of a running server, e.g. http://localhost:5000")
+    parser.add_argument("--token", help="the server's ADMIN_TOKEN, by default the one of this environment")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--order-by", default="total_seconds", choices=REPORT_ORDERS)
+    args = parser.parse_args(argv)
+
+    if args.url:
+        load_dotenv()
+        token = args.token or os.environ.get("ADMIN_TOKEN")
+        if not token:
+            parser.error("--url needs --token or ADMIN_TOKEN, /admin/queries answers 404 without one")
+        url = f"{args.url.rstrip('/')}/admin/queries?top={args.top}&order_by={args.order_by}"
+        request = Request(url, headers={"Authorization": f"Bearer {token}"})
+        with urlopen(request) as response:
+            report = json.load(response)
+        print(f"{report['statements']} statements, {report['fingerprints']} fingerprints, {report['explained']} explained")
+        print_report(report)
+        return
+
+    app = create_app(cli=True)
     with app.app_context():
         connection = db.connect
+        for model in load_models():
+            for sql, params in model_query_shapes(model):
+                with connection.cursor() as cursor:
+                    statement = cursor.mogrify(sql, params)
+                plan = profiler.explain(statement, connection)
+                full_scan = any(row.get("type") == "ALL" for row in plan)
+                print(f"{'FULL SCAN' if full_scan else 'indexed':<10} {fingerprint(sql)}")
+                print_plan(plan)
+
 
+def main():
+    models = load_models()
 
+    app = create_app(cli=True)
+    with app.app_context():
+        connection = db.connect
 
-        query = "describe {};"
+        upgrade, downgrade = [], []
         with connection.cursor() as cursor:
             cursor.execute("SHOW TABLES")
             tables = [x[0] for x in cursor.fetchall()]
 
             for model in models:
                 if model.__tablename__ in tables:
-                    cursor.execute(query.format(model.__tablename__))
-                    results = cursor.fetchall()
-                    fields = [x[0] for x in results]
-
-                    pass
+                    columns = schema.existing_columns(cursor, model.__tablename__)
+                    indexes = schema.existing_indexes(cursor, model.__tablename__)
+                    model_upgrade, model_downgrade = schema.schema_changes(
+                        model, columns, indexes, model.history_table() in tables
+                    )
+                    upgrade += model_upgrade
+                    downgrade = model_downgrade + downgrade
 
                 else:
-                    create = """
-                        `entity_id` varchar(32) NOT NULL,
-                        `version` varchar(32) NOT NULL,
-                        `previous_version` varchar(32) DEFAULT '00000000000000000000000000000000',
-                        `active` tinyint(1) DEFAULT '1',
-                        `latest` tinyint(1) DEFAULT '1',
-                        `changed_by_id` varchar(32) DEFAULT NULL,
-                        `changed_on` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                    """
-
-                    for field, value in model.__annotations__.items():
-                        v = value()
-                        if isinstance(v, str) and field.endswith("_id"):
-                            create += f"    `{field}` TEXT,\n"
-                        elif isinstance(v, str):
-                            create += f"    `{field}` TEXT,\n"
-                        elif isinstance(v, int):
-                            create += f"    `{field}` INTEGER,\n"
-                        elif isinstance(v, bool):                         
-                            create += f"    `{field}` TINYINT,\n"
-
-                        from pprint import pprint
-                    
-
-                    create = create[0:-1]
-                    create += """
-                        PRIMARY KEY (`entity_id`,`version`),
-                        INDEX latest_ind (`entity_id`,`latest`,`active`)                    
-                    """
-
-                    create = f"create table {model.__tablename__} (\n{create}\n)"
-                    cursor.execute(create)
+                    cursor.execute(schema.create_table_sql(model))
+                    if model.__split_history__:
+                        cursor.execute(schema.create_table_sql(model, history=True))
+
+    # Existing tables are never altered here: the changes are written as a
+    # migration, to be reviewed and run like any other.
+    if upgrade:
+        file_name = create_migration_file(
+            upgrade=schema.render_calls(upgrade), downgrade=schema.render_calls(downgrade)
+        )
+        if file_name:
+            print(f"Schema changes written to {file_name}")
 
     # parser = get_arg_parser()
     # parsed = parser.parse_args()
@@ -150,4 +218,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:2] == ["profile"]:
+        profile(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,55 @@
+"""
+Fixtures: the app on a fresh stand-in database, see benchmarks.standin, with
+every background load and refresh off. Tests that need them skip when the
+app's dependencies are not installed.
+"""
+import os
+
+import pytest
+
+# config.py reads the environment when create_app first imports it
+os.environ.update(
+    STARTUP_WARM_UP="lazy",
+    ENGAGEMENT_INDEX_REFRESH_INTERVAL="0",
+    FEED_RANKING_RELOAD_INTERVAL="0",
+    COUNTERS_RECONCILE_INTERVAL="0",
+    QUERY_PROFILER_ENABLED="false",
+    METRICS_ENABLED="false",
+)
+
+APP_DEPENDENCIES = ("flask", "flask_restx", "flask_cors", "dotenv", "pymysql", "numpy", "cachetools")
+ASYNC_APP_DEPENDENCIES = ("quart", "quart_cors", "aiomysql")
+
+
+@pytest.fixture
+def app(tmp_path):
+    for module in APP_DEPENDENCIES:
+        pytest.importorskip(module)
+    from app import create_app
+    from app import db
+    from benchmarks import seed
+    from benchmarks import standin
+
+    path = str(tmp_path / "test.sqlite3")
+    connection = standin.Connection(path)
+    with connection.cursor() as cursor:
+        for statement in seed.standin_tables():
+            cursor.execute(statement)
+    connection.commit()
+    connection.close()
+
+    db.factory = standin.connector(path)
+    app = create_app()
+    yield app
+    db.close_idle()
+
+
+@pytest.fixture
+def async_app(app):
+    """The async app, without its aiomysql pool: requests that reach the
+    database fail."""
+    for module in ASYNC_APP_DEPENDENCIES:
+        pytest.importorskip(module)
+    from app.aio import create_async_app
+
+    return create_async_app()
@@ -0,0 +1,38 @@
+"""
+RedisBackend on a Redis that is not there.
+"""
+import logging
+import socket
+
+import pytest
+
+pytest.importorskip("redis")
+
+from app.cache import RedisBackend  # noqa: E402
+
+
+@pytest.fixture
+def backend():
+    # A port nothing listens on
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return RedisBackend(f"redis://127.0.0.1:{port}/0")
+
+
+def test_unreachable_redis_is_a_miss(backend, caplog):
+    with caplog.at_level(logging.ERROR):
+        backend.set("a", {"x": 1}, 60)
+        assert backend.get("a") is None
+        backend.delete("a")
+
+    assert backend.errors == 3
+    assert len(caplog.records) == 1
+
+
+def test_errors_are_logged_again_after_the_interval(backend, caplog):
+    backend.log_interval = 0
+    with caplog.at_level(logging.ERROR):
+        backend.get("a")
+        backend.get("a")
+    assert len(caplog.records) == 2
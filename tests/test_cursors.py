@@ -0,0 +1,62 @@
+"""
+Malformed page cursors are a 400 on the model-list routes of both apps,
+before any query runs.
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("flask")
+
+from app.models import decode_page_cursor  # noqa: E402
+from app.models import encode_cursor  # noqa: E402
+
+MALFORMED = [
+    "not a cursor",
+    encode_cursor({"entity_id": "a"}),
+    encode_cursor([]),
+    encode_cursor(["a", "b"]),
+    encode_cursor([1]),
+    encode_cursor([None]),
+    encode_cursor([["a"]]),
+]
+
+
+def test_decode_page_cursor():
+    assert decode_page_cursor(encode_cursor(["a1b2"])) == "a1b2"
+
+
+@pytest.mark.parametrize("cursor", MALFORMED)
+def test_decode_page_cursor_rejects_malformed_cursors(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_page_cursor(cursor)
+
+
+@pytest.mark.parametrize("cursor", MALFORMED)
+def test_sync_model_list_rejects_malformed_cursors(app, cursor):
+    response = app.test_client().get("/videos/view", query_string={"cursor": cursor})
+    assert response.status_code == 400
+    assert "Invalid cursor" in response.get_json()["message"]
+
+
+def test_sync_model_list_pages_with_its_cursor(app):
+    from app.models.video import View
+
+    with app.app_context():
+        View.save_many([View(video_id="1", user_id=str(i)) for i in range(3)])
+    client = app.test_client()
+    first = client.get("/videos/view", query_string={"page_size": 2})
+    second = client.get("/videos/view", query_string={"cursor": first.headers["X-Next-Cursor"]})
+    assert len(first.get_json()) == 2
+    assert len(second.get_json()) == 1
+
+
+@pytest.mark.parametrize("cursor", MALFORMED)
+def test_async_model_list_rejects_malformed_cursors(async_app, cursor):
+    async def get():
+        response = await async_app.test_client().get("/videos/view", query_string={"cursor": cursor})
+        return response.status_code, await response.get_json()
+
+    status, body = asyncio.run(get())
+    assert status == 400
+    assert "Invalid cursor" in body["message"]
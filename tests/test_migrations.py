@@ -0,0 +1,43 @@
+"""
+The statements of BaseMigration, on a recording stand-in for its connection.
+"""
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("pymysql")
+
+from app.migrations.lib.base_migration import BaseMigration  # noqa: E402
+
+
+class RecordingMigration(BaseMigration):
+    def __init__(self, longest=None):
+        self.longest = longest
+        self.statements = []
+
+    def execute(self, query):
+        self.statements.append(query)
+        if query.startswith("SELECT MAX(CHAR_LENGTH("):
+            return ((self.longest,),)
+        return None
+
+
+def test_narrowing_to_varchar_checks_the_longest_value_first():
+    migration = RecordingMigration(longest=200)
+    migration.alter_column("video", "title", "VARCHAR(255)", online=False)
+    assert migration.statements == [
+        "SELECT MAX(CHAR_LENGTH(title)) FROM video;",
+        "ALTER TABLE video MODIFY COLUMN title VARCHAR(255), ALGORITHM=COPY, LOCK=SHARED;",
+    ]
+
+
+def test_narrowing_to_varchar_aborts_on_a_longer_value():
+    migration = RecordingMigration(longest=256)
+    with pytest.raises(ValueError, match="256 characters"):
+        migration.alter_column("video", "title", "VARCHAR(255)", online=False)
+    assert not any(x.startswith("ALTER") for x in migration.statements)
+
+
+def test_alter_column_runs_online_by_default():
+    migration = RecordingMigration()
+    migration.alter_column("video", "title", "TEXT")
+    assert migration.statements == ["ALTER TABLE video MODIFY COLUMN title TEXT, ALGORITHM=INPLACE, LOCK=NONE;"]
@@ -0,0 +1,62 @@
+"""
+VersionedModel writes, on the stand-in database.
+"""
+
+
+def latest_rows(model, entity_id):
+    return model.fetchall_dict(
+        f"SELECT * FROM {model.__tablename__} WHERE entity_id = %s AND latest = true;", (entity_id,)
+    )
+
+
+def test_save_many_of_one_entity_keeps_the_last_version_latest(app):
+    from app.models.video import User
+
+    with app.app_context():
+        a = User(id="1", name="a").save()
+        b, c = User.get(a.entity_id), User.get(a.entity_id)
+        b.name, c.name = "b", "c"
+        saved_b, saved_c = User.save_many([b, c])
+
+        rows = latest_rows(User, a.entity_id)
+        assert [x["name"] for x in rows] == ["c"]
+        assert User.get(a.entity_id).name == "c"
+        assert saved_b.previous_version == a.version
+        assert saved_c.previous_version == saved_b.version
+        assert not saved_b.latest
+
+
+def test_group_commit_of_one_entity_keeps_the_last_version_latest(app):
+    from threading import Thread
+
+    from app.groupcommit import group_commit
+    from app.models.video import User
+
+    with app.app_context():
+        a = User(id="1", name="a").save()
+
+    saved = {}
+
+    def save(name):
+        with app.app_context():
+            user = User.get(a.entity_id)
+            user.name = name
+            saved[name] = user.save()
+
+    group_commit.enabled, group_commit.window, group_commit.max_batch = True, 5, 2
+    try:
+        threads = [Thread(target=save, args=(x,)) for x in ("b", "c")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        group_commit.enabled, group_commit.window, group_commit.max_batch = False, 0.002, 100
+
+    assert group_commit.group_size_max == 2
+    first, last = sorted(saved.values(), key=lambda x: x.latest)
+    with app.app_context():
+        rows = latest_rows(User, a.entity_id)
+        assert [x["version"] for x in rows] == [last.version]
+        assert first.previous_version == a.version
+        assert last.previous_version == first.version
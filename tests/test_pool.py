@@ -0,0 +1,67 @@
+"""
+ConnectionPool checkouts, on fake connections.
+"""
+import time
+from threading import Thread
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("pymysql")
+
+from app.pool import ConnectionPool  # noqa: E402
+from app.pool import PoolTimeout  # noqa: E402
+
+
+class FakeConnection:
+    server_status = 0
+
+    def __init__(self, **kwargs):
+        self.closed = False
+
+    def ping(self, reconnect=False):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class BrokenConnection(FakeConnection):
+    @property
+    def server_status(self):
+        raise OSError("gone")
+
+
+@pytest.fixture
+def pool():
+    pool = ConnectionPool(size=1, timeout=5)
+    pool.factory = FakeConnection
+    return pool
+
+
+def test_timeout_reports_the_connections_in_use(pool):
+    pool.acquire()
+    with pytest.raises(PoolTimeout, match=r"\(1 of 1 in use\)"):
+        pool.acquire(timeout=0.01)
+    assert pool.timeouts == 1
+
+
+def test_a_waiting_acquire_takes_the_slot_of_a_discarded_connection(pool):
+    pooled = pool.acquire()
+    acquired = []
+    waiter = Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.1)
+
+    # Dropped, not returned to the idle queue
+    pooled.connection.__class__ = BrokenConnection
+    started = time.perf_counter()
+    pool.release(pooled)
+    waiter.join(timeout=2)
+
+    assert acquired and acquired[0] is not pooled
+    assert time.perf_counter() - started < 1
+    assert pool.stats()["open"] == 1
@@ -0,0 +1,57 @@
+"""
+The local V4 signer against google-cloud-storage, the version pinned in
+requirements.txt: every blob name and signing option of the benchmarks.signing
+matrix must give the same URL at the same timestamp.
+
+    python -m pytest tests/test_signing.py
+"""
+import itertools
+from unittest import mock
+
+import pytest
+
+storage = pytest.importorskip("google.cloud.storage")
+pytest.importorskip("rsa")
+
+from google.cloud.storage import _signing  # noqa: E402
+
+from app.signing import local  # noqa: E402
+from benchmarks import environment  # noqa: E402
+from benchmarks.signing import BLOB_NAMES  # noqa: E402
+from benchmarks.signing import BUCKET  # noqa: E402
+from benchmarks.signing import NOW  # noqa: E402
+from benchmarks.signing import OPTIONS  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def key(tmp_path_factory):
+    return environment.fake_key(str(tmp_path_factory.mktemp("signing") / "key.json"))
+
+
+@pytest.fixture(scope="module")
+def signer(key):
+    return local.LocalSigner.from_file(key)
+
+
+@pytest.fixture(scope="module")
+def bucket(key):
+    return storage.Client.from_service_account_json(key).bucket(BUCKET)
+
+
+@pytest.mark.parametrize("blob_name, options", list(itertools.product(BLOB_NAMES, OPTIONS)))
+def test_signed_url_matches_gcs(bucket, signer, blob_name, options):
+    with mock.patch.object(_signing, "NOW", lambda: NOW):
+        expected = bucket.blob(blob_name).generate_signed_url(version="v4", **options)
+    assert local.generate_signed_url(signer, BUCKET, blob_name, now=NOW, **options) == expected
+
+
+@pytest.mark.parametrize("blob_name", BLOB_NAMES)
+def test_public_url_matches_gcs(bucket, blob_name):
+    assert local.public_url(BUCKET, blob_name) == bucket.blob(blob_name).public_url
+
+
+def test_bare_bucket_bound_hostname_keeps_the_double_slash(signer):
+    url = local.generate_signed_url(
+        signer, BUCKET, "a1b2c3/video.mp4", 600, bucket_bound_hostname="cdn.claps.ai", now=NOW
+    )
+    assert url.startswith("http://cdn.claps.ai//a1b2c3/video.mp4?")